@@ -0,0 +1,213 @@
+# delta_cnpj.py - Modo delta entre períodos (Dados_CNPJ/AAAA-MM): impressões digitais por CNPJ e conjuntos
+# inseridos / atualizados / encerrados / removidos em relação ao período anterior
+#
+# Impressões (Impressoes_cnpj.npz, na pasta de cada período): para cada cnpj_basico, a soma (mod 2^64) dos hashes
+# das linhas do mestre com esse CNPJ, só sobre as colunas mapeadas usadas na fase 7. A soma não depende da ordem
+# das linhas, então a impressão pode ser acumulada bloco a bloco. O período atual vira o "anterior" no mês seguinte,
+# e as impressões já gravadas são reaproveitadas.
+
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import processador_de_leads as leads
+from organizer_cnpj import DIRETORIO_BASE, _caminho_mestre_do_periodo, _listar_periodos
+
+# --- Configurações do Delta ---
+NOME_ARQUIVO_IMPRESSOES = 'Impressoes_cnpj.npz'
+DIRETORIO_DELTA_NOME = 'Delta'
+COLUNAS_IMPRESSAO = leads.COLUNAS_MANTER_PRIMEIRO + leads.COLUNAS_AGREGAR + ['TABELA_ORIGEM'] # Mudanças fora delas não alteram leads
+DTYPE_IMPRESSAO = {'capital_social': np.float64} # Mesmo valor no CSV ('1.000,50') e no Parquet (double)
+LINHAS_COMPACTACAO_IMPRESSOES = 20_000_000 # Impressões parciais acumuladas antes de reduzir por CNPJ de novo
+
+# Conjuntos gravados em Delta/ (um CSV com a coluna cnpj_basico por conjunto). encerrados ⊂ atualizados.
+CONJUNTOS_DELTA = ('inseridos', 'atualizados', 'encerrados', 'removidos', 'novas_aberturas')
+
+# ==============================================================================
+# 1. IMPRESSÕES DIGITAIS POR CNPJ
+# ==============================================================================
+
+def _reduzir_por_cnpj(cnpjs: np.ndarray, hashes: np.ndarray, ativos: np.ndarray, inicios: np.ndarray):
+    """Agrupa por cnpj_basico: soma dos hashes (uint64, com estouro), 'algum estabelecimento ativo' e abertura mais recente."""
+    if not len(cnpjs):
+        return cnpjs, hashes, ativos, inicios
+    ordem = np.argsort(cnpjs, kind='stable')
+    cnpjs = cnpjs[ordem]
+    inicios_grupos = np.flatnonzero(np.r_[True, cnpjs[1:] != cnpjs[:-1]])
+    return (cnpjs[inicios_grupos],
+            np.add.reduceat(hashes[ordem], inicios_grupos),
+            np.logical_or.reduceat(ativos[ordem], inicios_grupos),
+            np.maximum.reduceat(inicios[ordem], inicios_grupos))
+
+def _impressoes_do_bloco(bloco: pd.DataFrame):
+    chave = pd.to_numeric(bloco['cnpj_basico'], errors='coerce')
+    validas = chave.notna().to_numpy()
+    bloco = bloco[validas] # Linhas sem CNPJ (MUNIC, CNAES...) não pertencem a nenhum lead
+
+    # Texto normalizado (nulos e vazios -> ''): o hash não depende do formato do mestre nem do dtype do bloco
+    normalizado = pd.DataFrame({coluna: leads._texto(bloco[coluna]).fillna('').astype(str) for coluna in COLUNAS_IMPRESSAO})
+    hashes = pd.util.hash_pandas_object(normalizado, index=False).to_numpy(dtype=np.uint64)
+    ativos = leads._filtro_leads_ativos(bloco).fillna(False).to_numpy(dtype=bool)
+    inicios = pd.to_numeric(bloco['data_inicio_atividade'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    return _reduzir_por_cnpj(chave[validas].to_numpy(dtype=np.int64), hashes, ativos, inicios)
+
+def calcular_impressoes(caminho_mestre: str) -> Dict[str, np.ndarray]:
+    """Uma passada pelo mestre (só COLUNAS_IMPRESSAO). Retorna arrays alinhados e ordenados por cnpj_basico."""
+    parciais: List[tuple] = []
+    linhas_parciais = 0
+    for bloco in leads._iterar_blocos_filtrados(caminho_mestre, COLUNAS_IMPRESSAO, DTYPE_IMPRESSAO, []):
+        parciais.append(_impressoes_do_bloco(bloco))
+        linhas_parciais += len(parciais[-1][0])
+        if linhas_parciais >= LINHAS_COMPACTACAO_IMPRESSOES:
+            parciais = [_reduzir_por_cnpj(*(np.concatenate(partes) for partes in zip(*parciais)))]
+            linhas_parciais = len(parciais[0][0])
+
+    if parciais:
+        cnpjs, hashes, ativos, inicios = _reduzir_por_cnpj(*(np.concatenate(partes) for partes in zip(*parciais)))
+    else:
+        cnpjs, hashes = np.empty(0, np.int64), np.empty(0, np.uint64)
+        ativos, inicios = np.empty(0, bool), np.empty(0, np.int64)
+    return {'cnpj_basico': cnpjs, 'hash': hashes, 'ativo': ativos, 'inicio_atividade': inicios}
+
+def carregar_ou_calcular_impressoes(diretorio_periodo: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Impressões do período: reaproveita Impressoes_cnpj.npz se for mais novo que o mestre (ou se o mestre já
+    foi apagado); senão, recalcula e grava. None se não houver nem mestre nem impressões.
+    """
+    caminho_impressoes = os.path.join(diretorio_periodo, NOME_ARQUIVO_IMPRESSOES)
+    caminho_mestre = _caminho_mestre_do_periodo(diretorio_periodo)
+    if os.path.exists(caminho_impressoes) and (not caminho_mestre or os.path.getmtime(caminho_impressoes) >= os.path.getmtime(caminho_mestre)):
+        with np.load(caminho_impressoes) as arquivo:
+            return {nome: arquivo[nome] for nome in arquivo.files}
+    if not caminho_mestre:
+        return None
+
+    print(f"Calculando impressões digitais de {caminho_mestre}...")
+    impressoes = calcular_impressoes(caminho_mestre)
+    caminho_temp = caminho_impressoes + '.tmp.npz'
+    np.savez(caminho_temp, **impressoes)
+    os.replace(caminho_temp, caminho_impressoes)
+    return impressoes
+
+# ==============================================================================
+# 2. DELTA ENTRE PERÍODOS
+# ==============================================================================
+
+def _presentes(chaves: np.ndarray, ordenadas: np.ndarray):
+    """(máscara de `chaves` presentes em `ordenadas`, posição em `ordenadas`), com `ordenadas` ordenado."""
+    posicoes = np.searchsorted(ordenadas, chaves)
+    limitadas = np.minimum(posicoes, max(len(ordenadas) - 1, 0))
+    presentes = (ordenadas[limitadas] == chaves) if len(ordenadas) else np.zeros(len(chaves), dtype=bool)
+    return presentes, limitadas
+
+def calcular_delta(anterior: Dict[str, np.ndarray], atual: Dict[str, np.ndarray], periodo_anterior: str) -> Dict[str, np.ndarray]:
+    """
+    Compara as impressões dos dois períodos (cnpj_basico ordenados, sem laço por CNPJ):
+    inseridos (só no atual), removidos (só no anterior), atualizados (impressão diferente),
+    encerrados (tinha estabelecimento ativo e não tem mais) e novas_aberturas (inseridos ativos com
+    início de atividade a partir do mês do período anterior).
+    """
+    cnpjs = atual['cnpj_basico']
+    presentes, posicoes = _presentes(cnpjs, anterior['cnpj_basico'])
+    comuns, posicoes_comuns = np.flatnonzero(presentes), posicoes[presentes]
+
+    atualizados = anterior['hash'][posicoes_comuns] != atual['hash'][comuns]
+    encerrados = anterior['ativo'][posicoes_comuns] & ~atual['ativo'][comuns]
+    corte_aberturas = int(periodo_anterior.replace('-', '') + '01')
+    novas_aberturas = ~presentes & atual['ativo'] & (atual['inicio_atividade'] >= corte_aberturas)
+    ainda_presentes, _ = _presentes(anterior['cnpj_basico'], cnpjs)
+    return {
+        'inseridos': cnpjs[~presentes],
+        'atualizados': cnpjs[comuns[atualizados]],
+        'encerrados': cnpjs[comuns[encerrados]],
+        'removidos': anterior['cnpj_basico'][~ainda_presentes],
+        'novas_aberturas': cnpjs[novas_aberturas],
+    }
+
+def cnpjs_afetados(delta: Dict[str, np.ndarray]) -> np.ndarray:
+    """CNPJs cujos leads precisam ser reagregados (ordenados, sem repetição)."""
+    return np.union1d(np.union1d(delta['inseridos'], delta['atualizados']), delta['removidos'])
+
+def gravar_delta(diretorio_periodo: str, periodo_anterior: str, delta: Dict[str, np.ndarray]) -> str:
+    """Grava Delta/ (um CSV por conjunto + delta.json) de forma atômica. Retorna o diretório."""
+    diretorio = os.path.join(diretorio_periodo, DIRETORIO_DELTA_NOME)
+    diretorio_temp = diretorio + '.tmp'
+    shutil.rmtree(diretorio_temp, ignore_errors=True)
+    os.makedirs(diretorio_temp)
+    try:
+        for nome in CONJUNTOS_DELTA:
+            np.savetxt(os.path.join(diretorio_temp, f"{nome}.csv"), delta[nome], fmt='%08d', header='cnpj_basico', comments='')
+        with open(os.path.join(diretorio_temp, 'delta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'periodo_anterior': periodo_anterior,
+                'periodo_atual': os.path.basename(os.path.normpath(diretorio_periodo)),
+                'totais': {nome: int(len(delta[nome])) for nome in CONJUNTOS_DELTA},
+            }, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_temp, diretorio)
+    except Exception:
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        raise
+    return diretorio
+
+def carregar_delta(diretorio_periodo: str) -> Optional[dict]:
+    """Lê Delta/ do período: {'periodo_anterior': 'AAAA-MM', <conjunto>: array de cnpj_basico}. None se não existir."""
+    diretorio = os.path.join(diretorio_periodo, DIRETORIO_DELTA_NOME)
+    caminho_resumo = os.path.join(diretorio, 'delta.json')
+    if not os.path.exists(caminho_resumo):
+        return None
+    with open(caminho_resumo, 'r', encoding='utf-8') as f:
+        delta = {'periodo_anterior': json.load(f)['periodo_anterior']}
+    for nome in CONJUNTOS_DELTA:
+        delta[nome] = pd.read_csv(os.path.join(diretorio, f"{nome}.csv"), dtype={'cnpj_basico': np.int64})['cnpj_basico'].to_numpy()
+    return delta
+
+# ==============================================================================
+# WRAPPERS
+# ==============================================================================
+
+def executar_delta() -> bool:
+    """Compara o período mais recente com o anterior e grava Delta/ na pasta do período mais recente."""
+    try:
+        periodos = _listar_periodos()
+    except FileNotFoundError:
+        print(f"ERRO CRÍTICO: O diretório base '{DIRETORIO_BASE}' não foi encontrado.")
+        return False
+    periodos = [
+        periodo for periodo in periodos
+        if _caminho_mestre_do_periodo(os.path.join(DIRETORIO_BASE, periodo))
+        or os.path.exists(os.path.join(DIRETORIO_BASE, periodo, NOME_ARQUIVO_IMPRESSOES))
+    ]
+    if len(periodos) < 2:
+        print("AVISO: Não há período anterior com mestre ou impressões digitais. O delta começa a valer no próximo período.")
+        if periodos:
+            carregar_ou_calcular_impressoes(os.path.join(DIRETORIO_BASE, periodos[-1]))
+        return bool(periodos)
+
+    periodo_anterior, periodo_atual = periodos[-2], periodos[-1]
+    inicio = time.time()
+    print("=" * 80)
+    print(f"DELTA ENTRE PERÍODOS: {periodo_anterior} -> {periodo_atual}")
+    print("=" * 80)
+    try:
+        anterior = carregar_ou_calcular_impressoes(os.path.join(DIRETORIO_BASE, periodo_anterior))
+        atual = carregar_ou_calcular_impressoes(os.path.join(DIRETORIO_BASE, periodo_atual))
+        delta = calcular_delta(anterior, atual, periodo_anterior)
+        diretorio = gravar_delta(os.path.join(DIRETORIO_BASE, periodo_atual), periodo_anterior, delta)
+    except Exception as e:
+        print(f"🛑 ERRO ao calcular o delta entre os períodos: {e}")
+        return False
+
+    print(f"✅ Delta gravado em {diretorio} ({time.time() - inicio:.2f}s): "
+          + ', '.join(f"{nome} {len(delta[nome])}" for nome in CONJUNTOS_DELTA)
+          + f" | CNPJs afetados: {len(cnpjs_afetados(delta))} de {len(atual['cnpj_basico'])}")
+    return True
+
+if __name__ == '__main__':
+    executar_delta()
@@ -1,8 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+import argparse
 import os
 import re
+import json
+import hashlib
 import time 
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 from tqdm import tqdm 
 
 # --- Configurações ---
@@ -10,6 +17,139 @@ DIRETORIO_BASE = 'Dados_CNPJ'
 URL_BASE = 'https://arquivos.receitafederal.gov.br/dados/cnpj/dados_abertos_cnpj/'
 MAX_RETRIES = 5 
 RETRY_DELAY = 10 
+SUFIXO_PARCIAL = '.part' # Downloads em andamento ficam como '<nome>.zip.part' até completarem
+SUFIXO_VALIDADOR = '.validador' # ETag/Last-Modified usado no If-Range da retomada
+NOME_MANIFESTO = 'manifesto_download.json' # Um manifesto por período (Dados_CNPJ/AAAA-MM)
+VERIFICAR_SHA256_LOCAL = False # True (ou --verificar) relê os ZIPs já baixados e compara com o SHA-256 do manifesto
+
+# --- Configurações de Download Concorrente ---
+DOWNLOADS_CONCORRENTES = True # False volta ao modo sequencial (um ZIP por vez)
+MAX_DOWNLOADS_SIMULTANEOS = 4 # Tamanho do pool de threads
+MAX_CONEXOES_POR_HOST = 3 # Limite de conexões simultâneas no mesmo servidor
+BACKOFF_MAXIMO = 300 # Teto (em segundos) da espera adaptativa
+STATUS_HTTP_THROTTLING = (429, 502, 503, 504) # Respostas que indicam servidor sobrecarregado
+
+# --- Configurações de Download Segmentado (um ZIP grande em várias conexões) ---
+DOWNLOAD_SEGMENTADO = True # Divide arquivos grandes em faixas de bytes baixadas em paralelo
+TAMANHO_MINIMO_SEGMENTADO = 256 * 1024 * 1024 # Só segmenta arquivos a partir de 256 MB
+NUMERO_SEGMENTOS = 4 # Conexões simultâneas por arquivo segmentado
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024 # Bloco de leitura/escrita (1 MB)
+
+# --- Sessão HTTP Compartilhada ---
+
+_sessao = None
+_sessao_lock = threading.Lock()
+
+def _sessao_http():
+    """
+    Sessão requests única (keep-alive) para listagens, HEADs e downloads.
+    O pool comporta todas as threads de download e todos os segmentos ao mesmo tempo.
+    """
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            tamanho_pool = max(MAX_DOWNLOADS_SIMULTANEOS, 1) * max(NUMERO_SEGMENTOS, 1)
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=tamanho_pool)
+            _sessao = requests.Session()
+            _sessao.mount('http://', adaptador)
+            _sessao.mount('https://', adaptador)
+        return _sessao
+
+# --- Controle de Concorrência ---
+
+class ControleDeHosts:
+    """
+    Limita as conexões simultâneas por host e aplica backoff adaptativo compartilhado
+    entre as threads: cada throttling/reset dobra a espera do host, cada sucesso a reduz.
+    """
+    def __init__(self, max_conexoes_por_host=MAX_CONEXOES_POR_HOST):
+        self.max_conexoes_por_host = max_conexoes_por_host
+        self._lock = threading.Lock()
+        self._semaforos = {}
+        self._atraso = {}
+        self._liberado_em = {}
+
+    def _host(self, url):
+        return urlparse(url).netloc
+
+    def semaforo(self, url):
+        """Retorna o semáforo que limita as conexões ao host da URL."""
+        host = self._host(url)
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_conexoes_por_host)
+            return self._semaforos[host]
+
+    def aguardar_liberacao(self, url):
+        """Bloqueia a thread enquanto o host estiver em período de backoff."""
+        host = self._host(url)
+        with self._lock:
+            espera = self._liberado_em.get(host, 0) - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def registrar_falha(self, url, throttling=False):
+        """Aumenta o backoff do host e retorna quantos segundos esperar antes do retry."""
+        host = self._host(url)
+        with self._lock:
+            atraso_atual = self._atraso.get(host, 0)
+            fator = 4 if throttling else 2
+            novo_atraso = min(BACKOFF_MAXIMO, max(RETRY_DELAY, atraso_atual * fator))
+            self._atraso[host] = novo_atraso
+            self._liberado_em[host] = max(self._liberado_em.get(host, 0), time.monotonic() + novo_atraso)
+            return novo_atraso
+
+    def registrar_sucesso(self, url):
+        """Reduz gradualmente o backoff do host após um download bem-sucedido."""
+        host = self._host(url)
+        with self._lock:
+            atraso_atual = self._atraso.get(host, 0)
+            self._atraso[host] = atraso_atual // 2 if atraso_atual > RETRY_DELAY else 0
+
+
+class ProgressoAgregado:
+    """Barra única (em bytes) compartilhada por todos os downloads simultâneos."""
+    def __init__(self, total_arquivos):
+        self._lock = threading.Lock()
+        self.total_arquivos = total_arquivos
+        self.arquivos_concluidos = 0
+        self.arquivos_com_falha = 0
+        self.barra = tqdm(
+            desc=f"Progresso Download (0/{total_arquivos} arquivos)",
+            total=0,
+            unit='iB',
+            unit_scale=True,
+            unit_divisor=1024
+        )
+
+    def adicionar_total(self, n_bytes):
+        with self._lock:
+            self.barra.total += n_bytes
+            self.barra.refresh()
+
+    def atualizar(self, n_bytes):
+        with self._lock:
+            self.barra.update(n_bytes)
+
+    def descontar(self, n_bytes_pendentes):
+        """Remove do total os bytes que não chegaram numa tentativa interrompida (o parcial é retomado)."""
+        with self._lock:
+            self.barra.total -= n_bytes_pendentes
+            self.barra.refresh()
+
+    def arquivo_finalizado(self, sucesso):
+        with self._lock:
+            if sucesso:
+                self.arquivos_concluidos += 1
+            else:
+                self.arquivos_com_falha += 1
+            self.barra.set_description(
+                f"Progresso Download ({self.arquivos_concluidos}/{self.total_arquivos} arquivos"
+                f", {self.arquivos_com_falha} falhas)"
+            )
+
+    def fechar(self):
+        self.barra.close()
 
 # --- Funções Auxiliares ---
 
@@ -17,7 +157,7 @@ def encontrar_diretorio_mais_recente(url):
     """Busca a página e retorna o nome do subdiretório mais recente (ex: '2025-11')."""
     print(f"Buscando o diretório mais recente em: {url}")
     try:
-        response = requests.get(url)
+        response = _sessao_http().get(url, timeout=60)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -46,7 +186,7 @@ def encontrar_arquivos_zip(url_diretorio):
     """Busca a página da versão e retorna uma lista de URLs de arquivos .zip."""
     print(f"Buscando arquivos .zip em: {url_diretorio}")
     try:
-        response = requests.get(url_diretorio)
+        response = _sessao_http().get(url_diretorio, timeout=60)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -62,48 +202,492 @@ def encontrar_arquivos_zip(url_diretorio):
         print(f"ERRO ao acessar a URL do diretório de dados: {e}")
         return []
 
-def obter_arquivos_existentes(diretorio_destino):
-    """Retorna um set com os nomes dos arquivos .zip que já existem no diretório de destino (e têm tamanho mínimo)."""
+class ManifestoDownload:
+    """
+    Manifesto do período (manifesto_download.json): URL, Content-Length, ETag/Last-Modified
+    e SHA-256 de cada ZIP baixado. Permite validar os arquivos locais sem baixá-los de novo.
+    """
+    def __init__(self, diretorio_destino):
+        self.caminho = os.path.join(diretorio_destino, NOME_MANIFESTO)
+        self._lock = threading.Lock()
+        self.entradas = self._carregar()
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"AVISO: Manifesto {self.caminho} ilegível ({e}). Todos os arquivos serão revalidados.")
+            return {}
+
+    def _salvar(self):
+        # Escrita atômica: um manifesto corrompido invalidaria todos os arquivos do período
+        caminho_temp = self.caminho + '.tmp'
+        with open(caminho_temp, 'w', encoding='utf-8') as f:
+            json.dump(self.entradas, f, indent=2, ensure_ascii=False)
+        os.replace(caminho_temp, self.caminho)
+
+    def obter(self, nome_arquivo):
+        with self._lock:
+            entrada = self.entradas.get(nome_arquivo)
+            return dict(entrada) if entrada else None
+
+    def registrar(self, nome_arquivo, entrada):
+        with self._lock:
+            self.entradas[nome_arquivo] = entrada
+            self._salvar()
+
+def verificar_arquivo_local(url_arquivo, caminho_completo, manifesto):
+    """
+    Confere um ZIP local contra o manifesto e o servidor com um HEAD condicional (If-None-Match).
+    Retorna True se o arquivo está completo e é igual ao remoto (nenhum byte do ZIP é transferido nem relido).
+    Só com VERIFICAR_SHA256_LOCAL (--verificar) o SHA-256 registrado é conferido contra o arquivo local, o que
+    relê o ZIP inteiro.
+    """
+    nome_arquivo = os.path.basename(caminho_completo)
+    tamanho_local = os.path.getsize(caminho_completo)
+    entrada = manifesto.obter(nome_arquivo)
+    
+    # 1. Arquivo truncado em relação ao que foi registrado no download
+    if entrada and entrada.get('content_length') and tamanho_local != entrada['content_length']:
+        print(f"-> {nome_arquivo}: tamanho local ({tamanho_local}) difere do manifesto ({entrada['content_length']}). Será baixado novamente.")
+        return False
+    
+    # 2. Requisição condicional: 304 significa que o arquivo remoto não mudou
+    headers = {}
+    if entrada and entrada.get('etag'):
+        headers['If-None-Match'] = entrada['etag']
+    if entrada and entrada.get('last_modified'):
+        headers['If-Modified-Since'] = entrada['last_modified']
+    try:
+        response = _sessao_http().head(url_arquivo, headers=headers, timeout=60, allow_redirects=True)
+        if response.status_code == 304:
+            return entrada is not None and _sha256_confere(caminho_completo, entrada)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        # Sem resposta do servidor, confia apenas no que o manifesto já confirmou
+        print(f"    AVISO: Não foi possível validar {nome_arquivo} no servidor ({e}).")
+        return entrada is not None and _sha256_confere(caminho_completo, entrada)
+    
+    tamanho_remoto = int(response.headers.get('content-length', 0))
+    etag_remoto = response.headers.get('ETag')
+    
+    if entrada:
+        etag_mudou = etag_remoto and entrada.get('etag') and etag_remoto != entrada['etag']
+        tamanho_mudou = tamanho_remoto and tamanho_remoto != entrada.get('content_length')
+        if etag_mudou or tamanho_mudou:
+            print(f"-> {nome_arquivo}: arquivo remoto foi alterado desde o último download. Será baixado novamente.")
+            return False
+        return _sha256_confere(caminho_completo, entrada)
+    
+    # 3. Arquivo baixado antes da existência do manifesto: aceita só se o tamanho bater com o remoto
+    if tamanho_remoto and tamanho_local == tamanho_remoto:
+        manifesto.registrar(nome_arquivo, {
+            'url': url_arquivo,
+            'content_length': tamanho_remoto,
+            'etag': etag_remoto,
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': None, # Não calculado: o arquivo não passou pelo download com hash
+        })
+        return True
+    
+    print(f"-> {nome_arquivo}: tamanho local ({tamanho_local}) difere do remoto ({tamanho_remoto}). Será baixado novamente.")
+    return False
+
+def _sha256_confere(caminho_completo, entrada):
+    """
+    Com VERIFICAR_SHA256_LOCAL, confere o arquivo local com o SHA-256 do manifesto (do arquivo inteiro ou, nos
+    downloads segmentados, de cada faixa). True se a verificação está desligada ou não há hash registrado.
+    """
+    if not VERIFICAR_SHA256_LOCAL:
+        return True
+    if entrada.get('segmentos'):
+        confere = all(_sha256_da_faixa(caminho_completo, inicio, fim) == sha256 for inicio, fim, sha256 in entrada['segmentos'])
+    elif entrada.get('sha256'):
+        hasher = hashlib.sha256()
+        _hash_do_parcial(caminho_completo, hasher)
+        confere = hasher.hexdigest() == entrada['sha256']
+    else:
+        return True
+    if confere:
+        return True
+    print(f"-> {os.path.basename(caminho_completo)}: SHA-256 local difere do manifesto (arquivo corrompido). Será baixado novamente.")
+    return False
+
+def obter_arquivos_existentes(diretorio_destino, arquivos_zip_urls=None, manifesto=None):
+    """
+    Retorna um set com os nomes dos arquivos .zip que já existem no diretório de destino (e têm tamanho mínimo).
+    Com `manifesto` e as URLs, cada arquivo também é validado por verificar_arquivo_local (truncados e alterados ficam de fora).
+    """
     if not os.path.exists(diretorio_destino):
         return set()
+    
+    urls_por_nome = {url.split('/')[-1]: url for url in (arquivos_zip_urls or [])}
         
     arquivos_locais = set()
     for nome in os.listdir(diretorio_destino):
         if nome.lower().endswith('.zip') and os.path.isfile(os.path.join(diretorio_destino, nome)):
             # Garante que o arquivo não é um arquivo "vazio" (0KB).
-            if os.path.getsize(os.path.join(diretorio_destino, nome)) > 1024:
-                arquivos_locais.add(nome)
+            if os.path.getsize(os.path.join(diretorio_destino, nome)) <= 1024:
+                continue
+            if manifesto is not None and nome in urls_por_nome:
+                if not verificar_arquivo_local(urls_por_nome[nome], os.path.join(diretorio_destino, nome), manifesto):
+                    continue
+            arquivos_locais.add(nome)
             
     return arquivos_locais
 
-def baixar_arquivo(url_arquivo, diretorio_destino):
-    """Baixa o arquivo .zip com retry e barra de progresso."""
+def _caminho_parcial(caminho_completo):
+    """Caminho do arquivo temporário usado enquanto o download não termina."""
+    return caminho_completo + SUFIXO_PARCIAL
+
+def _ler_validador_parcial(caminho_completo):
+    """Retorna o validador (ETag ou Last-Modified) salvo junto ao .part, se existir."""
+    try:
+        with open(_caminho_parcial(caminho_completo) + SUFIXO_VALIDADOR, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _salvar_validador_parcial(caminho_completo, validador):
+    caminho_validador = _caminho_parcial(caminho_completo) + SUFIXO_VALIDADOR
+    if not validador:
+        _remover_silenciosamente(caminho_validador)
+        return
+    with open(caminho_validador, 'w', encoding='utf-8') as f:
+        f.write(validador)
+
+def _remover_silenciosamente(caminho):
+    if os.path.exists(caminho):
+        try:
+            os.remove(caminho)
+        except Exception:
+            pass
+
+def _descartar_parcial(caminho_completo):
+    """Remove o .part e o validador associado (usado quando a retomada não é possível)."""
+    caminho_parcial = _caminho_parcial(caminho_completo)
+    _remover_silenciosamente(caminho_parcial)
+    _remover_silenciosamente(caminho_parcial + SUFIXO_VALIDADOR)
+
+def _validador_da_resposta(response):
+    """ETag forte é o validador preferido para If-Range; Last-Modified é o fallback."""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def _hash_do_parcial(caminho_parcial, hasher):
+    """Alimenta o hash com os bytes já existentes no .part (ao retomar um download ou após montar os segmentos)."""
+    with open(caminho_parcial, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(bloco)
+
+def _sha256_da_faixa(caminho, inicio, fim):
+    """SHA-256 dos bytes [inicio, fim] do arquivo (verificação dos downloads segmentados)."""
+    hasher = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        f.seek(inicio)
+        restante = fim + 1 - inicio
+        while restante > 0:
+            bloco = f.read(min(1024 * 1024, restante))
+            if not bloco:
+                break
+            hasher.update(bloco)
+            restante -= len(bloco)
+    return hasher.hexdigest()
+
+def _escrever_posicional(fd, dados, posicao):
+    """Escreve `dados` na posição absoluta do arquivo (pwrite no POSIX; seek+write no descritor próprio do segmento no Windows)."""
+    if hasattr(os, 'pwrite'):
+        while dados:
+            escritos = os.pwrite(fd, dados, posicao)
+            dados = dados[escritos:]
+            posicao += escritos
+    else:
+        os.lseek(fd, posicao, os.SEEK_SET)
+        while dados:
+            escritos = os.write(fd, dados)
+            dados = dados[escritos:]
+
+def _baixar_segmento(url_arquivo, caminho_parcial, inicio, fim, validador, atualizar_progresso, controle_hosts=None):
+    """
+    Baixa a faixa [inicio, fim] com retry, escrevendo no lugar dentro do .part pré-alocado.
+    Em caso de falha, a nova tentativa continua do último byte gravado da faixa.
+    Com `controle_hosts`, as esperas seguem o backoff adaptativo do host (429/503 são reportados como throttling).
+    Retorna o SHA-256 da faixa, calculado na mesma passada da escrita (as retomadas continuam o mesmo hash).
+    """
+    posicao = inicio
+    hasher = hashlib.sha256()
+    flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    fd = os.open(caminho_parcial, flags)
+    try:
+        for attempt in range(MAX_RETRIES):
+            try:
+                if controle_hosts:
+                    controle_hosts.aguardar_liberacao(url_arquivo)
+                headers = {'Range': f'bytes={posicao}-{fim}', 'If-Range': validador}
+                with _sessao_http().get(url_arquivo, stream=True, timeout=300, headers=headers) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206 or _inicio_content_range(response) != posicao:
+                        # O arquivo remoto mudou (If-Range falhou) ou o servidor ignorou o Range
+                        raise ValueError(f"Servidor não respeitou a faixa {posicao}-{fim} (HTTP {response.status_code}).")
+                    for chunk in response.iter_content(TAMANHO_BLOCO_DOWNLOAD):
+                        chunk = chunk[:fim + 1 - posicao]
+                        _escrever_posicional(fd, chunk, posicao)
+                        hasher.update(chunk)
+                        posicao += len(chunk)
+                        atualizar_progresso(len(chunk))
+                if posicao == fim + 1:
+                    return hasher.hexdigest()
+                raise requests.exceptions.ConnectionError(f"Faixa {inicio}-{fim} incompleta ({posicao - inicio} bytes).")
+            except (requests.exceptions.RequestException, ConnectionResetError, ConnectionAbortedError) as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                espera = RETRY_DELAY
+                if controle_hosts:
+                    espera = controle_hosts.registrar_falha(url_arquivo, throttling=_indica_throttling(e))
+                print(f"    ERRO no segmento {inicio}-{fim} (Tentativa {attempt + 1}): {e}. Retomando em {espera}s...")
+                time.sleep(espera)
+    finally:
+        os.close(fd)
+
+def _reservar_conexoes_extras(controle_hosts, url_arquivo):
+    """
+    Reserva, sem bloquear, até NUMERO_SEGMENTOS - 1 vagas extras no semáforo do host.
+    A thread que chama já ocupa uma vaga (baixar_arquivos_concorrente), usada pelo primeiro segmento.
+    Retorna quantas vagas extras foram obtidas; devem ser devolvidas com _liberar_conexoes_extras.
+    """
+    semaforo = controle_hosts.semaforo(url_arquivo)
+    extras = 0
+    while extras < NUMERO_SEGMENTOS - 1 and semaforo.acquire(blocking=False):
+        extras += 1
+    return extras
+
+def _liberar_conexoes_extras(controle_hosts, url_arquivo, extras):
+    semaforo = controle_hosts.semaforo(url_arquivo)
+    for _ in range(extras):
+        semaforo.release()
+
+def _tentar_download_segmentado(url_arquivo, caminho_completo, progresso=None, manifesto=None, controle_hosts=None):
+    """
+    Baixa um ZIP grande em faixas paralelas sobre a sessão compartilhada.
+    O número de faixas respeita o limite de conexões do host: no modo concorrente usa a vaga já ocupada
+    pelo arquivo mais as vagas livres no momento (até NUMERO_SEGMENTOS); no sequencial, até MAX_CONEXOES_POR_HOST.
+    Retorna False (sem efeitos colaterais) quando o arquivo é pequeno, o servidor não aceita Range,
+    não há vagas extras no host ou algum segmento falha; nesse caso baixar_arquivo segue com o download em fluxo único.
+    """
+    try:
+        head = _sessao_http().head(url_arquivo, timeout=60, allow_redirects=True)
+        head.raise_for_status()
+    except requests.exceptions.RequestException:
+        return False
+    
+    tamanho_total = int(head.headers.get('content-length', 0))
+    validador = _validador_da_resposta(head)
+    if (tamanho_total < TAMANHO_MINIMO_SEGMENTADO or not validador
+            or head.headers.get('Accept-Ranges', '').lower() != 'bytes'):
+        return False
+    
+    if controle_hosts:
+        extras = _reservar_conexoes_extras(controle_hosts, url_arquivo)
+        try:
+            return _baixar_em_segmentos(url_arquivo, caminho_completo, head, tamanho_total, validador,
+                                        1 + extras, progresso, manifesto, controle_hosts)
+        finally:
+            _liberar_conexoes_extras(controle_hosts, url_arquivo, extras)
+    
+    numero_segmentos = min(NUMERO_SEGMENTOS, MAX_CONEXOES_POR_HOST)
+    return _baixar_em_segmentos(url_arquivo, caminho_completo, head, tamanho_total, validador,
+                                numero_segmentos, progresso, manifesto)
+
+def _baixar_em_segmentos(url_arquivo, caminho_completo, head, tamanho_total, validador, numero_segmentos,
+                         progresso=None, manifesto=None, controle_hosts=None):
+    """
+    Executa o download segmentado em `numero_segmentos` conexões e publica o ZIP.
+    Os segmentos chegam fora de ordem: o manifesto registra o SHA-256 de cada faixa, calculado durante a escrita,
+    e 'sha256' fica None (o arquivo não é relido para um hash do arquivo inteiro).
+    """
+    nome_arquivo = os.path.basename(caminho_completo)
+    caminho_parcial = _caminho_parcial(caminho_completo)
+    if numero_segmentos < 2:
+        return False
+    
+    tamanho_segmento = -(-tamanho_total // numero_segmentos)
+    faixas = [(inicio, min(inicio + tamanho_segmento, tamanho_total) - 1)
+              for inicio in range(0, tamanho_total, tamanho_segmento)]
+    print(f"-> Baixando {nome_arquivo} em {len(faixas)} segmentos paralelos ({tamanho_total} bytes)...")
+    
+    # Pré-aloca o .part para que cada segmento escreva diretamente na sua posição final
+    with open(caminho_parcial, 'wb') as f:
+        f.truncate(tamanho_total)
+    
+    if progresso:
+        progresso.adicionar_total(tamanho_total)
+    
+    try:
+        with tqdm(desc=f"  {nome_arquivo}", total=tamanho_total, unit='iB', unit_scale=True,
+                  unit_divisor=1024, leave=False, disable=progresso is not None) as barra:
+            lock_barra = threading.Lock()
+            
+            def _atualizar_progresso(n_bytes):
+                with lock_barra:
+                    barra.update(n_bytes)
+                if progresso:
+                    progresso.atualizar(n_bytes)
+            
+            with ThreadPoolExecutor(max_workers=len(faixas)) as executor:
+                futuros = [executor.submit(_baixar_segmento, url_arquivo, caminho_parcial, inicio, fim,
+                                           validador, _atualizar_progresso, controle_hosts)
+                           for inicio, fim in faixas]
+                hashes_segmentos = [futuro.result() for futuro in futuros]
+    except Exception as e:
+        print(f"    ERRO no download segmentado de {nome_arquivo}: {e}. Usando download em fluxo único.")
+        if progresso:
+            progresso.descontar(tamanho_total)
+        # Um .part segmentado tem lacunas: não pode ser retomado sequencialmente
+        _descartar_parcial(caminho_completo)
+        return False
+    
+    os.replace(caminho_parcial, caminho_completo)
+    
+    if manifesto is not None:
+        manifesto.registrar(nome_arquivo, {
+            'url': url_arquivo,
+            'content_length': tamanho_total,
+            'etag': head.headers.get('ETag'),
+            'last_modified': head.headers.get('Last-Modified'),
+            'sha256': None,
+            'segmentos': [[inicio, fim, sha256] for (inicio, fim), sha256 in zip(faixas, hashes_segmentos)],
+        })
+    print(f"    Download segmentado de {nome_arquivo} concluído com sucesso.")
+    return True
+
+def baixar_arquivo(url_arquivo, diretorio_destino, progresso=None, controle_hosts=None, manifesto=None):
+    """
+    Baixa o arquivo .zip com retry e barra de progresso.
+    O conteúdo é gravado em '<nome>.zip.part' e retomado via HTTP Range nas tentativas seguintes
+    (ou na próxima execução); o arquivo final só aparece, por rename atômico, quando está completo.
+    No modo concorrente recebe o `progresso` agregado e o `controle_hosts` (limite por host e backoff adaptativo).
+    Com `manifesto`, o SHA-256 é calculado na mesma passada da escrita e registrado ao final.
+    Arquivos grandes são baixados em faixas paralelas quando DOWNLOAD_SEGMENTADO está ativo.
+    """
     nome_arquivo = url_arquivo.split('/')[-1]
     caminho_completo = os.path.join(diretorio_destino, nome_arquivo)
+    caminho_parcial = _caminho_parcial(caminho_completo)
+    
+    # Um .part existente vem de um download em fluxo único: prefere-se retomá-lo
+    if DOWNLOAD_SEGMENTADO and not os.path.exists(caminho_parcial):
+        if controle_hosts:
+            controle_hosts.aguardar_liberacao(url_arquivo)
+        if _tentar_download_segmentado(url_arquivo, caminho_completo, progresso, manifesto, controle_hosts):
+            if controle_hosts:
+                controle_hosts.registrar_sucesso(url_arquivo)
+            return True
     
     for attempt in range(MAX_RETRIES):
+        total_size_in_bytes = 0
+        bytes_baixados = 0
         try:
-            print(f"-> Baixando {nome_arquivo} (Tentativa {attempt + 1}/{MAX_RETRIES})...")
+            if controle_hosts:
+                controle_hosts.aguardar_liberacao(url_arquivo)
+            
+            # 1. Verifica se há um download parcial que pode ser retomado
+            offset = os.path.getsize(caminho_parcial) if os.path.exists(caminho_parcial) else 0
+            validador = _ler_validador_parcial(caminho_completo)
+            headers = {}
+            if offset > 0 and validador:
+                # If-Range: o servidor só responde 206 se o arquivo remoto não mudou; senão envia tudo (200)
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validador
+            elif offset > 0:
+                # Sem validador não há como garantir que o parcial é do mesmo arquivo
+                _descartar_parcial(caminho_completo)
+                offset = 0
+                
+            if offset > 0:
+                print(f"-> Retomando {nome_arquivo} a partir de {offset} bytes (Tentativa {attempt + 1}/{MAX_RETRIES})...")
+            else:
+                print(f"-> Baixando {nome_arquivo} (Tentativa {attempt + 1}/{MAX_RETRIES})...")
+            
+            response = _sessao_http().get(url_arquivo, stream=True, timeout=300, headers=headers) 
             
-            response = requests.get(url_arquivo, stream=True, timeout=300) 
+            if response.status_code == 416:
+                # Range inválido (parcial maior que o remoto): recomeça do zero na próxima tentativa
+                response.close()
+                _descartar_parcial(caminho_completo)
+                raise requests.exceptions.RequestException(f"Range {offset}- recusado (416). Download será reiniciado.")
             response.raise_for_status() 
 
+            hasher = hashlib.sha256()
+            if response.status_code == 206:
+                inicio_recebido = _inicio_content_range(response)
+                if inicio_recebido != offset:
+                    # Faixa diferente da pedida: anexá-la (ou gravá-la como arquivo completo) corromperia o ZIP
+                    response.close()
+                    _descartar_parcial(caminho_completo)
+                    raise requests.exceptions.RequestException(
+                        f"Servidor respondeu 206 a partir do byte {inicio_recebido} (pedido: {offset}). Download será reiniciado."
+                    )
+                modo_escrita = 'ab'
+                _hash_do_parcial(caminho_parcial, hasher)
+            else:
+                # 200: servidor ignorou o Range ou o validador mudou, download completo
+                if offset > 0:
+                    print(f"    Servidor não aceitou a retomada de {nome_arquivo}. Reiniciando do byte 0.")
+                offset = 0
+                modo_escrita = 'wb'
+                _salvar_validador_parcial(caminho_completo, _validador_da_resposta(response))
+
             total_size_in_bytes = int(response.headers.get('content-length', 0))
-            block_size = 8192 
+            tamanho_esperado = offset + total_size_in_bytes if total_size_in_bytes else 0
+            block_size = TAMANHO_BLOCO_DOWNLOAD 
+            
+            if progresso:
+                progresso.adicionar_total(total_size_in_bytes)
             
-            with open(caminho_completo, 'wb') as file:
+            with open(caminho_parcial, modo_escrita) as file:
                 with tqdm(
                     desc=f"  {nome_arquivo}",
-                    total=total_size_in_bytes,
+                    total=tamanho_esperado,
+                    initial=offset,
                     unit='iB',
                     unit_scale=True,
                     unit_divisor=1024,
-                    leave=False 
+                    leave=False,
+                    disable=progresso is not None # No modo concorrente só a barra agregada é exibida
                 ) as bar:
                     for chunk in response.iter_content(block_size):
                         bar.update(len(chunk))
                         file.write(chunk)
+                        hasher.update(chunk)
+                        bytes_baixados += len(chunk)
+                        if progresso:
+                            progresso.atualizar(len(chunk))
+
+            if tamanho_esperado and os.path.getsize(caminho_parcial) != tamanho_esperado:
+                raise requests.exceptions.ConnectionError(
+                    f"Download incompleto ({os.path.getsize(caminho_parcial)} de {tamanho_esperado} bytes)."
+                )
+
+            # 2. Download completo: publica o arquivo final de forma atômica
+            tamanho_final = os.path.getsize(caminho_parcial)
+            os.replace(caminho_parcial, caminho_completo)
+            _remover_silenciosamente(caminho_parcial + SUFIXO_VALIDADOR)
+            
+            if manifesto is not None:
+                manifesto.registrar(nome_arquivo, {
+                    'url': url_arquivo,
+                    'content_length': tamanho_final,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'sha256': hasher.hexdigest(),
+                })
 
+            if controle_hosts:
+                controle_hosts.registrar_sucesso(url_arquivo)
             print(f"    Download de {nome_arquivo} concluído com sucesso.")
             return True
 
@@ -115,27 +699,69 @@ def baixar_arquivo(url_arquivo, diretorio_destino):
             
             print(f"    ERRO ao baixar {nome_arquivo} (Tentativa {attempt + 1}): {e}")
             
+            if progresso:
+                progresso.descontar(max(0, total_size_in_bytes - bytes_baixados))
+            
             if attempt < MAX_RETRIES - 1:
-                print(f"    Aguardando {RETRY_DELAY}s para tentar novamente...")
-                time.sleep(RETRY_DELAY)
-                
-                # Tenta remover o arquivo parcial
-                if os.path.exists(caminho_completo):
-                    try:
-                        os.remove(caminho_completo)
-                        print(f"    Arquivo parcial {nome_arquivo} removido.")
-                    except Exception:
-                        pass 
+                espera = RETRY_DELAY
+                if controle_hosts:
+                    espera = controle_hosts.registrar_falha(url_arquivo, throttling=_indica_throttling(e))
+                print(f"    Aguardando {espera}s para tentar novamente (o parcial {nome_arquivo}{SUFIXO_PARCIAL} será retomado)...")
+                time.sleep(espera)
             else:
                 print(f"    Limite de {MAX_RETRIES} tentativas excedido para {nome_arquivo}. Falha final.")
-                # Tenta remover o arquivo parcial na falha final
-                if os.path.exists(caminho_completo):
-                    try:
-                        os.remove(caminho_completo)
-                    except Exception:
-                        pass
+                # O .part é mantido: a próxima execução retoma de onde parou
                 return False
 
+def _inicio_content_range(response):
+    """Extrai o byte inicial do cabeçalho Content-Range ('bytes 100-199/200')."""
+    match = re.match(r'bytes\s+(\d+)-', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+def _indica_throttling(erro):
+    """True se o erro indica que o servidor está limitando as conexões (429/5xx ou conexão resetada)."""
+    if isinstance(erro, (ConnectionResetError, ConnectionAbortedError)):
+        return True
+    resposta = getattr(erro, 'response', None)
+    if resposta is not None and resposta.status_code in STATUS_HTTP_THROTTLING:
+        return True
+    return isinstance(erro, requests.exceptions.ConnectionError) and 'reset' in str(erro).lower()
+
+def baixar_arquivos_concorrente(urls_arquivos, diretorio_destino, manifesto=None):
+    """
+    Baixa vários arquivos em paralelo com um pool de threads limitado.
+    Cada download continua usando baixar_arquivo (mesmos retries), mas respeitando o limite
+    de conexões por host e o backoff compartilhado. Retorna (concluidos, falhas).
+    """
+    controle_hosts = ControleDeHosts(MAX_CONEXOES_POR_HOST)
+    progresso = ProgressoAgregado(len(urls_arquivos))
+    
+    def _tarefa(url_arquivo):
+        with controle_hosts.semaforo(url_arquivo):
+            return baixar_arquivo(url_arquivo, diretorio_destino, progresso, controle_hosts, manifesto)
+    
+    concluidos = 0
+    falhas = 0
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_SIMULTANEOS) as executor:
+            futuros = {executor.submit(_tarefa, url): url for url in urls_arquivos}
+            for futuro in as_completed(futuros):
+                try:
+                    sucesso = futuro.result()
+                except Exception as e:
+                    print(f"    ERRO inesperado no download de {futuros[futuro].split('/')[-1]}: {e}")
+                    sucesso = False
+                    
+                progresso.arquivo_finalizado(sucesso)
+                if sucesso:
+                    concluidos += 1
+                else:
+                    falhas += 1
+    finally:
+        progresso.fechar()
+        
+    return concluidos, falhas
+
 # --- Lógica Principal da Fase (executar_download) ---
 
 def executar_download():
@@ -175,8 +801,9 @@ def executar_download():
     else:
         print(f"\nDiretório para o período {diretorio_versao} já existe: {diretorio_destino}")
 
-    # 2. Obtém lista de arquivos já baixados/existentes
-    arquivos_locais = obter_arquivos_existentes(diretorio_destino)
+    # 2. Obtém lista de arquivos já baixados/existentes (validados contra o manifesto e o servidor)
+    manifesto = ManifestoDownload(diretorio_destino)
+    arquivos_locais = obter_arquivos_existentes(diretorio_destino, arquivos_zip_urls, manifesto)
     
     # 3. Determina quais arquivos precisam ser baixados
     arquivos_a_baixar_urls = []
@@ -206,11 +833,17 @@ def executar_download():
     downloads_concluidos = total_arquivos - arquivos_restantes 
     downloads_com_falha = 0
     
-    for url_arquivo in arquivos_a_baixar_urls:
-        if baixar_arquivo(url_arquivo, diretorio_destino):
-            downloads_concluidos += 1
-        else:
-            downloads_com_falha += 1
+    if DOWNLOADS_CONCORRENTES and arquivos_restantes > 1:
+        print(f"Modo concorrente: até {MAX_DOWNLOADS_SIMULTANEOS} downloads simultâneos ({MAX_CONEXOES_POR_HOST} por host).")
+        concluidos, falhas = baixar_arquivos_concorrente(arquivos_a_baixar_urls, diretorio_destino, manifesto)
+        downloads_concluidos += concluidos
+        downloads_com_falha += falhas
+    else:
+        for url_arquivo in arquivos_a_baixar_urls:
+            if baixar_arquivo(url_arquivo, diretorio_destino, manifesto=manifesto):
+                downloads_concluidos += 1
+            else:
+                downloads_com_falha += 1
 
     print("-" * 45)
     print(f"Processo de download finalizado.")
@@ -223,4 +856,8 @@ def executar_download():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fase 1: download dos ZIPs do período mais recente da RF.")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Relê os ZIPs já baixados e confere o SHA-256 registrado no manifesto.")
+    VERIFICAR_SHA256_LOCAL = VERIFICAR_SHA256_LOCAL or parser.parse_args().verificar
     executar_download()
\ No newline at end of file
@@ -0,0 +1,210 @@
+# filtro_leads.py - Filtros declarativos de leads (JSON/YAML ou expressão de linha de comando) compilados em máscaras vetorizadas
+#
+# Especificação: coluna -> condição, todas combinadas com E.
+#   {
+#     "uf": ["SP", "RJ"],                                 valor único = igualdade, lista = IN
+#     "porte_empresa": "05",
+#     "capital_social": {"min": 10000, "max": 500000},    faixa (capital_social e datas)
+#     "data_inicio_atividade": {"min": "2020-01-01"},     datas em AAAA-MM-DD ou AAAAMMDD
+#     "cnae_fiscal_principal": {"prefixo": ["62", "63"]}, prefixo (texto/códigos, ex.: CNAE, CEP)
+#     "correio_eletronico": {"presente": true}            preenchido (true) ou vazio (false)
+#   }
+# Expressão equivalente: "uf in SP,RJ; porte_empresa = 05; capital_social >= 10000; capital_social <= 500000;
+#                         data_inicio_atividade >= 2020-01-01; cnae_fiscal_principal ^= 62,63; correio_eletronico presente"
+
+import json
+import os
+import re
+from functools import reduce
+from operator import and_
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# YAML é opcional: sem PyYAML, só especificações JSON/expressões são aceitas
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# --- Configurações do Filtro ---
+OPERADORES_FILTRO = ('em', 'min', 'max', 'prefixo', 'presente')
+COLUNAS_NUMERICAS_FILTRO = {'capital_social'}
+COLUNAS_DATA_FILTRO = {'data_inicio_atividade', 'data_situacao_cadastral'} # Texto AAAAMMDD no mestre
+
+# Cláusula da expressão: "<coluna> <operador> [valor]"; cláusulas separadas por ';'
+PADRAO_CLAUSULA = re.compile(r'^\s*(\w+)\s*(>=|<=|\^=|=|\bin\b|\bpresente\b|\bausente\b)\s*(.*?)\s*$', re.IGNORECASE)
+
+# ==============================================================================
+# 1. LEITURA E VALIDAÇÃO DA ESPECIFICAÇÃO
+# ==============================================================================
+
+def _lista(valor) -> list:
+    return list(valor) if isinstance(valor, (list, tuple)) else [valor]
+
+def _data_aaaammdd(valor) -> str:
+    """'2020-01-31' ou '20200131' -> '20200131' (mesmo formato das datas no mestre)."""
+    digitos = re.sub(r'\D', '', str(valor))
+    if len(digitos) != 8:
+        raise ValueError(f"Data inválida no filtro: '{valor}' (use AAAA-MM-DD ou AAAAMMDD).")
+    return digitos
+
+def interpretar_expressao(expressao: str) -> dict:
+    """Converte a expressão de linha de comando na especificação (dict)."""
+    filtro: Dict[str, dict] = {}
+    for clausula in filter(str.strip, expressao.split(';')):
+        encontrado = PADRAO_CLAUSULA.match(clausula)
+        if not encontrado:
+            raise ValueError(f"Cláusula de filtro inválida: '{clausula.strip()}'.")
+        coluna, operador, valor = encontrado.group(1), encontrado.group(2).lower(), encontrado.group(3)
+        if operador not in ('presente', 'ausente') and not valor:
+            raise ValueError(f"Cláusula sem valor: '{clausula.strip()}'.")
+        condicao = filtro.setdefault(coluna, {})
+        if operador == '=':
+            condicao.setdefault('em', []).append(valor)
+        elif operador == 'in':
+            condicao.setdefault('em', []).extend(v.strip() for v in valor.split(',') if v.strip())
+        elif operador == '>=':
+            condicao['min'] = valor
+        elif operador == '<=':
+            condicao['max'] = valor
+        elif operador == '^=':
+            condicao.setdefault('prefixo', []).extend(v.strip() for v in valor.split(',') if v.strip())
+        else:
+            condicao['presente'] = operador == 'presente'
+    return filtro
+
+def validar_filtro(filtro: dict, colunas_validas: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Normaliza a especificação: cada coluna vira um dict só com OPERADORES_FILTRO ('igual' é absorvido por 'em',
+    valores viram texto, datas viram AAAAMMDD e faixas de capital viram float). Erros de especificação -> ValueError.
+    """
+    if not isinstance(filtro, dict):
+        raise ValueError("O filtro deve ser um objeto coluna -> condição.")
+
+    normalizado: Dict[str, dict] = {}
+    for coluna, condicao in filtro.items():
+        if colunas_validas is not None and coluna not in colunas_validas:
+            raise ValueError(f"Coluna desconhecida no filtro: '{coluna}'.")
+        if not isinstance(condicao, dict):
+            condicao = {'em': _lista(condicao)}
+        desconhecidos = set(condicao) - set(OPERADORES_FILTRO) - {'igual'}
+        if desconhecidos:
+            raise ValueError(f"Operador desconhecido em '{coluna}': {sorted(desconhecidos)}. Opções: igual, {', '.join(OPERADORES_FILTRO)}.")
+
+        regra = {}
+        valores = _lista(condicao.get('igual', [])) + _lista(condicao.get('em', []))
+        if valores:
+            regra['em'] = [str(valor) for valor in valores]
+        for limite in ('min', 'max'):
+            if condicao.get(limite) is None:
+                continue
+            if coluna in COLUNAS_DATA_FILTRO:
+                regra[limite] = _data_aaaammdd(condicao[limite])
+            elif coluna in COLUNAS_NUMERICAS_FILTRO:
+                regra[limite] = float(str(condicao[limite]).replace(',', '.'))
+            else:
+                raise ValueError(f"Faixa só é aceita em {sorted(COLUNAS_NUMERICAS_FILTRO | COLUNAS_DATA_FILTRO)} (recebido: '{coluna}').")
+        if condicao.get('prefixo'):
+            regra['prefixo'] = [str(prefixo) for prefixo in _lista(condicao['prefixo'])]
+        if 'presente' in condicao:
+            regra['presente'] = bool(condicao['presente'])
+        if regra:
+            normalizado[coluna] = regra
+    return normalizado
+
+def carregar_filtro(origem: str, colunas_validas: Optional[List[str]] = None) -> Dict[str, dict]:
+    """`origem` é um arquivo .json/.yaml/.yml ou uma expressão de filtro. Retorna a especificação validada."""
+    if os.path.isfile(origem):
+        with open(origem, 'r', encoding='utf-8') as f:
+            if origem.lower().endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise ValueError("Filtro em YAML requer o pacote PyYAML (pip install pyyaml) ou use JSON.")
+                filtro = yaml.safe_load(f) or {}
+            else:
+                filtro = json.load(f)
+    else:
+        filtro = interpretar_expressao(origem)
+    return validar_filtro(filtro, colunas_validas)
+
+# ==============================================================================
+# 2. COMPILAÇÃO EM MÁSCARAS (PANDAS) E EXPRESSÕES (PYARROW)
+# ==============================================================================
+
+class PredicadoFiltro:
+    """
+    Predicado de linha compilado a partir da especificação (mesma interface dos PREDICADOS_LEITURA).
+    Com `na_leitura=True` a condição é relaxada para manter linhas em que a coluna é nula: no mestre cada linha
+    vem de uma só tabela (EMPRE, SOCIO...), e essas linhas ainda são necessárias para montar o lead; o filtro
+    exato é reaplicado sobre o lead agregado.
+    """
+    def __init__(self, filtro: Dict[str, dict], na_leitura: bool = False):
+        self.filtro = filtro
+        self.na_leitura = na_leitura
+
+    def _mascara_coluna(self, serie: pd.Series, coluna: str, regra: dict) -> np.ndarray:
+        mascara = np.ones(len(serie), dtype=bool)
+        if 'em' in regra:
+            if coluna in COLUNAS_NUMERICAS_FILTRO:
+                mascara &= pd.to_numeric(serie, errors='coerce').isin([float(v.replace(',', '.')) for v in regra['em']]).to_numpy()
+            else:
+                mascara &= serie.astype(object).isin(regra['em']).to_numpy()
+        if 'min' in regra or 'max' in regra:
+            numeros = pd.to_numeric(serie.astype(object), errors='coerce').to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore'):
+                if 'min' in regra:
+                    mascara &= numeros >= float(regra['min'])
+                if 'max' in regra:
+                    mascara &= numeros <= float(regra['max'])
+        if 'prefixo' in regra:
+            textos = serie.astype('string') # Também cobre colunas só com nulos (float) vindas do Parquet
+            mascara &= reduce(np.logical_or, [textos.str.startswith(prefixo).fillna(False).to_numpy(dtype=bool) for prefixo in regra['prefixo']])
+        if 'presente' in regra:
+            mascara &= serie.notna().to_numpy() == regra['presente']
+        if self.na_leitura:
+            mascara |= serie.isna().to_numpy()
+        return mascara
+
+    def __call__(self, bloco: pd.DataFrame) -> np.ndarray:
+        mascara = np.ones(len(bloco), dtype=bool)
+        for coluna, regra in self.filtro.items():
+            mascara &= self._mascara_coluna(bloco[coluna], coluna, regra)
+        return mascara
+
+    def expressao_arrow(self, schema):
+        """
+        Mesmo predicado como expressão do pyarrow.dataset, para o dataset Parquet filtrar na leitura (poda de
+        partições, p.ex. uf=..., e de row groups pelas estatísticas). Colunas fora do `schema` ficam só na máscara.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        expressoes = []
+        for coluna, regra in self.filtro.items():
+            if coluna not in schema.names:
+                continue
+            campo = ds.field(coluna)
+            numerico = pa.types.is_floating(schema.field(coluna).type) or pa.types.is_integer(schema.field(coluna).type)
+            texto = campo if numerico else campo.cast(pa.string()) # Dicionários não têm kernel de texto
+            condicoes = []
+            if 'em' in regra:
+                condicoes.append(texto.isin([float(v.replace(',', '.')) for v in regra['em']] if numerico else regra['em']))
+            if 'min' in regra:
+                condicoes.append(texto >= (regra['min'] if not numerico else float(regra['min'])))
+            if 'max' in regra:
+                condicoes.append(texto <= (regra['max'] if not numerico else float(regra['max'])))
+            if 'prefixo' in regra and not numerico:
+                condicoes.append(reduce(lambda a, b: a | b, [pc.starts_with(texto, prefixo) for prefixo in regra['prefixo']]))
+            if 'presente' in regra:
+                condicoes.append(campo.is_valid() if regra['presente'] else campo.is_null())
+            if not condicoes:
+                continue
+            expressao = reduce(and_, condicoes)
+            expressoes.append(expressao | campo.is_null() if self.na_leitura else expressao)
+        return reduce(and_, expressoes) if expressoes else None
+
+def compilar_filtro(filtro: Dict[str, dict], na_leitura: bool = False) -> PredicadoFiltro:
+    """Compila a especificação validada num predicado vetorizado (DataFrame -> máscara booleana)."""
+    return PredicadoFiltro(filtro, na_leitura)
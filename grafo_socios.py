@@ -0,0 +1,268 @@
+# grafo_socios.py - Grafo bipartido sócio <-> empresa (adjacência em CSR com NumPy, lida por memory-map)
+#
+# Estrutura (na pasta do período, em Grafo_socios/):
+#   socios_chaves.bin + socios_chaves_offsets.npy   chaves internadas dos sócios ("NOME|CPF/CNPJ"), em ordem alfabética
+#   empresas.npy                                    cnpj_basico (int32) ordenados; o id da empresa é a posição aqui
+#   socio_empresas_offsets.npy + socio_empresas.npy + socio_empresas_qualificacao.npy   sócio -> empresas (CSR)
+#   empresa_socios_offsets.npy + empresa_socios.npy + empresa_socios_qualificacao.npy   empresa -> sócios (CSR)
+
+import argparse
+import bisect
+import glob
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+# --- Configurações do Grafo ---
+NOME_DIRETORIO_GRAFO = 'Grafo_socios'
+LINHAS_POR_BLOCO_GRAFO = 1_000_000
+COLUNAS_SOCIO = ['cnpj_basico', 'nome_socio', 'cpf_cnpj_socio', 'qualificacao_socio']
+SEPARADOR_CHAVE_SOCIO = '|' # Chave do sócio: nome + documento (o CPF vem mascarado e sozinho não identifica a pessoa)
+SALTOS_PADRAO_GRUPO = 2
+LIMITE_EMPRESAS_GRUPO = 10_000 # Teto da busca em largura (sócios "hub", como fundos, ligam milhares de empresas)
+LIMITE_RESULTADOS_GRAFO = 20
+
+# ==============================================================================
+# 1. LEITURA DAS LINHAS DE SÓCIOS DO MESTRE
+# ==============================================================================
+
+def _iterar_socios(caminho_mestre: str) -> Iterator[pd.DataFrame]:
+    """Linhas SOCIO do mestre: no dataset Parquet só a partição TABELA_ORIGEM=SOCIO é lida; no CSV, só as 5 colunas usadas."""
+    if os.path.isdir(caminho_mestre):
+        import pyarrow.dataset as ds
+        arquivos = glob.glob(os.path.join(caminho_mestre, 'TABELA_ORIGEM=SOCIO', '**', '*.parquet'), recursive=True)
+        if not arquivos:
+            return
+        dataset = ds.dataset(arquivos, format='parquet')
+        for lote in dataset.to_batches(columns=COLUNAS_SOCIO, batch_size=LINHAS_POR_BLOCO_GRAFO):
+            yield lote.to_pandas().astype(object)
+        return
+
+    leitor = pd.read_csv(caminho_mestre, sep=';', encoding='utf-8', usecols=COLUNAS_SOCIO + ['TABELA_ORIGEM'], dtype=str,
+                         keep_default_na=False, na_values=[''], chunksize=LINHAS_POR_BLOCO_GRAFO)
+    with leitor:
+        for bloco in leitor:
+            yield bloco.loc[bloco['TABELA_ORIGEM'] == 'SOCIO', COLUNAS_SOCIO]
+
+def _chaves_socios(bloco: pd.DataFrame) -> pd.Series:
+    nome = bloco['nome_socio'].fillna('').astype(str).str.strip().str.upper()
+    documento = bloco['cpf_cnpj_socio'].fillna('').astype(str).str.strip()
+    return nome + SEPARADOR_CHAVE_SOCIO + documento
+
+# ==============================================================================
+# 2. CONSTRUÇÃO (ARESTAS -> CSR NOS DOIS SENTIDOS)
+# ==============================================================================
+
+def _csr(origens: np.ndarray, destinos: np.ndarray, atributos: np.ndarray, total_origens: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Arestas -> (offsets, vizinhos ordenados, atributo de cada aresta)."""
+    ordem = np.lexsort((destinos, origens))
+    offsets = np.zeros(total_origens + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origens, minlength=total_origens), out=offsets[1:])
+    return offsets, destinos[ordem].astype(np.int32), atributos[ordem]
+
+def construir_grafo_socios(caminho_mestre: str, diretorio_grafo: str) -> Tuple[int, int, int]:
+    """Grava o grafo em `diretorio_grafo`. Retorna (sócios, empresas, arestas)."""
+    ids_socios: Dict[str, int] = {}
+    socios_lotes, empresas_lotes, qualificacoes_lotes = [], [], []
+    for bloco in tqdm(_iterar_socios(caminho_mestre), desc="Lendo sócios", unit=" bloco"):
+        bloco = bloco[bloco['cnpj_basico'].notna() & (bloco['nome_socio'].notna() | bloco['cpf_cnpj_socio'].notna())]
+        if bloco.empty:
+            continue
+        codigos, unicos = pd.factorize(_chaves_socios(bloco))
+        for chave in unicos:
+            ids_socios.setdefault(chave, len(ids_socios))
+        mapa = np.fromiter((ids_socios[chave] for chave in unicos), dtype=np.int64, count=len(unicos))
+        socios_lotes.append(mapa[codigos])
+        empresas_lotes.append(pd.to_numeric(bloco['cnpj_basico'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64))
+        qualificacoes_lotes.append(pd.to_numeric(bloco['qualificacao_socio'], errors='coerce').fillna(-1).to_numpy(dtype=np.int16))
+
+    vazio = np.array([], dtype=np.int64)
+    socios = np.concatenate(socios_lotes) if socios_lotes else vazio
+    cnpjs = np.concatenate(empresas_lotes) if empresas_lotes else vazio
+    qualificacoes = np.concatenate(qualificacoes_lotes) if qualificacoes_lotes else vazio.astype(np.int16)
+    validos = cnpjs >= 0
+    socios, cnpjs, qualificacoes = socios[validos], cnpjs[validos], qualificacoes[validos]
+
+    # Sócios em ordem alfabética da chave (busca binária por nome direto no arquivo mapeado)
+    chaves = np.array(list(ids_socios), dtype=object)
+    ordem = np.argsort(chaves, kind='stable')
+    posicao_alfabetica = np.empty(len(ordem), dtype=np.int64)
+    posicao_alfabetica[ordem] = np.arange(len(ordem))
+    socios = posicao_alfabetica[socios]
+    empresas = np.unique(cnpjs)
+    ids_empresas = np.searchsorted(empresas, cnpjs)
+
+    # Uma aresta por par (sócio, empresa): a primeira qualificação lida é mantida
+    _, primeiras = np.unique((socios << 32) | ids_empresas, return_index=True)
+    socios, ids_empresas, qualificacoes = socios[primeiras], ids_empresas[primeiras], qualificacoes[primeiras]
+
+    os.makedirs(diretorio_grafo, exist_ok=True)
+    chaves_bytes = [chave.encode('utf-8') for chave in chaves[ordem].tolist()]
+    with open(os.path.join(diretorio_grafo, 'socios_chaves.bin'), 'wb') as f:
+        f.write(b''.join(chaves_bytes))
+    offsets_chaves = np.zeros(len(chaves_bytes) + 1, dtype=np.int64)
+    np.cumsum([len(chave) for chave in chaves_bytes], out=offsets_chaves[1:])
+    arrays = {'socios_chaves_offsets': offsets_chaves, 'empresas': empresas.astype(np.int32)}
+    arrays.update(zip(('socio_empresas_offsets', 'socio_empresas', 'socio_empresas_qualificacao'),
+                      _csr(socios, ids_empresas, qualificacoes, len(chaves))))
+    arrays.update(zip(('empresa_socios_offsets', 'empresa_socios', 'empresa_socios_qualificacao'),
+                      _csr(ids_empresas, socios, qualificacoes, len(empresas))))
+    for nome, array in arrays.items():
+        np.save(os.path.join(diretorio_grafo, f"{nome}.npy"), array)
+    return len(chaves), len(empresas), len(socios)
+
+# ==============================================================================
+# 3. CONSULTAS
+# ==============================================================================
+
+class GrafoSocios:
+    """Consultas no grafo por memory-map: cada passo lê só as listas de adjacência tocadas."""
+    def __init__(self, diretorio_grafo: str):
+        def carregar(nome):
+            return np.load(os.path.join(diretorio_grafo, f"{nome}.npy"), mmap_mode='r')
+        self.chaves_bytes = np.memmap(os.path.join(diretorio_grafo, 'socios_chaves.bin'), dtype=np.uint8, mode='r') \
+            if os.path.getsize(os.path.join(diretorio_grafo, 'socios_chaves.bin')) else np.array([], dtype=np.uint8)
+        self.chaves_offsets = carregar('socios_chaves_offsets')
+        self.empresas = carregar('empresas')
+        self.socio_empresas = (carregar('socio_empresas_offsets'), carregar('socio_empresas'), carregar('socio_empresas_qualificacao'))
+        self.empresa_socios = (carregar('empresa_socios_offsets'), carregar('empresa_socios'), carregar('empresa_socios_qualificacao'))
+        self.total_socios = len(self.chaves_offsets) - 1
+
+    def chave(self, id_socio: int) -> str:
+        return self.chaves_bytes[self.chaves_offsets[id_socio]:self.chaves_offsets[id_socio + 1]].tobytes().decode('utf-8')
+
+    def id_empresa(self, cnpj_basico: str) -> Optional[int]:
+        posicao = int(np.searchsorted(self.empresas, int(cnpj_basico)))
+        return posicao if posicao < len(self.empresas) and self.empresas[posicao] == int(cnpj_basico) else None
+
+    @staticmethod
+    def _vizinhos(adjacencia, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(origem, vizinho, qualificação) de todas as arestas que saem de `ids`, sem laço Python por nó."""
+        offsets, vizinhos, qualificacoes = adjacencia
+        inicios = np.asarray(offsets[ids])
+        tamanhos = np.asarray(offsets[ids + 1]) - inicios
+        posicoes = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos) + np.arange(int(tamanhos.sum()))
+        return np.repeat(ids, tamanhos), np.asarray(vizinhos[posicoes]), np.asarray(qualificacoes[posicoes])
+
+    def buscar_socios(self, nome: str, limite: int = LIMITE_RESULTADOS_GRAFO) -> List[int]:
+        """Sócios cujo nome começa por `nome` (sem diferenciar maiúsculas)."""
+        prefixo = nome.strip().upper()
+        inicio = bisect.bisect_left(range(self.total_socios), prefixo, key=self.chave)
+        ids = []
+        while inicio < self.total_socios and len(ids) < limite and self.chave(inicio).startswith(prefixo):
+            ids.append(inicio)
+            inicio += 1
+        return ids
+
+    def socios_da_empresa(self, cnpj_basico: str) -> List[Tuple[int, int]]:
+        """[(id do sócio, qualificação)] da empresa."""
+        id_empresa = self.id_empresa(cnpj_basico)
+        if id_empresa is None:
+            return []
+        _, socios, qualificacoes = self._vizinhos(self.empresa_socios, np.array([id_empresa]))
+        return list(zip(socios.tolist(), qualificacoes.tolist()))
+
+    def empresas_do_socio(self, id_socio: int) -> List[Tuple[str, int]]:
+        """[(cnpj_basico, qualificação)] das empresas em que o sócio participa."""
+        _, empresas, qualificacoes = self._vizinhos(self.socio_empresas, np.array([id_socio]))
+        return [(f"{cnpj:08d}", qualificacao) for cnpj, qualificacao in zip(np.asarray(self.empresas[empresas]).tolist(), qualificacoes.tolist())]
+
+    def cosocios(self, id_socio: int) -> List[Tuple[int, int]]:
+        """[(id do sócio, empresas em comum)] dos outros sócios das empresas do sócio, mais ligados primeiro."""
+        _, empresas, _ = self._vizinhos(self.socio_empresas, np.array([id_socio]))
+        _, socios, _ = self._vizinhos(self.empresa_socios, empresas)
+        socios, comuns = np.unique(socios[socios != id_socio], return_counts=True)
+        ordem = np.argsort(-comuns, kind='stable')
+        return list(zip(socios[ordem].tolist(), comuns[ordem].tolist()))
+
+    def grupo_economico(self, cnpj_basico: str, saltos: int = SALTOS_PADRAO_GRUPO,
+                        limite_empresas: int = LIMITE_EMPRESAS_GRUPO) -> List[str]:
+        """
+        Empresas alcançadas a partir de `cnpj_basico` em até `saltos` passos empresa -> sócio -> empresa
+        (busca em largura com a fronteira expandida em bloco). Para em `limite_empresas`.
+        """
+        id_inicial = self.id_empresa(cnpj_basico)
+        if id_inicial is None:
+            return []
+        visitadas = np.array([id_inicial], dtype=np.int64)
+        socios_visitados = np.array([], dtype=np.int64)
+        fronteira = visitadas
+        for _ in range(saltos):
+            _, socios, _ = self._vizinhos(self.empresa_socios, fronteira)
+            socios = np.setdiff1d(socios, socios_visitados)
+            socios_visitados = np.union1d(socios_visitados, socios)
+            _, empresas, _ = self._vizinhos(self.socio_empresas, socios.astype(np.int64))
+            fronteira = np.setdiff1d(empresas, visitadas).astype(np.int64)
+            if not len(fronteira):
+                break
+            visitadas = np.union1d(visitadas, fronteira[:max(limite_empresas - len(visitadas), 0)])
+            if len(visitadas) >= limite_empresas:
+                print(f"AVISO: Grupo limitado a {limite_empresas} empresas.")
+                break
+        return [f"{cnpj:08d}" for cnpj in np.asarray(self.empresas[visitadas]).tolist()]
+
+# ==============================================================================
+# WRAPPERS
+# ==============================================================================
+
+def gerar_grafo_socios(caminho_mestre: str) -> bool:
+    """Gera Grafo_socios/ ao lado do mestre (CSV ou dataset Parquet); a pasta antiga só é trocada no fim."""
+    diretorio = os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), NOME_DIRETORIO_GRAFO)
+    diretorio_temp = diretorio + '.tmp'
+    inicio = time.time()
+    try:
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        total_socios, total_empresas, total_arestas = construir_grafo_socios(caminho_mestre, diretorio_temp)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_temp, diretorio)
+    except Exception as e:
+        print(f"🛑 ERRO ao gerar o grafo de sócios: {e}")
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        return False
+    print(f"✅ Grafo de sócios gerado em {diretorio}: {total_socios} sócios, {total_empresas} empresas, "
+          f"{total_arestas} vínculos em {time.time() - inicio:.2f}s.")
+    return True
+
+def _abrir_grafo_mais_recente() -> Optional[GrafoSocios]:
+    from processador_de_leads import _encontrar_caminho_mestre
+    caminho_mestre = _encontrar_caminho_mestre()
+    diretorio = os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), NOME_DIRETORIO_GRAFO) if caminho_mestre else None
+    if not diretorio or not os.path.isdir(diretorio):
+        print("FALHA: Grafo de sócios não encontrado. Execute a consolidação (organizer_cnpj) com GERAR_GRAFO_SOCIOS ativo.")
+        return None
+    return GrafoSocios(diretorio)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Consultas no grafo sócio <-> empresa.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    empresa = subcomandos.add_parser('empresa', help="Sócios da empresa e as outras empresas de cada sócio.")
+    empresa.add_argument('cnpj_basico')
+    socio = subcomandos.add_parser('socio', help="Sócios pelo início do nome, com empresas e co-sócios.")
+    socio.add_argument('nome')
+    grupo = subcomandos.add_parser('grupo', help="Empresas ligadas por sócios em comum (n saltos).")
+    grupo.add_argument('cnpj_basico')
+    grupo.add_argument('--saltos', type=int, default=SALTOS_PADRAO_GRUPO)
+    argumentos = parser.parse_args()
+
+    grafo = _abrir_grafo_mais_recente()
+    if grafo:
+        inicio = time.perf_counter()
+        if argumentos.comando == 'empresa':
+            for id_socio, qualificacao in grafo.socios_da_empresa(argumentos.cnpj_basico):
+                outras = [cnpj for cnpj, _ in grafo.empresas_do_socio(id_socio) if cnpj != argumentos.cnpj_basico.zfill(8)]
+                print(f"{grafo.chave(id_socio)} (qualificação {qualificacao}): {len(outras)} outra(s) empresa(s) {outras[:LIMITE_RESULTADOS_GRAFO]}")
+        elif argumentos.comando == 'socio':
+            for id_socio in grafo.buscar_socios(argumentos.nome):
+                empresas = grafo.empresas_do_socio(id_socio)
+                cosocios = grafo.cosocios(id_socio)[:LIMITE_RESULTADOS_GRAFO]
+                print(f"{grafo.chave(id_socio)}: {len(empresas)} empresa(s) {[cnpj for cnpj, _ in empresas[:LIMITE_RESULTADOS_GRAFO]]}")
+                print(f"  co-sócios: {[(grafo.chave(s), comuns) for s, comuns in cosocios]}")
+        else:
+            empresas = grafo.grupo_economico(argumentos.cnpj_basico, argumentos.saltos)
+            print(f"{len(empresas)} empresa(s) no grupo de {argumentos.cnpj_basico} ({argumentos.saltos} salto(s)): {empresas[:LIMITE_RESULTADOS_GRAFO]}")
+        print(f"Consulta em {(time.perf_counter() - inicio) * 1000:.1f} ms")
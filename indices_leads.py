@@ -0,0 +1,369 @@
+# indices_leads.py - Índices em disco sobre os leads da fase 7 (listas invertidas em CSR, lidas por memory-map)
+#
+# Estrutura (ao lado do mestre, em Indices_leads/):
+#   documentos.npy          CNPJ completo (int64, 14 dígitos) de cada lead; o id do lead é a posição aqui
+#   nomes/termos.npy        vocabulário ordenado (palavras sem acento de razão social, nome fantasia e sócios)
+#   nomes/termos_offsets.npy + nomes/termos_postings.npy    termo -> ids de leads (CSR: ids ordenados, sem repetição)
+#   nomes/trigramas.npy + nomes/trigramas_offsets.npy + nomes/trigramas_postings.npy    trigrama -> ids de termos
+#   cnaes/codigos.npy       códigos CNAE (subclasse, int32) ordenados
+#   cnaes/{principal,todos}_offsets.npy + _postings.npy     CNAE -> ids de leads (só principal / principal + secundários)
+#   cnaes/resumo_<nivel>_{prefixos,leads}.npy               leads distintos por divisão, grupo e classe (principal + secundários)
+
+import argparse
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import processador_de_leads as leads
+
+# --- Configurações dos Índices ---
+DIRETORIO_INDICES_NOME = 'Indices_leads'
+LINHAS_POR_LOTE_INDICE = 500_000
+TAMANHO_MINIMO_TERMO = 2
+TAMANHO_MAXIMO_TERMO = 32 # Termos mais longos são truncados (vocabulário com largura fixa)
+COLUNAS_INDICE_NOMES = ['razao_social', 'nome_fantasia', 'nome_socio']
+
+# Ranking da busca por nome: cada palavra da consulta soma peso x idf do termo encontrado
+PESO_TERMO_EXATO = 1.0
+PESO_TERMO_PREFIXO = 0.8 # Palavra da consulta é início do termo ("padar" -> "padaria")
+PESO_TERMO_APROXIMADO = 0.6 # Multiplicado pela similaridade de trigramas (só quando não há termo exato)
+LIMIAR_SIMILARIDADE_TRIGRAMAS = 0.4
+MAXIMO_TERMOS_EXPANSAO = 200 # Termos considerados por palavra da consulta (prefixo/aproximado)
+LIMITE_RESULTADOS_BUSCA = 20
+
+# CNAE (subclasse com 7 dígitos): prefixos de divisão, grupo e classe para os resumos
+DIGITOS_CNAE = 7
+NIVEIS_CNAE = {'divisao': 2, 'grupo': 3, 'classe': 5}
+
+PADRAO_TERMO = re.compile(r'[a-z0-9]+')
+
+# ==============================================================================
+# 1. LISTAS INVERTIDAS EM CSR
+# ==============================================================================
+
+def _montar_csr(chaves: np.ndarray, valores: np.ndarray, total_chaves: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pares (chave, valor) -> (offsets, postings): os valores de cada chave ficam ordenados e sem repetição."""
+    pares = np.unique((chaves.astype(np.int64) << 32) | valores.astype(np.int64))
+    chaves_ordenadas = pares >> 32
+    offsets = np.zeros(total_chaves + 1, dtype=np.int64)
+    np.cumsum(np.bincount(chaves_ordenadas, minlength=total_chaves), out=offsets[1:])
+    return offsets, (pares & 0xFFFFFFFF).astype(np.int32)
+
+def _gravar_arrays(diretorio: str, **arrays: np.ndarray) -> None:
+    os.makedirs(diretorio, exist_ok=True)
+    for nome, array in arrays.items():
+        np.save(os.path.join(diretorio, f"{nome}.npy"), array)
+
+def _carregar_array(diretorio: str, nome: str) -> np.ndarray:
+    return np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode='r')
+
+def diretorio_indices(caminho_mestre: str) -> str:
+    """Índices ficam na pasta do período, ao lado do mestre (CSV, dataset Parquet ou saída do joiner)."""
+    return os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), DIRETORIO_INDICES_NOME)
+
+# ==============================================================================
+# 2. ÍNDICE DE NOMES (TERMOS + TRIGRAMAS)
+# ==============================================================================
+
+def _termos_do_texto(texto: str) -> List[str]:
+    return [termo[:TAMANHO_MAXIMO_TERMO] for termo in PADRAO_TERMO.findall(leads._normalizar_busca(texto))
+            if len(termo) >= TAMANHO_MINIMO_TERMO]
+
+def _trigramas(termo: bytes) -> List[bytes]:
+    marcado = b'$' + termo + b'$'
+    return [marcado[i:i + 3] for i in range(len(marcado) - 2)]
+
+def _construir_indice_nomes(df_final: pd.DataFrame, diretorio: str) -> int:
+    """Grava o índice de nomes em `diretorio`. Retorna o tamanho do vocabulário."""
+    ids_termos: Dict[str, int] = {}
+    chaves_lotes: List[np.ndarray] = []
+    linhas_lotes: List[np.ndarray] = []
+    for inicio in tqdm(range(0, len(df_final), LINHAS_POR_LOTE_INDICE), desc="Indexando nomes", unit=" lote"):
+        lote = df_final.iloc[inicio:inicio + LINHAS_POR_LOTE_INDICE]
+        texto = leads._texto(lote[COLUNAS_INDICE_NOMES[0]]).fillna('')
+        for coluna in COLUNAS_INDICE_NOMES[1:]:
+            texto = texto + ' ' + leads._texto(lote[coluna]).fillna('')
+        termos = texto.map(_termos_do_texto)
+        quantidades = termos.str.len().to_numpy()
+        termos = termos.explode().dropna()
+        if termos.empty:
+            continue
+        codigos, unicos = pd.factorize(termos)
+        for termo in unicos:
+            ids_termos.setdefault(termo, len(ids_termos))
+        mapa = np.fromiter((ids_termos[termo] for termo in unicos), dtype=np.int64, count=len(unicos))
+        chaves_lotes.append(mapa[codigos])
+        linhas_lotes.append(np.repeat(np.arange(inicio, inicio + len(lote), dtype=np.int64), quantidades))
+
+    # Vocabulário em ordem alfabética (busca binária/prefixo direto no array mapeado)
+    vocabulario = np.array(list(ids_termos), dtype=f'S{TAMANHO_MAXIMO_TERMO}')
+    ordem = np.argsort(vocabulario, kind='stable')
+    posicao_alfabetica = np.empty(len(ordem), dtype=np.int64)
+    posicao_alfabetica[ordem] = np.arange(len(ordem))
+    chaves = posicao_alfabetica[np.concatenate(chaves_lotes)] if chaves_lotes else np.array([], dtype=np.int64)
+    linhas = np.concatenate(linhas_lotes) if linhas_lotes else np.array([], dtype=np.int64)
+    termos_offsets, termos_postings = _montar_csr(chaves, linhas, len(vocabulario))
+    vocabulario = vocabulario[ordem]
+    del chaves, linhas, chaves_lotes, linhas_lotes
+
+    # Trigramas -> termos (busca aproximada)
+    pares = [(trigrama, id_termo) for id_termo, termo in enumerate(vocabulario.tolist()) for trigrama in _trigramas(termo)]
+    trigramas_pares = np.array([trigrama for trigrama, _ in pares], dtype='S3')
+    trigramas, codigos = np.unique(trigramas_pares, return_inverse=True)
+    trigramas_offsets, trigramas_postings = _montar_csr(codigos.ravel(), np.array([id_termo for _, id_termo in pares], dtype=np.int64), len(trigramas))
+
+    _gravar_arrays(diretorio, termos=vocabulario, termos_offsets=termos_offsets, termos_postings=termos_postings,
+                   trigramas=trigramas, trigramas_offsets=trigramas_offsets, trigramas_postings=trigramas_postings)
+    return len(vocabulario)
+
+class IndiceNomes:
+    """Consulta o índice de nomes por memory-map: nada é carregado além das listas tocadas pela consulta."""
+    def __init__(self, diretorio_indices_leads: str):
+        diretorio = os.path.join(diretorio_indices_leads, 'nomes')
+        self.documentos = _carregar_array(diretorio_indices_leads, 'documentos')
+        self.termos = _carregar_array(diretorio, 'termos')
+        self.termos_offsets = _carregar_array(diretorio, 'termos_offsets')
+        self.termos_postings = _carregar_array(diretorio, 'termos_postings')
+        self.trigramas = _carregar_array(diretorio, 'trigramas')
+        self.trigramas_offsets = _carregar_array(diretorio, 'trigramas_offsets')
+        self.trigramas_postings = _carregar_array(diretorio, 'trigramas_postings')
+
+    def _postings(self, id_termo: int) -> np.ndarray:
+        return self.termos_postings[self.termos_offsets[id_termo]:self.termos_offsets[id_termo + 1]]
+
+    def _termos_aproximados(self, termo: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """Termos com similaridade de trigramas (Jaccard) >= LIMIAR_SIMILARIDADE_TRIGRAMAS."""
+        trigramas = sorted(set(_trigramas(termo)))
+        posicoes = np.searchsorted(self.trigramas, trigramas)
+        listas = [self.trigramas_postings[self.trigramas_offsets[p]:self.trigramas_offsets[p + 1]]
+                  for p, trigrama in zip(posicoes, trigramas) if p < len(self.trigramas) and self.trigramas[p] == trigrama]
+        if not listas:
+            return np.array([], dtype=np.int64), np.array([])
+        candidatos, comuns = np.unique(np.concatenate(listas), return_counts=True)
+        tamanhos = np.char.str_len(self.termos[candidatos]) # Termo de tamanho n tem n trigramas (com as marcas '$')
+        similaridade = comuns / (len(trigramas) + tamanhos - comuns)
+        aceitos = np.flatnonzero(similaridade >= LIMIAR_SIMILARIDADE_TRIGRAMAS)
+        aceitos = aceitos[np.argsort(-similaridade[aceitos], kind='stable')][:MAXIMO_TERMOS_EXPANSAO]
+        return candidatos[aceitos], similaridade[aceitos]
+
+    def _pesos_do_termo(self, termo: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids de termos do vocabulário, peso) para uma palavra da consulta: exato, prefixo ou aproximado."""
+        inicio = int(np.searchsorted(self.termos, termo))
+        fim = int(np.searchsorted(self.termos, termo + b'\xff'))
+        ids = np.arange(inicio, min(fim, inicio + MAXIMO_TERMOS_EXPANSAO))
+        if len(ids):
+            pesos = np.where(self.termos[ids] == termo, PESO_TERMO_EXATO, PESO_TERMO_PREFIXO)
+            if pesos[0] == PESO_TERMO_EXATO:
+                return ids, pesos
+        aproximados, similaridade = self._termos_aproximados(termo)
+        novos = ~np.isin(aproximados, ids)
+        return (np.concatenate([ids, aproximados[novos]]),
+                np.concatenate([np.full(len(ids), PESO_TERMO_PREFIXO), PESO_TERMO_APROXIMADO * similaridade[novos]]))
+
+    def buscar(self, consulta: str, limite: int = LIMITE_RESULTADOS_BUSCA) -> List[Tuple[str, float]]:
+        """Retorna [(cnpj_basico, pontuação)] em ordem decrescente de relevância."""
+        total_documentos = max(len(self.documentos), 1)
+        linhas_consulta, pontos_consulta = [], []
+        for termo in dict.fromkeys(_termos_do_texto(consulta)):
+            ids, pesos = self._pesos_do_termo(termo.encode('ascii'))
+            if not len(ids):
+                continue
+            listas = [self._postings(int(id_termo)) for id_termo in ids]
+            linhas = np.concatenate(listas).astype(np.int64)
+            tamanhos = np.array([len(lista) for lista in listas])
+            idf = np.log1p(total_documentos / np.maximum(tamanhos, 1))
+            pontos = np.repeat(pesos * idf, tamanhos)
+            # Cada palavra da consulta conta uma vez por lead (o melhor termo encontrado)
+            ordem = np.lexsort((-pontos, linhas))
+            primeiros = np.r_[True, linhas[ordem][1:] != linhas[ordem][:-1]] if len(ordem) else np.array([], dtype=bool)
+            linhas_consulta.append(linhas[ordem][primeiros])
+            pontos_consulta.append(pontos[ordem][primeiros])
+        if not linhas_consulta:
+            return []
+
+        linhas, inverso = np.unique(np.concatenate(linhas_consulta), return_inverse=True)
+        pontos = np.bincount(inverso, weights=np.concatenate(pontos_consulta))
+        basicos = np.asarray(self.documentos[linhas]) // 1_000_000
+        # Um resultado por cnpj_basico (o estabelecimento mais bem pontuado)
+        ordem = np.lexsort((basicos, -pontos))
+        _, primeiros = np.unique(basicos[ordem], return_index=True)
+        melhores = ordem[np.sort(primeiros)][:limite]
+        return [(f"{basicos[i]:08d}", round(float(pontos[i]), 4)) for i in melhores]
+
+# ==============================================================================
+# 3. ÍNDICE DE CNAE (PRINCIPAL + SECUNDÁRIOS)
+# ==============================================================================
+
+def _cnaes_como_inteiros(serie: pd.Series) -> np.ndarray:
+    return pd.to_numeric(serie.str.replace(r'\D', '', regex=True), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+def _construir_indice_cnaes(df_final: pd.DataFrame, diretorio: str) -> int:
+    """Grava o índice CNAE -> leads em `diretorio`; a lista secundária é explodida uma única vez. Retorna o nº de CNAEs."""
+    linhas = np.arange(len(df_final), dtype=np.int64)
+    principais = _cnaes_como_inteiros(leads._texto(df_final['cnae_fiscal_principal']))
+    # Secundários: vírgula no arquivo da RF, SEPARADOR_AGREGACAO quando vários estabelecimentos foram agregados
+    secundarios = (leads._texto(df_final['cnae_fiscal_secundario']).fillna('')
+                   .str.replace(leads.SEPARADOR_AGREGACAO, ',', regex=False).str.split(','))
+    linhas_secundarios = np.repeat(linhas, secundarios.str.len().to_numpy())
+    secundarios = _cnaes_como_inteiros(secundarios.explode().fillna('').str.strip())
+
+    codigos_todos = np.concatenate([principais, secundarios])
+    linhas_todos = np.concatenate([linhas, linhas_secundarios])
+    validos = codigos_todos >= 0
+    codigos_todos, linhas_todos = codigos_todos[validos], linhas_todos[validos]
+
+    codigos = np.unique(codigos_todos)
+    todos_offsets, todos_postings = _montar_csr(np.searchsorted(codigos, codigos_todos), linhas_todos, len(codigos))
+    validos = principais >= 0
+    principal_offsets, principal_postings = _montar_csr(np.searchsorted(codigos, principais[validos]), linhas[validos], len(codigos))
+
+    # Resumos por prefixo: leads distintos (um lead com dois CNAEs do mesmo grupo conta uma vez)
+    resumos = {}
+    for nivel, digitos in NIVEIS_CNAE.items():
+        pares = np.unique(((codigos_todos // 10 ** (DIGITOS_CNAE - digitos)) << 32) | linhas_todos)
+        prefixos, leads_distintos = np.unique(pares >> 32, return_counts=True)
+        resumos[f"resumo_{nivel}_prefixos"] = prefixos.astype(np.int32)
+        resumos[f"resumo_{nivel}_leads"] = leads_distintos.astype(np.int64)
+
+    _gravar_arrays(diretorio, codigos=codigos.astype(np.int32),
+                   todos_offsets=todos_offsets, todos_postings=todos_postings,
+                   principal_offsets=principal_offsets, principal_postings=principal_postings, **resumos)
+    return len(codigos)
+
+class IndiceCnae:
+    """CNAE (ou prefixo de divisão/grupo/classe) -> leads, por memory-map e busca binária nos códigos ordenados."""
+    def __init__(self, diretorio_indices_leads: str):
+        self.diretorio = os.path.join(diretorio_indices_leads, 'cnaes')
+        self.documentos = _carregar_array(diretorio_indices_leads, 'documentos')
+        self.codigos = _carregar_array(self.diretorio, 'codigos')
+        self.listas = {nome: (_carregar_array(self.diretorio, f"{nome}_offsets"), _carregar_array(self.diretorio, f"{nome}_postings"))
+                       for nome in ('todos', 'principal')}
+
+    def leads(self, cnae: str, somente_principal: bool = False) -> np.ndarray:
+        """Ids dos leads com o CNAE (7 dígitos) ou com algum CNAE que comece pelo prefixo informado (ex.: '62', '6201')."""
+        digitos = re.sub(r'\D', '', cnae)
+        if not 1 <= len(digitos) <= DIGITOS_CNAE:
+            raise ValueError(f"CNAE inválido: '{cnae}' (informe de 1 a {DIGITOS_CNAE} dígitos).")
+        escala = 10 ** (DIGITOS_CNAE - len(digitos))
+        inicio, fim = np.searchsorted(self.codigos, [int(digitos) * escala, (int(digitos) + 1) * escala])
+        offsets, postings = self.listas['principal' if somente_principal else 'todos']
+        if fim - inicio == 1:
+            return np.asarray(postings[offsets[inicio]:offsets[fim]])
+        # Prefixo: as listas dos códigos da faixa são contíguas em postings; basta unir
+        return np.unique(postings[offsets[inicio]:offsets[fim]])
+
+    def cnpjs(self, ids: np.ndarray) -> List[str]:
+        return [f"{cnpj:014d}" for cnpj in np.asarray(self.documentos[ids]).tolist()]
+
+    def resumo(self, nivel: str) -> pd.DataFrame:
+        """Leads distintos por divisão, grupo ou classe CNAE (principal + secundários), já pré-calculados."""
+        if nivel not in NIVEIS_CNAE:
+            raise ValueError(f"Nível desconhecido: '{nivel}'. Opções: {', '.join(NIVEIS_CNAE)}.")
+        prefixos = _carregar_array(self.diretorio, f"resumo_{nivel}_prefixos")
+        return pd.DataFrame({nivel: [f"{prefixo:0{NIVEIS_CNAE[nivel]}d}" for prefixo in prefixos.tolist()],
+                             'leads': np.asarray(_carregar_array(self.diretorio, f"resumo_{nivel}_leads"))})
+
+# ==============================================================================
+# WRAPPERS
+# ==============================================================================
+
+def construir_indices_leads(df_final: pd.DataFrame, caminho_mestre: str, filtro: Optional[dict] = None) -> bool:
+    """
+    Gera os índices de lead (documentos, nomes e CNAEs) ao lado do mestre; a pasta antiga só é trocada no fim.
+    Os índices (e os resumos por prefixo CNAE) cobrem o período inteiro: com `filtro` de campanha, `df_final` é
+    só um recorte e a pasta existente é mantida.
+    """
+    if filtro:
+        print("AVISO: Filtro de campanha ativo: os índices de leads (que cobrem o período inteiro) não foram regravados.")
+        return False
+    diretorio = diretorio_indices(caminho_mestre)
+    diretorio_temp = diretorio + '.tmp'
+    inicio = time.time()
+    try:
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        _gravar_arrays(diretorio_temp, documentos=leads._cnpj_como_inteiro(df_final))
+        total_termos = _construir_indice_nomes(df_final, os.path.join(diretorio_temp, 'nomes'))
+        total_cnaes = _construir_indice_cnaes(df_final, os.path.join(diretorio_temp, 'cnaes'))
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_temp, diretorio)
+    except Exception as e:
+        print(f"🛑 ERRO ao gerar os índices de leads: {e}")
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        return False
+    print(f"✅ Índices de leads gerados em {diretorio} ({len(df_final)} leads, {total_termos} termos, {total_cnaes} CNAEs) em {time.time() - inicio:.2f}s.")
+    return True
+
+def _diretorio_indice_existente(subdiretorio: str) -> Optional[str]:
+    """Pasta de índices do mestre mais recente, se o índice `subdiretorio` já foi gerado pela fase 7."""
+    caminho_mestre = leads._encontrar_caminho_mestre()
+    if not caminho_mestre or not os.path.isdir(os.path.join(diretorio_indices(caminho_mestre), subdiretorio)):
+        print(f"FALHA: Índice '{subdiretorio}' não encontrado. Execute a fase 7 (processador_de_leads) antes da consulta.")
+        return None
+    return diretorio_indices(caminho_mestre)
+
+def executar_busca_nomes(consulta: str, limite: int = LIMITE_RESULTADOS_BUSCA) -> List[Tuple[str, float]]:
+    """Busca por nome no índice do mestre mais recente (gerado pela fase 7)."""
+    diretorio = _diretorio_indice_existente('nomes')
+    if not diretorio:
+        return []
+    inicio = time.perf_counter()
+    resultados = IndiceNomes(diretorio).buscar(consulta, limite)
+    print(f"{len(resultados)} resultado(s) para '{consulta}' em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    for cnpj_basico, pontos in resultados:
+        print(f"  {cnpj_basico}  {pontos:.4f}")
+    return resultados
+
+def executar_consulta_cnae(cnae: str, somente_principal: bool = False, limite: int = LIMITE_RESULTADOS_BUSCA) -> List[str]:
+    """Leads com o CNAE (ou prefixo) como principal ou secundário; devolve os CNPJs (todos) e mostra os `limite` primeiros."""
+    diretorio = _diretorio_indice_existente('cnaes')
+    if not diretorio:
+        return []
+    inicio = time.perf_counter()
+    indice = IndiceCnae(diretorio)
+    try:
+        cnpjs = indice.cnpjs(indice.leads(cnae, somente_principal))
+    except ValueError as e:
+        print(f"🛑 ERRO: {e}")
+        return []
+    print(f"{len(cnpjs)} lead(s) com CNAE {cnae}{' (principal)' if somente_principal else ''} em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    for cnpj in cnpjs[:limite]:
+        print(f"  {cnpj}")
+    return cnpjs
+
+def executar_resumo_cnae(nivel: str) -> Optional[pd.DataFrame]:
+    diretorio = _diretorio_indice_existente('cnaes')
+    if not diretorio:
+        return None
+    try:
+        resumo = IndiceCnae(diretorio).resumo(nivel)
+    except ValueError as e:
+        print(f"🛑 ERRO: {e}")
+        return None
+    print(resumo.sort_values('leads', ascending=False).to_string(index=False))
+    return resumo
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Consultas nos índices de leads gerados pela fase 7.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    nomes = subcomandos.add_parser('nomes', help="Busca por razão social, nome fantasia ou nome de sócio.")
+    nomes.add_argument('consulta')
+    nomes.add_argument('--limite', type=int, default=LIMITE_RESULTADOS_BUSCA)
+    cnae = subcomandos.add_parser('cnae', help="Leads com um CNAE (ou prefixo de divisão/grupo/classe) principal ou secundário.")
+    cnae.add_argument('codigo')
+    cnae.add_argument('--principal', action='store_true', help="Só o CNAE principal.")
+    cnae.add_argument('--limite', type=int, default=LIMITE_RESULTADOS_BUSCA)
+    resumo = subcomandos.add_parser('cnae-resumo', help="Leads por divisão, grupo ou classe CNAE.")
+    resumo.add_argument('--nivel', choices=list(NIVEIS_CNAE), default='divisao')
+    argumentos = parser.parse_args()
+    if argumentos.comando == 'nomes':
+        executar_busca_nomes(argumentos.consulta, argumentos.limite)
+    elif argumentos.comando == 'cnae':
+        executar_consulta_cnae(argumentos.codigo, argumentos.principal, argumentos.limite)
+    else:
+        executar_resumo_cnae(argumentos.nivel)
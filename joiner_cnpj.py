@@ -0,0 +1,287 @@
+# joiner_cnpj.py - Junção Relacional do Mestre: um estabelecimento por linha (ESTABELE ⋈ EMPRE ⋈ SIMPLES ⋈ SÓCIOS)
+
+import os
+import csv
+import zlib
+import shutil
+from tqdm import tqdm
+
+# Caminhos, formato do mestre e localização do período vêm da consolidação (fonte única)
+from organizer_cnpj import DIRETORIO_BASE, DELIMITADOR_PADRAO, _caminho_mestre_do_periodo, _encontrar_diretorio_mais_recente
+
+# --- Configurações Fixas ---
+NOME_ARQUIVO_JUNCAO = 'Leads_Estabelecimentos.csv'
+DIRETORIO_PARTICOES_NOME = 'Particoes_juncao'
+SEPARADOR_AGREGACAO = ' | ' # Mesmo separador usado pelo processador_de_leads
+
+# Nº de partições do hash join: a memória de cada etapa é ~1/N das tabelas EMPRE, SIMPLES e SOCIO
+NUMERO_PARTICOES_JUNCAO = 64
+
+# ==============================================================================
+# 1. ESQUEMA DA JUNÇÃO
+# ==============================================================================
+
+# Tabelas de dimensão (pequenas): resolvidas por dicionários em memória (código -> descrição)
+TABELAS_DIMENSAO = {
+    'MUNIC': ('codigo_municipio', 'nome_municipio'),
+    'CNAES': ('codigo_cnae', 'descricao_cnae'),
+    'NATJU': ('codigo_natureza_juridica', 'descricao_natureza_juridica'),
+    'QUALS': ('codigo_qualificacao', 'descricao_qualificacao'),
+    'PAIS': ('codigo_pais', 'descricao_pais'),
+    'MOTIVOS': ('codigo_motivo', 'descricao_motivo'),
+}
+
+# Tabelas fato (grandes): particionadas por cnpj_basico. Só as colunas usadas na saída são gravadas.
+COLUNAS_TABELAS_FATO = {
+    'ESTABELE': [
+        'cnpj_basico', 'cnpj_ordem', 'cnpj_dv', 'matriz_filial', 'nome_fantasia', 'situacao_cadastral',
+        'data_situacao_cadastral', 'motivo_situacao_cadastral', 'pais', 'data_inicio_atividade',
+        'cnae_fiscal_principal', 'cnae_fiscal_secundario', 'logradouro', 'numero', 'complemento', 'bairro',
+        'cep', 'uf', 'codigo_municipio', 'ddd_1', 'telefone_1', 'correio_eletronico',
+    ],
+    'EMPRE': ['cnpj_basico', 'razao_social', 'natureza_juridica', 'capital_social', 'porte_empresa'],
+    'SIMPLES': ['cnpj_basico', 'opcao_simples', 'opcao_mei'],
+    'SOCIO': ['cnpj_basico', 'nome_socio', 'cpf_cnpj_socio', 'qualificacao_socio'],
+}
+
+COLUNAS_SOCIO_AGREGADAS = ['nome_socio', 'cpf_cnpj_socio', 'qualificacao_socio', 'descricao_qualificacao']
+
+# Layout da saída: compatível com COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR do processador_de_leads
+CABECALHO_JUNCAO = [
+    'cnpj_basico', 'cnpj_ordem', 'cnpj_dv', 'matriz_filial',
+    'razao_social', 'nome_fantasia', 'data_inicio_atividade',
+    'situacao_cadastral', 'data_situacao_cadastral', 'motivo_situacao_cadastral', 'descricao_motivo',
+    'capital_social', 'porte_empresa', 'natureza_juridica', 'descricao_natureza_juridica',
+    'logradouro', 'numero', 'complemento', 'bairro', 'cep', 'uf', 'codigo_municipio', 'nome_municipio',
+    'pais', 'descricao_pais',
+    'ddd_1', 'telefone_1', 'correio_eletronico',
+    'cnae_fiscal_principal', 'descricao_cnae', 'cnae_fiscal_secundario',
+    'opcao_simples', 'opcao_mei',
+] + COLUNAS_SOCIO_AGREGADAS
+
+# ==============================================================================
+# 2. LEITURA DO MESTRE (CSV ÚNICO OU DATASET PARQUET)
+# ==============================================================================
+
+def _iterar_linhas_mestre(caminho_mestre):
+    """Gera (tabela_origem, linha_dict) para cada linha do mestre, em streaming, seja CSV ou Parquet."""
+    if os.path.isdir(caminho_mestre):
+        yield from _iterar_linhas_parquet(caminho_mestre)
+        return
+
+    with open(caminho_mestre, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=DELIMITADOR_PADRAO, quotechar='"')
+        cabecalho = next(reader, None)
+        if not cabecalho:
+            return
+        idx_origem = cabecalho.index('TABELA_ORIGEM')
+        for linha in reader:
+            if len(linha) != len(cabecalho):
+                continue
+            yield linha[idx_origem], dict(zip(cabecalho, linha))
+
+def _iterar_linhas_parquet(diretorio_parquet):
+    """Lê cada partição TABELA_ORIGEM=<tabela> do dataset em lotes, projetando só as colunas da junção."""
+    import pyarrow.dataset as ds
+
+    for nome_particao in sorted(os.listdir(diretorio_parquet)):
+        if not nome_particao.startswith('TABELA_ORIGEM='):
+            continue
+        tabela = nome_particao.split('=', 1)[1]
+        if tabela in TABELAS_DIMENSAO:
+            colunas = list(TABELAS_DIMENSAO[tabela])
+        elif tabela in COLUNAS_TABELAS_FATO:
+            colunas = COLUNAS_TABELAS_FATO[tabela]
+        else:
+            continue
+
+        dataset = ds.dataset(os.path.join(diretorio_parquet, nome_particao), format='parquet', partitioning='hive')
+        colunas = [coluna for coluna in colunas if coluna in dataset.schema.names]
+        for lote in dataset.to_batches(columns=colunas):
+            for linha in lote.to_pylist():
+                yield tabela, {chave: _texto_do_valor(valor) for chave, valor in linha.items()}
+
+def _texto_do_valor(valor):
+    """Volta um valor tipado do Parquet ao texto do CSV Mestre (capital_social com vírgula decimal, como na RF)."""
+    if valor is None:
+        return ''
+    if isinstance(valor, float):
+        return f"{valor:.2f}".replace('.', ',')
+    return str(valor)
+
+def _particao_do_cnpj(cnpj_basico, numero_particoes):
+    """Hash estável (crc32) do cnpj_basico: a mesma empresa cai na mesma partição em todas as tabelas."""
+    return zlib.crc32(cnpj_basico.encode('utf-8')) % numero_particoes
+
+# ==============================================================================
+# CLASSE PRINCIPAL PARA A JUNÇÃO
+# ==============================================================================
+
+class ProcessadorJuncao:
+    def __init__(self, caminho_mestre=None, numero_particoes=NUMERO_PARTICOES_JUNCAO):
+        self.numero_particoes = numero_particoes
+        self.diretorio_periodo = _encontrar_diretorio_mais_recente(DIRETORIO_BASE)
+        if not self.diretorio_periodo:
+            self.caminho_mestre = caminho_mestre
+            return
+
+        self.caminho_mestre = caminho_mestre or _caminho_mestre_do_periodo(self.diretorio_periodo)
+        self.diretorio_particoes = os.path.join(self.diretorio_periodo, DIRETORIO_PARTICOES_NOME)
+        self.caminho_saida = os.path.join(self.diretorio_periodo, NOME_ARQUIVO_JUNCAO)
+        self.dimensoes = {tabela: {} for tabela in TABELAS_DIMENSAO}
+
+    def _caminho_particao(self, tabela, indice):
+        return os.path.join(self.diretorio_particoes, f"{tabela}_{indice:04d}.csv")
+
+    def _particionar_mestre(self):
+        """
+        Passada única sobre o mestre: dimensões vão para dicionários em memória e as tabelas fato
+        são espalhadas em N arquivos por tabela segundo o hash do cnpj_basico (Grace hash join).
+        """
+        if os.path.exists(self.diretorio_particoes):
+            shutil.rmtree(self.diretorio_particoes)
+        os.makedirs(self.diretorio_particoes)
+
+        arquivos = {}
+        escritores = {}
+        try:
+            for tabela in COLUNAS_TABELAS_FATO:
+                for indice in range(self.numero_particoes):
+                    f = open(self._caminho_particao(tabela, indice), 'w', newline='', encoding='utf-8')
+                    arquivos[(tabela, indice)] = f
+                    escritores[(tabela, indice)] = csv.writer(f, delimiter=DELIMITADOR_PADRAO, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+            for tabela, linha in tqdm(_iterar_linhas_mestre(self.caminho_mestre), desc="Particionando o mestre", unit=" linhas", unit_scale=True):
+                if tabela in TABELAS_DIMENSAO:
+                    coluna_codigo, coluna_descricao = TABELAS_DIMENSAO[tabela]
+                    codigo = linha.get(coluna_codigo, '')
+                    if codigo:
+                        self.dimensoes[tabela].setdefault(codigo, linha.get(coluna_descricao, ''))
+                elif tabela in COLUNAS_TABELAS_FATO:
+                    cnpj_basico = linha.get('cnpj_basico', '')
+                    if not cnpj_basico:
+                        continue
+                    indice = _particao_do_cnpj(cnpj_basico, self.numero_particoes)
+                    escritores[(tabela, indice)].writerow([linha.get(coluna, '') for coluna in COLUNAS_TABELAS_FATO[tabela]])
+        finally:
+            for f in arquivos.values():
+                f.close()
+
+    def _ler_particao(self, tabela, indice):
+        """Gera as linhas (dict) de uma partição de tabela fato."""
+        colunas = COLUNAS_TABELAS_FATO[tabela]
+        with open(self._caminho_particao(tabela, indice), 'r', newline='', encoding='utf-8') as f:
+            for linha in csv.reader(f, delimiter=DELIMITADOR_PADRAO, quotechar='"'):
+                yield dict(zip(colunas, linha))
+
+    def _montar_tabelas_hash(self, indice):
+        """Carrega EMPRE, SIMPLES e os SÓCIOS agregados de UMA partição em dicionários por cnpj_basico."""
+        empresas = {}
+        for linha in self._ler_particao('EMPRE', indice):
+            empresas.setdefault(linha['cnpj_basico'], linha)
+
+        simples = {}
+        for linha in self._ler_particao('SIMPLES', indice):
+            simples.setdefault(linha['cnpj_basico'], linha)
+
+        # Sócios: valores únicos na ordem de aparição (mesma regra do aggregate_data do processador_de_leads)
+        quals = self.dimensoes['QUALS']
+        socios = {}
+        for linha in self._ler_particao('SOCIO', indice):
+            valores = dict(linha, descricao_qualificacao=quals.get(linha.get('qualificacao_socio', ''), ''))
+            agregado = socios.setdefault(linha['cnpj_basico'], {coluna: {} for coluna in COLUNAS_SOCIO_AGREGADAS})
+            for coluna in COLUNAS_SOCIO_AGREGADAS:
+                if valores.get(coluna):
+                    agregado[coluna].setdefault(valores[coluna], None)
+
+        socios = {
+            cnpj: {coluna: SEPARADOR_AGREGACAO.join(valores) for coluna, valores in agregado.items()}
+            for cnpj, agregado in socios.items()
+        }
+        return empresas, simples, socios
+
+    def _juntar_estabelecimento(self, estab, empresas, simples, socios):
+        """Monta a linha de saída de um estabelecimento (left join com EMPRE/SIMPLES/SÓCIOS + dimensões)."""
+        cnpj_basico = estab['cnpj_basico']
+        linha = dict(estab)
+        linha.update({coluna: valor for coluna, valor in empresas.get(cnpj_basico, {}).items() if coluna != 'cnpj_basico'})
+        linha.update({coluna: valor for coluna, valor in simples.get(cnpj_basico, {}).items() if coluna != 'cnpj_basico'})
+        linha.update(socios.get(cnpj_basico, {}))
+
+        linha['nome_municipio'] = self.dimensoes['MUNIC'].get(linha.get('codigo_municipio', ''), '')
+        linha['descricao_cnae'] = self.dimensoes['CNAES'].get(linha.get('cnae_fiscal_principal', ''), '')
+        linha['descricao_natureza_juridica'] = self.dimensoes['NATJU'].get(linha.get('natureza_juridica', ''), '')
+        linha['descricao_pais'] = self.dimensoes['PAIS'].get(linha.get('pais', ''), '')
+        linha['descricao_motivo'] = self.dimensoes['MOTIVOS'].get(linha.get('motivo_situacao_cadastral', ''), '')
+        return [linha.get(coluna, '') for coluna in CABECALHO_JUNCAO]
+
+    def fase_juncao_relacional(self):
+        """
+        Gera o arquivo de leads denormalizado: uma linha por estabelecimento, com os dados da empresa,
+        do Simples, os sócios agregados e as descrições das tabelas de domínio.
+        A memória fica limitada a uma partição das tabelas fato por vez.
+        """
+        if not self.caminho_mestre:
+            print("ERRO: Nenhum mestre (CSV_Mestre_Final.csv ou Mestre_Parquet) encontrado para a junção.")
+            return False
+
+        print("\n" + "=" * 70)
+        print("JUNÇÃO RELACIONAL: ESTABELE ⋈ EMPRE ⋈ SIMPLES ⋈ SÓCIOS (+ DOMÍNIOS)")
+        print(f"Lendo o mestre de: {self.caminho_mestre}")
+        print(f"Partições do hash join: {self.numero_particoes}")
+        print("=" * 70)
+
+        caminho_temp = self.caminho_saida + '.tmp'
+        total_estabelecimentos = 0
+        try:
+            self._particionar_mestre()
+
+            with open(caminho_temp, 'w', newline='', encoding='utf-8') as outfile:
+                writer = csv.writer(outfile, delimiter=DELIMITADOR_PADRAO, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(CABECALHO_JUNCAO)
+
+                for indice in tqdm(range(self.numero_particoes), desc="Progresso Junção", unit="partição"):
+                    empresas, simples, socios = self._montar_tabelas_hash(indice)
+                    for estab in self._ler_particao('ESTABELE', indice):
+                        writer.writerow(self._juntar_estabelecimento(estab, empresas, simples, socios))
+                        total_estabelecimentos += 1
+
+            os.replace(caminho_temp, self.caminho_saida)
+        except Exception as e:
+            print(f"\n🛑 ERRO FATAL na junção relacional: {e}")
+            if os.path.exists(caminho_temp):
+                os.remove(caminho_temp)
+            return False
+        finally:
+            shutil.rmtree(self.diretorio_particoes, ignore_errors=True)
+
+        print(f"\n✅ JUNÇÃO CONCLUÍDA! {total_estabelecimentos} estabelecimentos gravados em {self.caminho_saida}")
+        return True
+
+# ==============================================================================
+# FUNÇÃO WRAPPER
+# ==============================================================================
+
+def executar_juncao(caminho_mestre=None):
+    """
+    Função principal wrapper da junção relacional.
+    Retorna o caminho do arquivo de leads denormalizado ou None em caso de falha.
+    """
+    try:
+        processador = ProcessadorJuncao(caminho_mestre)
+
+        if not processador.diretorio_periodo:
+            print("ERRO: Não foi possível encontrar a pasta de dados mais recente (AAAA-MM) em Dados_CNPJ.")
+            return None
+
+        if not processador.fase_juncao_relacional():
+            return None
+        return processador.caminho_saida
+
+    except Exception as e:
+        print(f"\n--- ERRO INESPERADO ---\nOcorreu um erro inesperado na Junção Relacional: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    executar_juncao()
@@ -2,10 +2,30 @@
 
 import os
 import re
+import io
 import csv
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 import shutil 
 import sys 
+import time
+import heapq
+import bisect
+from operator import itemgetter
+
+# pandas/pyarrow são opcionais aqui: só o motor 'pandas' e a saída Parquet dependem deles
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
 # --- Configurações Fixas ---
 DIRETORIO_BASE = 'Dados_CNPJ'
@@ -15,6 +35,49 @@ NOME_ARQUIVO_MESTRE = 'CSV_Mestre_Final.csv'
 ENCODING_LEITURA = 'iso-8859-1' 
 DELIMITADOR_PADRAO = ';' 
 
+# Modo sem extração: lê as tabelas brutas direto dos ZIPs (Temp_brutos não é necessário)
+LER_DIRETO_DOS_ZIPS = False
+NOME_LISTA_ZIPS_CORROMPIDOS = 'zips_corrompidos.txt' # Gravada pela verificação de CRC (unzipper_cnpj); esses ZIPs não são consolidados
+
+# Consolidação paralela: cada processo grava um arquivo-parte, concatenado no final em ordem determinística
+CONSOLIDACAO_PARALELA = True
+MAX_PROCESSOS_CONSOLIDACAO = os.cpu_count() or 1
+TAMANHO_FAIXA_CONSOLIDACAO = 256 * 1024 * 1024 # Arquivos extraídos maiores que isso são divididos em faixas de bytes
+TAMANHO_BLOCO_FRONTEIRAS = 16 * 1024 * 1024 # Leitura sequencial que localiza os cortes das faixas fora de aspas
+DIRETORIO_PARTES_NOME = 'Partes_consolidacao'
+
+# Motor de leitura/escrita: 'csv' (csv.reader linha a linha) ou 'pandas' (leitor C em blocos, colunas projetadas)
+MOTOR_CONSOLIDACAO = 'csv'
+LINHAS_POR_BLOCO_PANDAS = 500_000
+
+# Formato do mestre: 'csv' (CSV_Mestre_Final.csv) ou 'parquet' (dataset particionado por TABELA_ORIGEM)
+FORMATO_SAIDA = 'csv'
+NOME_DIRETORIO_PARQUET = 'Mestre_Parquet'
+PARTICIONAR_ESTABELE_POR_UF = True
+COMPRESSAO_PARQUET = 'zstd'
+VALOR_PARTICAO_NULA = '__HIVE_DEFAULT_PARTITION__'
+ARQUIVO_SUCESSO_PARQUET = '_SUCCESS' # Marcador gravado só quando o dataset está completo
+COLUNAS_DECIMAIS_PARQUET = {'capital_social'}
+COLUNAS_CATEGORICAS_PARQUET = {
+    'matriz_filial', 'situacao_cadastral', 'motivo_situacao_cadastral', 'pais', 'uf', 'codigo_municipio',
+    'cnae_fiscal_principal', 'porte_empresa', 'natureza_juridica', 'qualificacao_socio_responsavel',
+    'tipo_socio', 'qualificacao_socio', 'qualificacao_representante', 'opcao_simples', 'opcao_mei',
+    'situacao_especial', 'ente_federativo_responsavel',
+}
+
+# Mestre clusterizado: CSV ordenado por cnpj_basico + índice esparso (1ª chave -> offset em bytes a cada N linhas)
+ORDENAR_MESTRE_POR_CNPJ = False
+BYTES_POR_RUN_ORDENACAO = 256 * 1024 * 1024 # Texto bruto ordenado em memória por run (ordenação externa)
+DIRETORIO_RUNS_ORDENACAO_NOME = 'Runs_ordenacao'
+INTERVALO_INDICE_ESPARSO = 10_000
+NOME_INDICE_ESPARSO = 'CSV_Mestre_Final.indice.csv'
+
+# Grafo sócio <-> empresa (grafo_socios.py) gerado ao fim da consolidação, a partir das linhas SOCIO do mestre
+GERAR_GRAFO_SOCIOS = True
+
+# Extensões reais detectadas nos arquivos brutos (ex: .ESTABELE, .EMPRECSV)
+EXTENSOES_BRUTAS = ('.csv', '.txt', 'estable', 'empree', 'sociocsv', 'natjucsv', 'paiscsv', 'moticsv', 'cnaecsv', 'qualscsv', '.simple')
+
 # ==============================================================================
 # 1. MAPA DE COLUNAS DEFINITIVO (SEU SCHEMA PARA CONSOLIDAÇÃO)
 # ==============================================================================
@@ -60,47 +123,730 @@ ORDEM_PRIORIDADE = [
 CABECALHO_FINAL = [col for col in ORDEM_PRIORIDADE if col in todos_nomes]
 CABECALHO_FINAL.append('TABELA_ORIGEM')
 
+# ==============================================================================
+# PERÍODOS E MESTRE (USADOS TAMBÉM PELO JOINER, PELA FASE 7 E PELO DELTA)
+# ==============================================================================
+
+def _listar_periodos(diretorio_raiz=None):
+    """Subpastas de período (AAAA-MM) de `diretorio_raiz` (padrão: DIRETORIO_BASE), da mais antiga para a mais recente."""
+    diretorio_raiz = DIRETORIO_BASE if diretorio_raiz is None else diretorio_raiz
+    padrao_data = re.compile(r'^\d{4}-\d{2}$')
+    return sorted(
+        item for item in os.listdir(diretorio_raiz)
+        if os.path.isdir(os.path.join(diretorio_raiz, item)) and padrao_data.match(item)
+    )
+
+def _encontrar_diretorio_mais_recente(diretorio_raiz=None):
+    """Localiza a subpasta de período (AAAA-MM) mais recente; None se não houver (ou se a pasta base não existir)."""
+    diretorio_raiz = DIRETORIO_BASE if diretorio_raiz is None else diretorio_raiz
+    try:
+        periodos = _listar_periodos(diretorio_raiz)
+    except Exception:
+        return None
+    return os.path.join(diretorio_raiz, periodos[-1]) if periodos else None
+
+def _caminho_mestre_do_periodo(diretorio_periodo):
+    """Dataset Parquet completo (Mestre_Parquet/_SUCCESS) ou CSV Mestre da pasta de período; None se não houver."""
+    caminho_parquet = os.path.join(diretorio_periodo, NOME_DIRETORIO_PARQUET)
+    if os.path.exists(os.path.join(caminho_parquet, ARQUIVO_SUCESSO_PARQUET)):
+        return caminho_parquet
+    caminho_mestre = os.path.join(diretorio_periodo, NOME_ARQUIVO_MESTRE)
+    return caminho_mestre if os.path.exists(caminho_mestre) else None
+
+# ==============================================================================
+# FONTES BRUTAS (ARQUIVO EXTRAÍDO EM Temp_brutos OU MEMBRO DE UM ZIP)
+# ==============================================================================
+
+# caminho_zip é None para arquivos já extraídos; nesse caso `caminho` é o caminho no disco,
+# senão é o nome do membro dentro do ZIP. `nome_pasta` é a subpasta de Temp_brutos (ou o nome do ZIP sem extensão).
+FonteBruta = namedtuple('FonteBruta', ['caminho_zip', 'caminho', 'nome_arquivo', 'nome_pasta'])
+
+def _ler_zips_corrompidos(diretorio_periodo):
+    """
+    Nomes dos ZIPs reprovados na verificação de CRC do modo sem extração (NOME_LISTA_ZIPS_CORROMPIDOS).
+    Um ZIP mais novo que a lista (baixado de novo depois da verificação) volta a ser consolidado.
+    """
+    caminho_lista = os.path.join(diretorio_periodo, NOME_LISTA_ZIPS_CORROMPIDOS)
+    try:
+        with open(caminho_lista, 'r', encoding='utf-8') as f:
+            nomes = [linha.strip() for linha in f if linha.strip()]
+        verificado_em = os.path.getmtime(caminho_lista)
+    except OSError:
+        return set()
+    return {
+        nome for nome in nomes
+        if not os.path.exists(os.path.join(diretorio_periodo, nome))
+        or os.path.getmtime(os.path.join(diretorio_periodo, nome)) <= verificado_em
+    }
+
+class _FaixaDeArquivo(io.RawIOBase):
+    """
+    Expõe como arquivo apenas a faixa de bytes [inicio, fim) de um arquivo extraído.
+    As posições já vêm alinhadas a inícios de registro por _dividir_em_faixas, então cada linha é lida uma única vez.
+    """
+    def __init__(self, caminho, inicio, fim):
+        self._arquivo = open(caminho, 'rb')
+        self._inicio = inicio
+        self._fim = fim
+        self._arquivo.seek(self._inicio)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        restante = self._fim - self._arquivo.tell()
+        if restante <= 0:
+            return 0
+        visao = memoryview(buffer)[:restante]
+        return self._arquivo.readinto(visao)
+
+    def close(self):
+        self._arquivo.close()
+        super().close()
+
+@contextmanager
+def _abrir_fonte(fonte, erros='ignore', faixa=None):
+    """
+    Abre a fonte bruta como texto, seja do disco ou em streaming de dentro do ZIP (ZipFile.open).
+    Com `faixa` (inicio, fim), apenas as linhas que começam nesse trecho do arquivo extraído são lidas.
+    """
+    if faixa is not None:
+        with io.TextIOWrapper(io.BufferedReader(_FaixaDeArquivo(fonte.caminho, *faixa)), encoding=ENCODING_LEITURA, errors=erros) as f:
+            yield f
+    elif fonte.caminho_zip is None:
+        with open(fonte.caminho, 'r', encoding=ENCODING_LEITURA, errors=erros) as f:
+            yield f
+    else:
+        with zipfile.ZipFile(fonte.caminho_zip, 'r') as zip_ref:
+            with zip_ref.open(fonte.caminho, 'r') as bruto:
+                with io.TextIOWrapper(bruto, encoding=ENCODING_LEITURA, errors=erros) as f:
+                    yield f
+
+def _identificar_tipo(fonte):
+    """Encontra a CATEGORIA (EMPRE, ESTABELE, SOCIO, etc.) pelo nome da pasta/ZIP e do arquivo."""
+    chave_busca = fonte.nome_pasta.upper() + " " + fonte.nome_arquivo.upper()
+    
+    # Lógica de mapeamento flexível (baseada no nome da pasta/arquivo)
+    if 'EMPRESA' in chave_busca: return 'EMPRE'
+    elif 'ESTABELECIMENTO' in chave_busca: return 'ESTABELE'
+    elif 'SOCIO' in chave_busca: return 'SOCIO'
+    elif 'CNAES' in chave_busca: return 'CNAES'
+    elif 'MOTIVO' in chave_busca: return 'MOTIVOS'
+    elif 'MUNIC' in chave_busca: return 'MUNIC'
+    elif 'NATJU' in chave_busca: return 'NATJU'
+    elif 'PAIS' in chave_busca: return 'PAIS'
+    elif 'QUALI' in chave_busca: return 'QUALS'
+    elif 'SIMPLES' in chave_busca: return 'SIMPLES'
+    return None
+
+def _detectar_delimitador(fonte):
+    """Tenta detectar o delimitador do arquivo CSV."""
+    try:
+        with _abrir_fonte(fonte, erros='strict') as f:
+            amostra = f.read(1024)
+            if not amostra:
+                return DELIMITADOR_PADRAO
+            
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t|') 
+            return dialeto.delimiter
+    except Exception:
+        return DELIMITADOR_PADRAO
+
+def _fronteiras_de_registro(caminho, alvos):
+    """
+    Para cada posição de `alvos` (crescente), retorna o início do primeiro registro CSV que começa nela ou depois.
+    O arquivo é lido uma vez, em sequência, contando as aspas: um '\\n' só encerra o registro fora de um campo
+    entre aspas (campos com quebra de linha embutida não são partidos entre duas faixas).
+    Alvos sem registro posterior ficam de fora da lista.
+    """
+    fronteiras = []
+    dentro_de_aspas = False
+    base = 0
+    proximo = 0
+    with open(caminho, 'rb') as f:
+        while proximo < len(alvos):
+            bloco = f.read(TAMANHO_BLOCO_FRONTEIRAS)
+            if not bloco:
+                break
+            contado_ate = 0
+            while proximo < len(alvos):
+                # Mesmo critério de readline() a partir de alvo - 1: uma linha que começa exatamente no alvo fica nele
+                busca = max(alvos[proximo] - 1 - base, contado_ate)
+                if busca >= len(bloco):
+                    break
+                quebra = bloco.find(b'\n', busca)
+                while quebra != -1:
+                    dentro_de_aspas ^= bool(bloco.count(b'"', contado_ate, quebra) & 1)
+                    contado_ate = quebra
+                    if not dentro_de_aspas:
+                        break
+                    quebra = bloco.find(b'\n', quebra + 1)
+                if quebra == -1:
+                    break
+                fronteiras.append(base + quebra + 1)
+                proximo += 1
+            dentro_de_aspas ^= bool(bloco.count(b'"', contado_ate) & 1)
+            base += len(bloco)
+    return fronteiras
+
+def _dividir_em_faixas(fonte):
+    """
+    Divide um arquivo extraído grande em faixas de ~TAMANHO_FAIXA_CONSOLIDACAO bytes (membros de ZIP não são divididos).
+    Os cortes caem em inícios de registro fora de aspas (_fronteiras_de_registro).
+    """
+    if fonte.caminho_zip is not None:
+        return [None]
+    tamanho = os.path.getsize(fonte.caminho)
+    if tamanho <= TAMANHO_FAIXA_CONSOLIDACAO:
+        return [None]
+    alvos = list(range(TAMANHO_FAIXA_CONSOLIDACAO, tamanho, TAMANHO_FAIXA_CONSOLIDACAO))
+    fronteiras = [0] + _fronteiras_de_registro(fonte.caminho, alvos) + [tamanho]
+    return [(inicio, fim) for inicio, fim in zip(fronteiras, fronteiras[1:]) if fim > inicio]
+
+def _escrever_linhas_da_fonte(fonte, nome_tipo, delimitador, outfile, faixa=None):
+    """
+    Motor 'csv': lê a fonte bruta, remapeia cada linha para o CABECALHO_FINAL e escreve no outfile. Retorna o nº de linhas.
+    Com `faixa` (inicio, fim), processa apenas as linhas que começam nesse trecho do arquivo.
+    """
+    writer = csv.writer(outfile, delimiter=DELIMITADOR_PADRAO, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+    mapa_posicional = MAPA_COLUNAS_CONSOLIDADO[nome_tipo]
+    mapa_final_index = {nome: idx for idx, nome in enumerate(CABECALHO_FINAL)}
+    total_linhas = 0
+    
+    # errors='ignore' para evitar que o Python trave em caracteres estranhos
+    with _abrir_fonte(fonte, faixa=faixa) as infile:
+        reader = csv.reader(infile, delimiter=delimitador, quotechar='"')
+        
+        for linha_bruta in reader:
+            if not linha_bruta:
+                continue # Linha em branco: ignorada, como no leitor do pandas (motor 'pandas' e saída Parquet)
+            linha_mestre = [''] * len(CABECALHO_FINAL)
+            
+            # Mapeamento e Transferência de dados
+            for idx_bruto, nome_final in mapa_posicional:
+                if idx_bruto < len(linha_bruta):
+                    valor = linha_bruta[idx_bruto].strip()
+                    
+                    if nome_final in mapa_final_index:
+                        idx_final = mapa_final_index[nome_final]
+                        linha_mestre[idx_final] = valor
+                        
+            linha_mestre[-1] = nome_tipo # Adiciona a coluna de origem
+            writer.writerow(linha_mestre)
+            total_linhas += 1
+            
+    return total_linhas
+
+def _quotar_coluna(serie):
+    """Aplica, de forma vetorizada, a mesma regra de aspas do csv.writer com QUOTE_MINIMAL."""
+    precisa_aspas = serie.str.contains('[;"\r\n]', regex=True)
+    if precisa_aspas.any():
+        serie = serie.where(~precisa_aspas, '"' + serie.str.replace('"', '""', regex=False) + '"')
+    return serie
+
+def _ler_blocos_pandas(fonte, nome_tipo, delimitador, faixa=None):
+    """
+    Lê a fonte em blocos com o leitor C do pandas, projetando só as colunas mapeadas.
+    Gera DataFrames com os nomes finais das colunas e os valores já sem espaços nas pontas.
+    """
+    if pd is None:
+        raise ImportError("O motor 'pandas' requer a biblioteca pandas (pip install pandas).")
+    
+    mapa_posicional = [(idx, nome) for idx, nome in MAPA_COLUNAS_CONSOLIDADO[nome_tipo] if nome in CABECALHO_FINAL]
+    colunas_brutas = [idx for idx, _ in mapa_posicional]
+    
+    with _abrir_fonte(fonte, faixa=faixa) as infile:
+        leitor = pd.read_csv(
+            infile,
+            sep=delimitador,
+            quotechar='"',
+            header=None,
+            # Índices 0..max garantem que linhas curtas sejam completadas com vazio, como no motor 'csv'
+            names=range(max(colunas_brutas) + 1),
+            usecols=colunas_brutas,
+            dtype=str,
+            keep_default_na=False,
+            na_filter=False,
+            chunksize=LINHAS_POR_BLOCO_PANDAS,
+            engine='c',
+        )
+        for bloco in leitor:
+            if len(bloco) == 0:
+                continue
+            yield pd.DataFrame({
+                nome_final: bloco[idx_bruto].fillna('').str.strip()
+                for idx_bruto, nome_final in mapa_posicional
+            })
+
+def _escrever_linhas_da_fonte_pandas(fonte, nome_tipo, delimitador, outfile, faixa=None):
+    """
+    Motor 'pandas': lê a fonte em blocos (_ler_blocos_pandas) e monta as linhas do bloco no layout do
+    CABECALHO_FINAL com operações de coluna (uma única escrita por bloco).
+    Retorna o nº de linhas. A saída é a mesma do motor 'csv' (mesmo separador, aspas mínimas e terminador CRLF).
+    """
+    total_linhas = 0
+    
+    for bloco in _ler_blocos_pandas(fonte, nome_tipo, delimitador, faixa):
+        colunas_bloco = {nome_coluna: _quotar_coluna(bloco[nome_coluna]) for nome_coluna in bloco.columns}
+        
+        # Monta as linhas coluna a coluna: colunas vazias do layout viram apenas separadores constantes
+        linhas = None
+        pendente = ''
+        for posicao, nome_coluna in enumerate(CABECALHO_FINAL[:-1]):
+            if posicao > 0:
+                pendente += DELIMITADOR_PADRAO
+            if nome_coluna in colunas_bloco:
+                linhas = (pendente + colunas_bloco[nome_coluna]) if linhas is None else (linhas + pendente + colunas_bloco[nome_coluna])
+                pendente = ''
+        pendente += DELIMITADOR_PADRAO + nome_tipo # Adiciona a coluna de origem
+        linhas = linhas + pendente
+        
+        outfile.write('\r\n'.join(linhas.tolist()))
+        outfile.write('\r\n')
+        total_linhas += len(bloco)
+            
+    return total_linhas
+
+def _tipar_bloco_parquet(bloco):
+    """Converte um bloco de strings para os tipos do Parquet: vazio vira nulo, capital vira float e códigos viram dicionário."""
+    bloco = bloco.replace('', None)
+    for nome_coluna in bloco.columns:
+        if nome_coluna in COLUNAS_DECIMAIS_PARQUET:
+            # Formato brasileiro da RF: '1.000,50' -> 1000.50
+            texto = bloco[nome_coluna].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+            bloco[nome_coluna] = pd.to_numeric(texto, errors='coerce').astype('float64')
+        elif nome_coluna in COLUNAS_CATEGORICAS_PARQUET:
+            bloco[nome_coluna] = bloco[nome_coluna].astype('category')
+        else:
+            bloco[nome_coluna] = bloco[nome_coluna].astype(object)
+    return bloco
+
+def _escrever_parquet_da_fonte(fonte, nome_tipo, delimitador, diretorio_saida, prefixo, faixa=None):
+    """
+    Grava a fonte como arquivos Parquet em '<diretorio_saida>/TABELA_ORIGEM=<tipo>/' (e '/uf=<UF>/' para ESTABELE),
+    com apenas as colunas da própria tabela. Retorna o nº de linhas.
+    """
+    if pq is None:
+        raise ImportError("A saída Parquet requer as bibliotecas pandas e pyarrow (pip install pandas pyarrow).")
+    
+    particionar_por_uf = nome_tipo == 'ESTABELE' and PARTICIONAR_ESTABELE_POR_UF
+    diretorio_tabela = os.path.join(diretorio_saida, f"TABELA_ORIGEM={nome_tipo}")
+    colunas_tabela = [nome for _, nome in MAPA_COLUNAS_CONSOLIDADO[nome_tipo] if nome in CABECALHO_FINAL]
+    colunas_arquivo = [nome for nome in colunas_tabela if not (particionar_por_uf and nome == 'uf')]
+    schema = pa.schema([
+        (nome, pa.float64() if nome in COLUNAS_DECIMAIS_PARQUET
+               else pa.dictionary(pa.int32(), pa.string()) if nome in COLUNAS_CATEGORICAS_PARQUET
+               else pa.string())
+        for nome in colunas_arquivo
+    ])
+    escritores = {}
+    total_linhas = 0
+    
+    try:
+        for bloco in _ler_blocos_pandas(fonte, nome_tipo, delimitador, faixa):
+            total_linhas += len(bloco)
+            if particionar_por_uf:
+                grupos = bloco.groupby(bloco['uf'].replace('', VALOR_PARTICAO_NULA), sort=True)
+            else:
+                grupos = [(None, bloco)]
+            
+            for uf, grupo in grupos:
+                if uf not in escritores:
+                    diretorio_particao = diretorio_tabela if uf is None else os.path.join(diretorio_tabela, f"uf={uf}")
+                    os.makedirs(diretorio_particao, exist_ok=True)
+                    escritores[uf] = pq.ParquetWriter(
+                        os.path.join(diretorio_particao, f"{prefixo}.parquet"), schema, compression=COMPRESSAO_PARQUET
+                    )
+                tabela = pa.Table.from_pandas(_tipar_bloco_parquet(grupo[colunas_arquivo].reset_index(drop=True)), schema=schema, preserve_index=False)
+                escritores[uf].write_table(tabela)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+            
+    return total_linhas
+
+MOTORES_CONSOLIDACAO = {
+    'csv': _escrever_linhas_da_fonte,
+    'pandas': _escrever_linhas_da_fonte_pandas,
+}
+
+def _consolidar_parte_parquet(diretorio_saida, prefixo, fonte, nome_tipo, delimitador, faixa):
+    """
+    Worker da saída Parquet: grava a fonte (ou faixa) em arquivos '<prefixo>.parquet'. Retorna (prefixo, linhas, erro);
+    em caso de erro os arquivos da parte são removidos (nenhuma linha de uma fonte com falha fica no dataset).
+    """
+    try:
+        return prefixo, _escrever_parquet_da_fonte(fonte, nome_tipo, delimitador, diretorio_saida, prefixo, faixa), None
+    except Exception as e:
+        for root, _, files in os.walk(os.path.join(diretorio_saida, f"TABELA_ORIGEM={nome_tipo}")):
+            if f"{prefixo}.parquet" in files:
+                os.remove(os.path.join(root, f"{prefixo}.parquet"))
+        return prefixo, 0, str(e)
+
+def _consolidar_parte(caminho_parte, fonte, nome_tipo, delimitador, faixa, motor='csv'):
+    """
+    Worker da consolidação paralela: grava as linhas de uma fonte (ou faixa) em um arquivo-parte sem cabeçalho.
+    Retorna (caminho_parte, linhas, erro); em caso de erro o arquivo-parte é removido.
+    """
+    try:
+        with open(caminho_parte, 'w', newline='', encoding='utf-8') as outfile:
+            linhas = MOTORES_CONSOLIDACAO[motor](fonte, nome_tipo, delimitador, outfile, faixa)
+        return caminho_parte, linhas, None
+    except Exception as e:
+        if os.path.exists(caminho_parte):
+            os.remove(caminho_parte)
+        return caminho_parte, 0, str(e)
+
+# ==============================================================================
+# MESTRE CLUSTERIZADO POR cnpj_basico (ORDENAÇÃO EXTERNA + ÍNDICE ESPARSO)
+# ==============================================================================
+
+def _registros_brutos(arquivo):
+    """
+    Gera os registros de um CSV aberto em modo binário, exatamente como estão no arquivo (com o terminador).
+    Linhas físicas são unidas enquanto houver aspas abertas (campo com quebra de linha embutida).
+    """
+    pendente = b''
+    for linha in arquivo:
+        pendente += linha
+        if pendente.count(b'"') % 2 == 0:
+            yield pendente
+            pendente = b''
+    if pendente:
+        yield pendente
+
+def _chave_do_registro(registro, idx_chave):
+    """cnpj_basico (bytes) de um registro bruto; só registros com aspas passam pelo parser do csv."""
+    if b'"' not in registro:
+        campos = registro.rstrip(b'\r\n').split(DELIMITADOR_PADRAO.encode(), idx_chave + 1)
+        return campos[idx_chave] if idx_chave < len(campos) else b''
+    campos = next(csv.reader([registro.decode('utf-8')], delimiter=DELIMITADOR_PADRAO, quotechar='"'), [])
+    return campos[idx_chave].encode('utf-8') if idx_chave < len(campos) else b''
+
+def _ler_run(caminho, idx_chave):
+    with open(caminho, 'rb') as f:
+        for registro in _registros_brutos(f):
+            yield _chave_do_registro(registro, idx_chave), registro
+
+def _gravar_run_ordenado(registros, caminho_run):
+    """Ordena (estável) os pares (chave, registro bruto) de um run pela chave e grava os registros sem reserializar."""
+    registros.sort(key=itemgetter(0))
+    with open(caminho_run, 'wb') as f:
+        f.writelines(registro for _, registro in registros)
+
+def _ler_csv_mestre(caminho):
+    with open(caminho, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.reader(f, delimiter=DELIMITADOR_PADRAO, quotechar='"')
+
+def invalidar_indice_esparso(diretorio_mestre):
+    """Remove o índice esparso: chamado sempre que o CSV Mestre é regravado (fora de ordem) pela consolidação."""
+    caminho_indice = os.path.join(diretorio_mestre, NOME_INDICE_ESPARSO)
+    if os.path.exists(caminho_indice):
+        os.remove(caminho_indice)
+
+def ordenar_mestre_por_cnpj(caminho_mestre, diretorio_runs, bytes_por_run=BYTES_POR_RUN_ORDENACAO, intervalo_indice=INTERVALO_INDICE_ESPARSO):
+    """
+    Reescreve o CSV Mestre ordenado por cnpj_basico (ordenação externa: runs em disco + merge k-way)
+    e grava o índice esparso ao lado dele. A ordem original é mantida entre linhas da mesma chave;
+    as tabelas de domínio (sem cnpj_basico) ficam no início. Retorna o nº de linhas de dados.
+    Os registros circulam como bytes brutos (um objeto por linha, sem split nas 56 colunas): cada run
+    acumula até `bytes_por_run` bytes de texto, e os offsets do índice são contados em bytes do arquivo final.
+    """
+    caminho_indice = os.path.join(os.path.dirname(caminho_mestre), NOME_INDICE_ESPARSO)
+    caminho_temp = caminho_mestre + '.ordenando'
+    if os.path.exists(diretorio_runs):
+        shutil.rmtree(diretorio_runs)
+    os.makedirs(diretorio_runs)
+    
+    try:
+        # 1. Runs ordenados
+        caminhos_runs = []
+        with open(caminho_mestre, 'rb') as infile:
+            leitor = _registros_brutos(infile)
+            cabecalho = next(leitor)
+            idx_chave = next(csv.reader([cabecalho.decode('utf-8')], delimiter=DELIMITADOR_PADRAO)).index('cnpj_basico')
+            registros = []
+            bytes_acumulados = 0
+            for registro in tqdm(leitor, desc="Ordenando runs por cnpj_basico", unit=" linhas", unit_scale=True):
+                registros.append((_chave_do_registro(registro, idx_chave), registro))
+                bytes_acumulados += len(registro)
+                if bytes_acumulados >= bytes_por_run:
+                    caminhos_runs.append(os.path.join(diretorio_runs, f"run_{len(caminhos_runs):05d}.csv"))
+                    _gravar_run_ordenado(registros, caminhos_runs[-1])
+                    registros = []
+                    bytes_acumulados = 0
+            if registros:
+                caminhos_runs.append(os.path.join(diretorio_runs, f"run_{len(caminhos_runs):05d}.csv"))
+                _gravar_run_ordenado(registros, caminhos_runs[-1])
+            del registros
+        
+        # 2. Merge k-way (heapq.merge desempata pela ordem dos runs: a ordenação continua estável)
+        total_linhas = 0
+        with open(caminho_temp, 'wb') as outfile, \
+             open(caminho_indice + '.tmp', 'w', newline='', encoding='utf-8') as arquivo_indice:
+            writer_indice = csv.writer(arquivo_indice, delimiter=DELIMITADOR_PADRAO, quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            outfile.write(cabecalho)
+            offset = len(cabecalho)
+            writer_indice.writerow(['cnpj_basico', 'offset', 'linha'])
+            
+            intercalado = heapq.merge(*[_ler_run(caminho, idx_chave) for caminho in caminhos_runs], key=itemgetter(0))
+            for chave, registro in tqdm(intercalado, desc="Intercalando runs", unit=" linhas", unit_scale=True):
+                if total_linhas % intervalo_indice == 0:
+                    writer_indice.writerow([chave.decode('utf-8'), offset, total_linhas])
+                outfile.write(registro)
+                offset += len(registro)
+                total_linhas += 1
+        
+        os.replace(caminho_temp, caminho_mestre)
+        os.replace(caminho_indice + '.tmp', caminho_indice)
+        # O índice precisa ser mais novo que o mestre (carregar_indice_esparso recusa índices anteriores a ele)
+        os.utime(caminho_indice)
+        return total_linhas
+    
+    finally:
+        shutil.rmtree(diretorio_runs, ignore_errors=True)
+        for resto in (caminho_temp, caminho_indice + '.tmp'):
+            if os.path.exists(resto):
+                os.remove(resto)
+
+def carregar_indice_esparso(caminho_mestre):
+    """
+    Lê o índice esparso do mestre: listas paralelas (chaves, offsets), ordenadas pela chave.
+    Um índice mais antigo que o mestre (mestre regravado sem ordenação) é recusado com ValueError.
+    """
+    caminho_indice = os.path.join(os.path.dirname(caminho_mestre), NOME_INDICE_ESPARSO)
+    if os.path.getmtime(caminho_mestre) > os.path.getmtime(caminho_indice):
+        raise ValueError(f"O índice {NOME_INDICE_ESPARSO} é anterior ao CSV Mestre (mestre regravado sem ORDENAR_MESTRE_POR_CNPJ).")
+    chaves, offsets = [], []
+    leitor = _ler_csv_mestre(caminho_indice)
+    next(leitor, None)
+    for chave, offset, _ in leitor:
+        chaves.append(chave)
+        offsets.append(int(offset))
+    return chaves, offsets
+
+def ler_faixa_cnpj(caminho_mestre, inicio, fim=None, indice=None):
+    """
+    Gera as linhas (dict) do mestre clusterizado com `inicio` <= cnpj_basico <= `fim`, saltando direto
+    para o bloco certo pelo índice esparso em vez de varrer o arquivo.
+    """
+    fim = inicio if fim is None else fim
+    chaves, offsets = indice or carregar_indice_esparso(caminho_mestre)
+    
+    if not chaves:
+        return
+    
+    with open(caminho_mestre, 'rb') as f:
+        cabecalho = f.readline().decode('utf-8').rstrip('\r\n').split(DELIMITADOR_PADRAO)
+        idx_chave = cabecalho.index('cnpj_basico')
+        # Último bloco cuja 1ª chave é MENOR que o início: a chave pode começar no fim do bloco anterior
+        f.seek(offsets[max(bisect.bisect_left(chaves, inicio) - 1, 0)])
+        for linha in csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline=''), delimiter=DELIMITADOR_PADRAO, quotechar='"'):
+            chave = linha[idx_chave]
+            if chave > fim:
+                break
+            if chave >= inicio:
+                yield dict(zip(cabecalho, linha))
+
+def buscar_cnpj(caminho_mestre, cnpj_basico, indice=None):
+    """Todas as linhas (de todas as tabelas) de um cnpj_basico no mestre clusterizado."""
+    return list(ler_faixa_cnpj(caminho_mestre, cnpj_basico, cnpj_basico, indice))
+
 # ==============================================================================
 # CLASSE PRINCIPAL PARA PROCESSAMENTO (FASES 4 e 5)
 # ==============================================================================
 
 class ProcessadorConsolidacaoELimpeza:
-    def __init__(self):
-        self.diretorio_periodo = self._encontrar_diretorio_mais_recente(DIRETORIO_BASE)
+    def __init__(self, ler_direto_dos_zips=LER_DIRETO_DOS_ZIPS, num_processos=None, motor=MOTOR_CONSOLIDACAO, formato=FORMATO_SAIDA,
+                 ordenar_por_cnpj=ORDENAR_MESTRE_POR_CNPJ, zips_ignorados=None):
+        self.ler_direto_dos_zips = ler_direto_dos_zips
+        self.ordenar_por_cnpj = ordenar_por_cnpj
+        if formato not in ('csv', 'parquet'):
+            raise ValueError(f"Formato de saída desconhecido: '{formato}'. Opções: csv, parquet.")
+        self.formato = formato
+        if motor not in MOTORES_CONSOLIDACAO:
+            raise ValueError(f"Motor de consolidação desconhecido: '{motor}'. Opções: {', '.join(MOTORES_CONSOLIDACAO)}.")
+        if motor == 'pandas' and pd is None:
+            print("AVISO: pandas não está instalado. Usando o motor de consolidação 'csv'.")
+            motor = 'csv'
+        self.motor = motor
+        if num_processos is None:
+            num_processos = MAX_PROCESSOS_CONSOLIDACAO if CONSOLIDACAO_PARALELA else 1
+        self.num_processos = max(1, num_processos)
+        self.diretorio_periodo = _encontrar_diretorio_mais_recente(DIRETORIO_BASE)
         if not self.diretorio_periodo:
             return
             
         self.diretorio_saida_trabalho = os.path.join(self.diretorio_periodo, DIRETORIO_TRABALHO_NOME)
         self.diretorio_saida_final = self.diretorio_periodo
+        if zips_ignorados is None:
+            zips_ignorados = _ler_zips_corrompidos(self.diretorio_periodo) if ler_direto_dos_zips else set()
+        self.zips_ignorados = set(zips_ignorados)
+
+    def _listar_fontes_brutas(self):
+        """
+        Lista todos os arquivos brutos (CSV/TXT e extensões da RF) a consolidar.
+        No modo sem extração, os membros são lidos dos ZIPs do período (exceto os reprovados na verificação
+        de CRC, em `zips_ignorados`); senão, de Temp_brutos e subpastas.
+        """
+        fontes = []
+        if self.ler_direto_dos_zips:
+            for nome_zip in sorted(os.listdir(self.diretorio_periodo)):
+                caminho_zip = os.path.join(self.diretorio_periodo, nome_zip)
+                if not (nome_zip.lower().endswith('.zip') and os.path.isfile(caminho_zip)):
+                    continue
+                if nome_zip in self.zips_ignorados:
+                    print(f"\n  !!! {nome_zip} foi reprovado na verificação de integridade [Pulando].")
+                    continue
+                try:
+                    with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
+                        membros = [info.filename for info in zip_ref.infolist() if not info.is_dir()]
+                except zipfile.BadZipFile as e:
+                    print(f"\n  !!! ERRO ao abrir o ZIP {nome_zip} [Pulando]: {e}")
+                    continue
+                for membro in membros:
+                    nome_arquivo = membro.replace('\\', '/').split('/')[-1]
+                    if nome_arquivo.lower().endswith(EXTENSOES_BRUTAS):
+                        fontes.append(FonteBruta(caminho_zip, membro, nome_arquivo, os.path.splitext(nome_zip)[0]))
+        else:
+            for root, _, files in os.walk(self.diretorio_saida_trabalho):
+                for f in files:
+                    # Verifica se o final do nome do arquivo corresponde a uma das extensões
+                    if f.lower().endswith(EXTENSOES_BRUTAS): 
+                        fontes.append(FonteBruta(None, os.path.join(root, f), f, os.path.basename(root)))
+        return fontes
 
-    def _encontrar_diretorio_mais_recente(self, diretorio_raiz):
-        """Localiza a subpasta de período (AAAA-MM) mais recente."""
+    def _montar_tarefas(self, fontes_tipadas):
+        """Expande as fontes em tarefas (fonte, tipo, delimitador, faixa), na ordem da listagem e das faixas."""
+        tarefas = []
+        for fonte, nome_tipo in fontes_tipadas:
+            delimitador = _detectar_delimitador(fonte)
+            for faixa in _dividir_em_faixas(fonte):
+                tarefas.append((fonte, nome_tipo, delimitador, faixa))
+        return tarefas
+
+    def _consolidar_em_paralelo(self, fontes_tipadas, outfile):
+        """
+        Distribui as fontes (e as faixas de arquivos grandes) num pool de processos.
+        Cada tarefa grava seu arquivo-parte; as partes são anexadas ao `outfile` (que já tem o cabeçalho)
+        na ordem da listagem, independentemente da ordem de conclusão. Retorna o total de linhas.
+        """
+        diretorio_partes = os.path.join(self.diretorio_saida_final, DIRETORIO_PARTES_NOME)
+        if os.path.exists(diretorio_partes):
+            shutil.rmtree(diretorio_partes)
+        os.makedirs(diretorio_partes)
+        
+        tarefas = [
+            (os.path.join(diretorio_partes, f"parte_{indice:06d}.csv"), fonte, nome_tipo, delimitador, faixa, self.motor)
+            for indice, (fonte, nome_tipo, delimitador, faixa) in enumerate(self._montar_tarefas(fontes_tipadas))
+        ]
+        
+        print(f"Consolidando {len(fontes_tipadas)} arquivos ({len(tarefas)} tarefas) com {self.num_processos} processos em paralelo.")
+        
+        total_linhas = 0
         try:
-            itens = os.listdir(diretorio_raiz)
-            padrao_data = re.compile(r'^\d{4}-\d{2}$')
-            diretorios_de_periodo = [item for item in itens if os.path.isdir(os.path.join(diretorio_raiz, item)) and padrao_data.match(item)]
-            if not diretorios_de_periodo: return None
-            diretorio_recente_nome = sorted(diretorios_de_periodo, reverse=True)[0]
-            return os.path.join(diretorio_raiz, diretorio_recente_nome)
-        except Exception:
-            return None
+            with ProcessPoolExecutor(max_workers=min(self.num_processos, len(tarefas))) as executor:
+                futuros = {executor.submit(_consolidar_parte, *tarefa): tarefa for tarefa in tarefas}
+                for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Progresso Consolidação", unit="parte"):
+                    _, fonte, nome_tipo, delimitador, faixa, _ = futuros[futuro]
+                    try:
+                        _, linhas, erro = futuro.result()
+                        total_linhas += linhas
+                    except Exception as e:
+                        erro = str(e)
+                    if erro:
+                        trecho = f" (bytes {faixa[0]}-{faixa[1]})" if faixa else ""
+                        print(f"\n  !!! ERRO ao processar o arquivo {fonte.nome_arquivo}{trecho} (Tipo: {nome_tipo}) com delimitador '{delimitador or 'Padrão'}' [Pulando]: {erro}")
             
-    def _detectar_delimitador(self, caminho_arquivo):
-        """Tenta detectar o delimitador do arquivo CSV."""
+            # Concatenação determinística: ordem da listagem das fontes e das faixas
+            for caminho_parte, *_ in tarefas:
+                if os.path.exists(caminho_parte):
+                    with open(caminho_parte, 'r', newline='', encoding='utf-8') as parte:
+                        shutil.copyfileobj(parte, outfile, 16 * 1024 * 1024)
+        finally:
+            shutil.rmtree(diretorio_partes, ignore_errors=True)
+        
+        return total_linhas
+
+    def fase_4_5_consolidar_parquet(self):
+        """
+        FASE 4/5 (formato 'parquet'): grava o mestre como dataset Parquet particionado por TABELA_ORIGEM
+        (e por uf em ESTABELE). Cada partição tem só as colunas da sua tabela, com tipos e compressão.
+        """
+        if pq is None or pd is None:
+            print("🛑 ERRO: A saída Parquet requer as bibliotecas pandas e pyarrow. Execute: pip install pandas pyarrow")
+            return False
+        
+        diretorio_final = os.path.join(self.diretorio_saida_final, NOME_DIRETORIO_PARQUET)
+        
+        # Idempotência: o marcador _SUCCESS só existe se o dataset foi concluído
+        if os.path.exists(os.path.join(diretorio_final, ARQUIVO_SUCESSO_PARQUET)):
+            print("\n" + "=" * 100)
+            print(f"ESTADO DETECTADO: {NOME_DIRETORIO_PARQUET} JÁ EXISTE e está completo.")
+            print("PULANDO FASES 4 & 5 (CONSOLIDAÇÃO).")
+            print("=" * 100)
+            return self._gerar_grafo_socios(diretorio_final, somente_se_ausente=True)
+        
+        print("\n" + "=" * 70)
+        print("FASES 4/5: INICIANDO CONSOLIDAÇÃO NO DATASET PARQUET")
+        print(f"O dataset será gerado em: {os.path.abspath(diretorio_final)}")
+        print("=" * 70)
+        
+        inicio_consolidacao = time.time()
+        diretorio_temp = diretorio_final + '.tmp'
         try:
-            with open(caminho_arquivo, 'r', encoding=ENCODING_LEITURA) as f:
-                amostra = f.read(1024)
-                if not amostra:
-                    return DELIMITADOR_PADRAO
-                
-                dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t|') 
-                return dialeto.delimiter
-        except Exception:
-            return DELIMITADOR_PADRAO
+            for diretorio in (diretorio_temp, diretorio_final):
+                if os.path.exists(diretorio):
+                    shutil.rmtree(diretorio)
+            os.makedirs(diretorio_temp)
+            
+            fontes_tipadas = [(fonte, _identificar_tipo(fonte)) for fonte in self._listar_fontes_brutas()]
+            tarefas = [
+                (diretorio_temp, f"parte_{indice:06d}", fonte, nome_tipo, delimitador, faixa)
+                for indice, (fonte, nome_tipo, delimitador, faixa)
+                in enumerate(self._montar_tarefas([(f, t) for f, t in fontes_tipadas if t]))
+            ]
+            if not tarefas:
+                print("\nAVISO: NENHUM ARQUIVO CSV/TXT/BRUTO FOI ENCONTRADO. O dataset Parquet ficará vazio.")
+            
+            total_linhas = 0
+            if self.num_processos > 1 and len(tarefas) > 1:
+                print(f"Gravando {len(tarefas)} tarefas com {self.num_processos} processos em paralelo.")
+                with ProcessPoolExecutor(max_workers=min(self.num_processos, len(tarefas))) as executor:
+                    futuros = {executor.submit(_consolidar_parte_parquet, *tarefa): tarefa for tarefa in tarefas}
+                    resultados = ((futuros[f], f.result()) for f in tqdm(as_completed(futuros), total=len(futuros), desc="Progresso Consolidação", unit="parte"))
+                    for tarefa, (_, linhas, erro) in resultados:
+                        total_linhas += linhas
+                        if erro:
+                            print(f"\n  !!! ERRO ao processar o arquivo {tarefa[2].nome_arquivo} (Tipo: {tarefa[3]}) [Pulando]: {erro}")
+            else:
+                for tarefa in tqdm(tarefas, desc="Progresso Consolidação", unit="arquivo"):
+                    _, linhas, erro = _consolidar_parte_parquet(*tarefa)
+                    total_linhas += linhas
+                    if erro:
+                        print(f"\n  !!! ERRO ao processar o arquivo {tarefa[2].nome_arquivo} (Tipo: {tarefa[3]}) [Pulando]: {erro}")
+            
+            open(os.path.join(diretorio_temp, ARQUIVO_SUCESSO_PARQUET), 'w').close()
+            os.replace(diretorio_temp, diretorio_final)
+            
+        except Exception as e:
+            print(f"\n🛑 ERRO FATAL ao gravar o dataset Parquet: {e}")
+            shutil.rmtree(diretorio_temp, ignore_errors=True)
+            return False
+        
+        duracao = time.time() - inicio_consolidacao
+        print(f"\n✅ CONSOLIDAÇÃO CONCLUÍDA! O dataset Parquet foi gerado com sucesso.")
+        print(f"Linhas consolidadas: {total_linhas} em {duracao:.2f}s ({total_linhas / max(duracao, 1e-9):,.0f} linhas/s).")
+        return self._gerar_grafo_socios(diretorio_final)
 
     def fase_4_5_consolidar_csv_mestre(self):
         """FASE 4/5: Transforma, limpa e consolida todos os dados em UM ÚNICO CSV MESTRE."""
         
+        if self.formato == 'parquet':
+            if self.ordenar_por_cnpj:
+                print("AVISO: A ordenação por cnpj_basico (mestre clusterizado) só se aplica ao CSV Mestre. Ignorando.")
+            return self.fase_4_5_consolidar_parquet()
+        
         caminho_saida_final = os.path.join(self.diretorio_saida_final, NOME_ARQUIVO_MESTRE)
         
         # ======================================================================
@@ -112,101 +858,114 @@ class ProcessadorConsolidacaoELimpeza:
             print("ESTADO DETECTADO: CSV_Mestre_Final.csv JÁ EXISTE e não está vazio.")
             print("PULANDO FASES 4 & 5 (CONSOLIDAÇÃO).")
             print("=" * 100)
-            return True
+            if self.ordenar_por_cnpj and not os.path.exists(os.path.join(self.diretorio_saida_final, NOME_INDICE_ESPARSO)):
+                if not self._clusterizar_mestre(caminho_saida_final):
+                    return False
+            return self._gerar_grafo_socios(caminho_saida_final, somente_se_ausente=True)
             
         print("\n" + "=" * 70)
         print("FASES 4/5: INICIANDO CONSOLIDAÇÃO NO CSV MESTRE ÚNICO")
+        if self.ler_direto_dos_zips:
+            print("Modo sem extração: as tabelas brutas serão lidas diretamente dos ZIPs.")
+        print(f"Motor de consolidação: '{self.motor}'")
         print(f"O CSV Mestre será gerado em: {os.path.abspath(caminho_saida_final)}")
         print("=" * 70)
+        
+        inicio_consolidacao = time.time()
+        total_linhas = 0
 
         try:
+            # O mestre será regravado fora de ordem: um índice esparso antigo apontaria para offsets inválidos
+            invalidar_indice_esparso(self.diretorio_saida_final)
+            
             # Abre o arquivo de saída para escrita (modo 'w' para criar/sobrescrever)
             with open(caminho_saida_final, 'w', newline='', encoding='utf-8') as outfile:
                 writer = csv.writer(outfile, delimiter=DELIMITADOR_PADRAO, quotechar='"', quoting=csv.QUOTE_MINIMAL)
                 writer.writerow(CABECALHO_FINAL) # Escreve o cabeçalho
                 
-                mapa_final_index = {nome: idx for idx, nome in enumerate(CABECALHO_FINAL)}
-                
-                # Lista de todos os arquivos CSV/TXT em Temp_brutos e subpastas
-                todos_arquivos_brutos = []
-                for root, _, files in os.walk(self.diretorio_saida_trabalho):
-                    for f in files:
-                        # Extensões reais detectadas nos seus arquivos (ex: .ESTABELE, .EMPRECSV)
-                        extensoes_reais = ('.csv', '.txt', 'estable', 'empree', 'sociocsv', 'natjucsv', 'paiscsv', 'moticsv', 'cnaecsv', 'qualscsv', '.simple')
-                        
-                        # Verifica se o final do nome do arquivo corresponde a uma das extensões
-                        if f.lower().endswith(extensoes_reais): 
-                            todos_arquivos_brutos.append((os.path.join(root, f), f))
+                # Lista de todos os arquivos brutos (Temp_brutos ou membros dos ZIPs)
+                todos_arquivos_brutos = self._listar_fontes_brutas()
                 
                 if not todos_arquivos_brutos:
                     # Se não há arquivos brutos, mas o processo deve seguir
-                    print("\nAVISO: NENHUM ARQUIVO CSV/TXT/BRUTO FOI ENCONTRADO na pasta Temp_brutos. O CSV Mestre ficará apenas com o cabeçalho.")
+                    origem = "nos ZIPs do período" if self.ler_direto_dos_zips else "na pasta Temp_brutos"
+                    print(f"\nAVISO: NENHUM ARQUIVO CSV/TXT/BRUTO FOI ENCONTRADO {origem}. O CSV Mestre ficará apenas com o cabeçalho.")
                     return True 
 
 
-                # Iteração principal sobre CADA arquivo bruto encontrado
-                for caminho_completo, nome_arquivo in tqdm(
-                    todos_arquivos_brutos,
-                    desc="Progresso Consolidação",
-                    unit="arquivo"
-                ):
-                    
-                    # 1. Tenta encontrar a CATEGORIA (EMPRE, ESTABELE, SOCIO, etc.)
-                    nome_arquivo_maiusculo = nome_arquivo.upper()
-                    nome_pasta_pai = os.path.basename(os.path.dirname(caminho_completo)).upper()
-                    chave_busca = nome_pasta_pai + " " + nome_arquivo_maiusculo 
-                    
-                    nome_tipo_encontrado = None
-                    
-                    # Lógica de mapeamento flexível (baseada no nome da pasta/arquivo)
-                    if 'EMPRESA' in chave_busca: nome_tipo_encontrado = 'EMPRE'
-                    elif 'ESTABELECIMENTO' in chave_busca: nome_tipo_encontrado = 'ESTABELE'
-                    elif 'SOCIO' in chave_busca: nome_tipo_encontrado = 'SOCIO'
-                    elif 'CNAES' in chave_busca: nome_tipo_encontrado = 'CNAES'
-                    elif 'MOTIVO' in chave_busca: nome_tipo_encontrado = 'MOTIVOS'
-                    elif 'MUNIC' in chave_busca: nome_tipo_encontrado = 'MUNIC'
-                    elif 'NATJU' in chave_busca: nome_tipo_encontrado = 'NATJU'
-                    elif 'PAIS' in chave_busca: nome_tipo_encontrado = 'PAIS'
-                    elif 'QUALI' in chave_busca: nome_tipo_encontrado = 'QUALS'
-                    elif 'SIMPLES' in chave_busca: nome_tipo_encontrado = 'SIMPLES'
-
+                # 1. Tenta encontrar a CATEGORIA (EMPRE, ESTABELE, SOCIO, etc.) de cada arquivo
+                fontes_tipadas = [(fonte, _identificar_tipo(fonte)) for fonte in todos_arquivos_brutos]
+                fontes_tipadas = [(fonte, nome_tipo) for fonte, nome_tipo in fontes_tipadas if nome_tipo]
+                
+                if self.num_processos > 1 and fontes_tipadas:
+                    outfile.flush()
+                    total_linhas = self._consolidar_em_paralelo(fontes_tipadas, outfile)
                     
-                    if not nome_tipo_encontrado:
-                        continue 
-
-                    mapa_posicional = MAPA_COLUNAS_CONSOLIDADO[nome_tipo_encontrado]
+                else:
+                    # Iteração principal sobre CADA arquivo bruto encontrado
+                    for fonte, nome_tipo_encontrado in tqdm(
+                        fontes_tipadas,
+                        desc="Progresso Consolidação",
+                        unit="arquivo"
+                    ):
+                        delimitador_real = None
+                        posicao_inicial = outfile.tell()
+                        try:
+                            delimitador_real = _detectar_delimitador(fonte)
+                            total_linhas += MOTORES_CONSOLIDACAO[self.motor](fonte, nome_tipo_encontrado, delimitador_real, outfile)
 
-
-                    try:
-                        delimitador_real = self._detectar_delimitador(caminho_completo)
-                        
-                        # errors='ignore' para evitar que o Python trave em caracteres estranhos
-                        with open(caminho_completo, 'r', encoding=ENCODING_LEITURA, errors='ignore') as infile:
-                            reader = csv.reader(infile, delimiter=delimitador_real, quotechar='"')
-                            
-                            for linha_bruta in reader:
-                                linha_mestre = [''] * len(CABECALHO_FINAL)
-                                
-                                # Mapeamento e Transferência de dados
-                                for idx_bruto, nome_final in mapa_posicional:
-                                    if idx_bruto < len(linha_bruta):
-                                        valor = linha_bruta[idx_bruto].strip()
-                                        
-                                        if nome_final in mapa_final_index:
-                                            idx_final = mapa_final_index[nome_final]
-                                            linha_mestre[idx_final] = valor
-                                            
-                                linha_mestre[-1] = nome_tipo_encontrado # Adiciona a coluna de origem
-                                writer.writerow(linha_mestre)
-
-                    except Exception as e:
-                        print(f"\n  !!! ERRO ao processar o arquivo {nome_arquivo} (Tipo: {nome_tipo_encontrado}) com delimitador '{delimitador_real or 'Padrão'}' [Pulando]: {e}")
+                        except Exception as e:
+                            # Descarta as linhas já escritas da fonte com falha (ex: CRC inválido no fim de um membro do ZIP)
+                            outfile.seek(posicao_inicial)
+                            outfile.truncate()
+                            print(f"\n  !!! ERRO ao processar o arquivo {fonte.nome_arquivo} (Tipo: {nome_tipo_encontrado}) com delimitador '{delimitador_real or 'Padrão'}' [Pulando]: {e}")
                         
         except Exception as e:
             print(f"\n🛑 ERRO FATAL ao escrever o arquivo mestre ou na estrutura principal: {e}")
             return False 
             
+        duracao = time.time() - inicio_consolidacao
         print(f"\n✅ CONSOLIDAÇÃO CONCLUÍDA! O CSV MESTRE ÚNICO foi gerado com sucesso.")
+        print(f"Linhas consolidadas: {total_linhas} em {duracao:.2f}s ({total_linhas / max(duracao, 1e-9):,.0f} linhas/s, motor '{self.motor}').")
+        
+        if self.ordenar_por_cnpj and not self._clusterizar_mestre(caminho_saida_final):
+            return False
+        return self._gerar_grafo_socios(caminho_saida_final)
+    
+    def _clusterizar_mestre(self, caminho_mestre):
+        """Ordena o CSV Mestre por cnpj_basico e grava o índice esparso (buscas por CNPJ sem varrer o arquivo)."""
+        print("\n" + "=" * 70)
+        print("ORDENANDO O CSV MESTRE POR cnpj_basico (MESTRE CLUSTERIZADO + ÍNDICE ESPARSO)")
+        print("=" * 70)
+        inicio = time.time()
+        try:
+            total_linhas = ordenar_mestre_por_cnpj(caminho_mestre, os.path.join(self.diretorio_periodo, DIRETORIO_RUNS_ORDENACAO_NOME))
+        except Exception as e:
+            print(f"\n🛑 ERRO FATAL ao ordenar o CSV Mestre: {e}")
+            return False
+        print(f"✅ Mestre ordenado: {total_linhas} linhas em {time.time() - inicio:.2f}s. Índice esparso (a cada {INTERVALO_INDICE_ESPARSO} linhas) em {NOME_INDICE_ESPARSO}.")
+        return True
+    
+    def _gerar_grafo_socios(self, caminho_mestre, somente_se_ausente=False):
+        """
+        Gera o grafo sócio <-> empresa (Grafo_socios/) a partir do mestre recém-consolidado.
+        É um artefato auxiliar: uma falha aqui vira AVISO e não invalida a consolidação.
+        """
+        if not GERAR_GRAFO_SOCIOS:
+            return True
+        try:
+            from grafo_socios import NOME_DIRETORIO_GRAFO, gerar_grafo_socios
+        except ImportError as e:
+            print(f"AVISO: O grafo de sócios requer pandas e numpy ({e}). Etapa ignorada.")
+            return True
+        if somente_se_ausente and os.path.isdir(os.path.join(self.diretorio_saida_final, NOME_DIRETORIO_GRAFO)):
+            return True
+        
+        print("\n" + "=" * 70)
+        print("GERANDO O GRAFO SÓCIO <-> EMPRESA (ADJACÊNCIA EM CSR)")
+        print("=" * 70)
+        if not gerar_grafo_socios(caminho_mestre):
+            print("AVISO: O grafo de sócios não foi gerado; a consolidação segue válida.")
         return True
     
     # ==========================================================================
@@ -221,21 +980,31 @@ class ProcessadorConsolidacaoELimpeza:
 # FUNÇÃO WRAPPER PARA O ORQUESTRADOR
 # ==============================================================================
 
-def executar_consolidacao():
+def executar_consolidacao(ler_direto_dos_zips=LER_DIRETO_DOS_ZIPS, num_processos=None, motor=MOTOR_CONSOLIDACAO, formato=FORMATO_SAIDA,
+                          ordenar_por_cnpj=ORDENAR_MESTRE_POR_CNPJ, zips_ignorados=None):
     """
     Função principal wrapper para o Orquestrador Mestre (Fases 4/5).
+    Com `ler_direto_dos_zips`, consolida a partir dos ZIPs sem depender de Temp_brutos.
+    `num_processos` sobrepõe MAX_PROCESSOS_CONSOLIDACAO (1 = modo sequencial), `motor` escolhe 'csv' ou 'pandas'
+    e `formato` escolhe entre o CSV Mestre ('csv') e o dataset particionado ('parquet').
+    Com `ordenar_por_cnpj`, o CSV Mestre sai ordenado por cnpj_basico e acompanhado do índice esparso.
+    `zips_ignorados` lista os ZIPs que não entram no modo sem extração; None usa a lista gravada pela verificação de CRC.
     Retorna True em caso de sucesso ou False em caso de falha.
     """
     try:
         # A verificação de 'tqdm' agora é tratada pelo bloco de importação no run_pipeline.py
         
-        processador = ProcessadorConsolidacaoELimpeza()
+        processador = ProcessadorConsolidacaoELimpeza(ler_direto_dos_zips, num_processos, motor, formato, ordenar_por_cnpj, zips_ignorados)
 
         if not processador.diretorio_periodo:
               print("ERRO: Não foi possível encontrar a pasta de dados mais recente (AAAA-MM) em Dados_CNPJ.")
               return False
 
-        if not os.path.exists(processador.diretorio_saida_trabalho):
+        if processador.ler_direto_dos_zips:
+            if not any(f.lower().endswith('.zip') for f in os.listdir(processador.diretorio_periodo)):
+                print("ERRO: Nenhum arquivo ZIP encontrado no período para o modo sem extração. Verifique se a Fase 1 (Download) foi concluída.")
+                return False
+        elif not os.path.exists(processador.diretorio_saida_trabalho):
             # Esta verificação é CRÍTICA, pois garante que as Fases 2/3 ocorreram.
             print("ERRO: Pasta de trabalho 'Temp_brutos' não encontrada. Verifique se as Fases 2/3 (Descompactação) falharam. Executando 'pip install pandas tqdm' pode resolver.")
             return False
@@ -246,7 +1015,7 @@ def executar_consolidacao():
             
         print("\n" + "=" * 100)
         print("FASE 4/5 (CONSOLIDAÇÃO) CONCLUÍDA COM SUCESSO.")
-        print("Os dados estão prontos no CSV MESTRE FINAL.")
+        print(f"Os dados estão prontos no {'DATASET PARQUET' if processador.formato == 'parquet' else 'CSV MESTRE FINAL'}.")
         print("=" * 100)
         return True
 
@@ -4,41 +4,146 @@ import pandas as pd
 import numpy as np
 import os
 import re
+import glob
+import csv
+import html
+import json
+import string
+import time
+import unicodedata
+import heapq
+import shutil
+from collections import defaultdict
+from itertools import groupby
 from tqdm import tqdm
-from typing import List, Optional
+from functools import reduce
+from operator import and_
+from typing import Callable, Iterator, List, Optional
+
+from filtro_leads import carregar_filtro, compilar_filtro
+# Caminhos do mestre (CSV ou dataset Parquet) e períodos: definidos uma vez na consolidação
+from organizer_cnpj import DIRETORIO_BASE, NOME_ARQUIVO_MESTRE, _listar_periodos, _caminho_mestre_do_periodo
 
 # --- Configurações de Caminho e Agregação ---
-DIRETORIO_BASE = 'Dados_CNPJ'
-NOME_ARQUIVO_MESTRE = 'CSV_Mestre_Final.csv'
+LINHAS_POR_BLOCO_LEITURA = 500_000 # Tamanho dos blocos do carregador em streaming
+NOME_ARQUIVO_SAIDA_HTML = 'leads.html' # Página gerada; o template (index.html) não é alterado
+PLACEHOLDER_LEADS = "<!-- LEADS_CONTENT_HERE -->" # Ponto do template onde os cards são inseridos
+
+# Saída: 'html' (página única em streaming) ou 'site' (site paginado: páginas JSON + manifesto + índice de busca)
+MODO_SAIDA_LEADS = 'html'
+DIRETORIO_SITE = 'site_leads'
+LEADS_POR_PAGINA = 1000
+AGRUPAR_PAGINAS_POR = None # None, 'uf' ou 'municipio' (UF + município)
+ARQUIVO_SCRIPT_SITE = 'site_leads.js' # Script do dashboard (ao lado deste módulo), copiado para o site
 SEPARADOR_AGREGACAO = ' | ' # Separador para juntar múltiplos valores (ex: Sócios, CNAEs)
 
+# Filtro da campanha (além do CNPJ Ativo): arquivo JSON/YAML ou expressão (ver filtro_leads.py), ex.:
+# "uf in SP,RJ; capital_social >= 10000; cnae_fiscal_principal ^= 62; correio_eletronico presente". None = sem filtro.
+FILTRO_LEADS = None
+
+# Índices em disco sobre os leads finais (indices_leads.py): busca por nome (termos + trigramas) e CNAE -> leads
+GERAR_INDICES_LEADS = True
+
+# Modo delta (delta_cnpj.py): compara as impressões digitais por CNPJ do período anterior com as do atual e só
+# reagrega os CNPJs inseridos/atualizados/removidos; os demais leads vêm do instantâneo do período anterior.
+# Só a leitura/agregação é incremental: o HTML (ou o site) e os índices são gerados de novo sobre todos os leads.
+MODO_DELTA_LEADS = False
+NOME_ARQUIVO_INSTANTANEO_LEADS = 'Leads_finais_{motor}.csv' # Leads finais (sem filtro de campanha), na pasta do período
+NOME_ARQUIVO_NOVAS_ABERTURAS = 'leads_novas_aberturas.csv' # Leads dos CNPJs abertos desde o período anterior
+
+# Montagem dos leads: 'agrupamento' (união + groupby por cnpj_basico, um card por empresa),
+# 'ordenacao_externa' (mesmo resultado, via runs ordenados em disco + merge k-way, memória limitada) ou
+# 'juncao' (joiner_cnpj: hash join ESTABELE ⋈ EMPRE ⋈ SIMPLES ⋈ SÓCIOS, um card por estabelecimento)
+MOTOR_LEADS = 'agrupamento'
+ORCAMENTO_MEMORIA_AGRUPAMENTO_MB = 512 # Linhas acumuladas antes de despejar um run ordenado em disco
+DIRETORIO_RUNS_NOME = 'Runs_agrupamento'
+COLUNA_SEQUENCIA = '__seq' # Posição da linha na leitura: desempata a chave e preserva a ordem original
+
+# Colunas usadas pela fase 7 (as demais colunas do mestre nunca são lidas do Parquet)
+COLUNAS_MANTER_PRIMEIRO = [
+    'cnpj_basico', 'cnpj_ordem', 'cnpj_dv', 'matriz_filial', 
+    'razao_social', 'nome_fantasia', 'data_inicio_atividade', 
+    'situacao_cadastral', 'data_situacao_cadastral', 'capital_social',
+    'logradouro', 'numero', 'complemento', 'bairro', 'cep', 'uf', 'nome_municipio',
+    'ddd_1', 'telefone_1', 'correio_eletronico', 'cnae_fiscal_principal', 'porte_empresa'
+]
+
+COLUNAS_AGREGAR = [
+    'nome_socio', 'cpf_cnpj_socio', 'qualificacao_socio', 
+    'cnae_fiscal_secundario'
+]
+
+# Mapeamento de tipos para economizar memória (Reduz o uso de RAM de 11GB para 3-5GB)
+DTYPE_LEADS = {
+    # Tipos Categóricos/Códigos (Repetição de valores)
+    'situacao_cadastral': 'category',
+    'porte_empresa': 'category',
+    'codigo_municipio': 'category',
+    'uf': 'category',
+    'matriz_filial': 'category',
+    'TABELA_ORIGEM': 'category',
+    'cnae_fiscal_principal': 'category',
+    
+    # Manter como 'object' para strings longas ou variáveis
+    'cnae_fiscal_secundario': 'object',
+    'nome_socio': 'object', 
+    
+    # Tipos Numéricos (CNPJs e Datas, tratados como strings para manter zeros à esquerda)
+    'cnpj_basico': 'string',
+    'cnpj_ordem': 'string',
+    'cnpj_dv': 'string',
+    'data_inicio_atividade': 'string',
+    'data_situacao_cadastral': 'string',
+    
+    # Capital Social e strings longas (Nomes e Endereços)
+    'capital_social': np.float64, # Usar float para o capital
+    'razao_social': 'string',
+    'nome_fantasia': 'string',
+    'correio_eletronico': 'string',
+}
+
+# Esquema compacto da fase 7 (aplicado bloco a bloco, depois dos predicados de leitura): partes do CNPJ como
+# inteiros de largura fixa (zeros à esquerda restaurados na saída por _formato_texto), datas AAAAMMDD como int32,
+# capital em centavos (int64) e códigos como categorias com um dicionário único por coluna, comum a todos os blocos.
+# Linhas sem cnpj_basico (tabelas de domínio) não formam lead e são descartadas na compactação.
+TIPOS_CNPJ_COMPACTO = {'cnpj_basico': np.uint32, 'cnpj_ordem': 'UInt16', 'cnpj_dv': 'UInt8'}
+LARGURAS_CNPJ = {'cnpj_basico': 8, 'cnpj_ordem': 4, 'cnpj_dv': 2}
+COLUNAS_DATA_COMPACTA = ['data_inicio_atividade', 'data_situacao_cadastral']
+COLUNAS_CODIGO_COMPACTO = [coluna for coluna, tipo in DTYPE_LEADS.items() if tipo == 'category']
+# Vocabulário fixo dos códigos de domínio pequeno (layout da RF): os dicionários partem dele, então as mesmas
+# categorias valem em todas as cargas e períodos. Códigos fora dele (e municípios/CNAEs) são acrescentados ao fim.
+VOCABULARIOS_CODIGO_COMPACTO = {
+    'situacao_cadastral': ['1', '2', '3', '4', '8'],
+    'porte_empresa': ['00', '01', '03', '05'],
+    'matriz_filial': ['1', '2'],
+    'uf': ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI',
+           'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO', 'EX'],
+    'TABELA_ORIGEM': ['EMPRE', 'ESTABELE', 'SOCIO', 'SIMPLES', 'CNAES', 'MOTIVOS', 'MUNIC', 'NATJU', 'PAIS', 'QUALS'],
+}
+
 # ==============================================================================
 # FUNÇÕES DE UTILIDADE (Com correção para encontrar o caminho)
 # ==============================================================================
 
 def _encontrar_caminho_mestre() -> Optional[str]:
-    """Localiza o caminho completo para o CSV Mestre mais recente (Versão Corrigida)."""
+    """
+    Localiza o caminho completo para o CSV Mestre mais recente (Versão Corrigida).
+    Se o período tiver um dataset Parquet completo (Mestre_Parquet/_SUCCESS), retorna o diretório do dataset.
+    """
     try:
         # 1. Encontra a subpasta de período (AAAA-MM) mais recente
-        itens = os.listdir(DIRETORIO_BASE)
-        padrao_data = re.compile(r'^\d{4}-\d{2}$')
-        diretorios_de_periodo = [
-            item for item in itens 
-            if os.path.isdir(os.path.join(DIRETORIO_BASE, item)) and padrao_data.match(item)
-        ]
+        diretorios_de_periodo = _listar_periodos()
         
         if not diretorios_de_periodo:
             print("AVISO: Nenhuma pasta AAAA-MM encontrada dentro de Dados_CNPJ.") 
             return None
 
         # Pega a pasta mais recente (Ex: 2025-11)
-        diretorio_recente_nome = sorted(diretorios_de_periodo, reverse=True)[0]
-        diretorio_periodo = os.path.join(DIRETORIO_BASE, diretorio_recente_nome)
-        
-        caminho_mestre = os.path.join(diretorio_periodo, NOME_ARQUIVO_MESTRE)
+        diretorio_periodo = os.path.join(DIRETORIO_BASE, diretorios_de_periodo[-1])
+        caminho_mestre = _caminho_mestre_do_periodo(diretorio_periodo)
         
-        if not os.path.exists(caminho_mestre):
-            print(f"AVISO: Arquivo CSV Mestre não encontrado em: {caminho_mestre}.")
+        if not caminho_mestre:
+            print(f"AVISO: Arquivo CSV Mestre não encontrado em: {os.path.join(diretorio_periodo, NOME_ARQUIVO_MESTRE)}.")
             return None
         
         return caminho_mestre
@@ -50,157 +155,521 @@ def _encontrar_caminho_mestre() -> Optional[str]:
         print(f"ERRO inesperado ao buscar caminho mestre: {e}")
         return None
 
+def _iterar_blocos_parquet(diretorio_parquet: str, colunas: List[str],
+                           predicados: List[Callable[[pd.DataFrame], pd.Series]] = ()) -> Iterator[pd.DataFrame]:
+    """
+    Lê o dataset Parquet (particionado por TABELA_ORIGEM/uf) em lotes, lendo do disco apenas as `colunas` pedidas.
+    Cada partição tem só as colunas da sua tabela; o schema é unificado e as ausentes voltam como nulas.
+    Predicados com `expressao_arrow` (filtro_leads) são empurrados para o scanner: partições e row groups
+    descartados pelo filtro nem são lidos.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    
+    arquivos = glob.glob(os.path.join(diretorio_parquet, '**', '*.parquet'), recursive=True)
+    schema = pa.unify_schemas([pq.read_schema(arquivo) for arquivo in arquivos]) if arquivos else pa.schema([])
+    for campo_particao in ('TABELA_ORIGEM', 'uf'):
+        if campo_particao not in schema.names:
+            schema = schema.append(pa.field(campo_particao, pa.string()))
+    
+    dataset = ds.dataset(diretorio_parquet, format='parquet', partitioning='hive', schema=schema)
+    colunas_existentes = [coluna for coluna in colunas if coluna in schema.names]
+    expressoes = [predicado.expressao_arrow(schema) for predicado in predicados if hasattr(predicado, 'expressao_arrow')]
+    expressoes = [expressao for expressao in expressoes if expressao is not None]
+    filtro_arrow = reduce(and_, expressoes) if expressoes else None
+    for lote in dataset.to_batches(columns=colunas_existentes, filter=filtro_arrow, batch_size=LINHAS_POR_BLOCO_LEITURA):
+        bloco = lote.to_pandas()
+        for coluna in colunas:
+            if coluna not in bloco.columns:
+                bloco[coluna] = np.nan
+        yield bloco[colunas]
+
+def _iterar_blocos_csv(caminho_csv: str, colunas: List[str], dtype_spec: dict) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos só com as `colunas` pedidas; strings vazias já viram NA no parse (sem replace posterior)."""
+    leitor = pd.read_csv(
+        caminho_csv, 
+        sep=';', 
+        encoding='utf-8', 
+        usecols=colunas,
+        dtype={coluna: dtype_spec.get(coluna, 'object') for coluna in colunas}, # Sem inferência: códigos continuam texto
+        keep_default_na=False,
+        na_values=[''],
+        decimal=',', # capital_social no formato da RF ('1.000,50')
+        thousands='.',
+        chunksize=LINHAS_POR_BLOCO_LEITURA
+    )
+    with leitor:
+        for bloco in leitor:
+            yield bloco[colunas] # usecols devolve na ordem do arquivo
+
+def _iterar_blocos_filtrados(caminho_mestre: str, colunas: List[str], dtype_spec: dict,
+                             predicados: List[Callable[[pd.DataFrame], pd.Series]]) -> Iterator[pd.DataFrame]:
+    """Gera os blocos do mestre (CSV ou dataset Parquet) já com os `predicados` de linha aplicados."""
+    if os.path.isdir(caminho_mestre):
+        blocos_lidos = _iterar_blocos_parquet(caminho_mestre, colunas, predicados)
+    else:
+        blocos_lidos = _iterar_blocos_csv(caminho_mestre, colunas, dtype_spec)
+    
+    linhas_lidas = linhas_mantidas = 0
+    for bloco in tqdm(blocos_lidos, desc="Lendo o mestre em blocos", unit=" bloco"):
+        linhas_lidas += len(bloco)
+        for predicado in predicados:
+            bloco = bloco[predicado(bloco)]
+        linhas_mantidas += len(bloco)
+        yield bloco
+    
+    print(f"Linhas lidas: {linhas_lidas} | Mantidas após os predicados por bloco: {linhas_mantidas}")
+
+def _restaurar_categorias(df: pd.DataFrame, dtype_spec: dict) -> pd.DataFrame:
+    """Blocos com categorias diferentes voltam como object no concat: restaura o tipo categórico."""
+    for coluna, tipo in dtype_spec.items():
+        if tipo == 'category' and coluna in df.columns:
+            df[coluna] = df[coluna].astype('category')
+    return df
+
+def _carregar_mestre_em_blocos(caminho_mestre: str, colunas: List[str], dtype_spec: dict,
+                               predicados: List[Callable[[pd.DataFrame], pd.Series]], compactar: bool = False,
+                               dicionarios: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Carrega o mestre (CSV ou dataset Parquet) bloco a bloco, aplicando os `predicados` de linha em cada bloco
+    antes de acumular: o pico de memória acompanha o resultado filtrado, não o arquivo bruto.
+    Com `compactar=True`, cada bloco já é acumulado no esquema compacto (ver _compactar_bloco); `dicionarios`
+    (de _novos_dicionarios) permite compartilhar as categorias com outra carga.
+    """
+    if compactar:
+        dicionarios = _novos_dicionarios() if dicionarios is None else dicionarios
+        blocos = [_compactar_bloco(bloco, dicionarios) for bloco in _iterar_blocos_filtrados(caminho_mestre, colunas, dtype_spec, predicados)]
+        return _juntar_blocos_compactos(blocos, dicionarios) if blocos else _compactar_bloco(pd.DataFrame(columns=colunas), dicionarios)
+    blocos = list(_iterar_blocos_filtrados(caminho_mestre, colunas, dtype_spec, predicados))
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    return _restaurar_categorias(pd.concat(blocos, ignore_index=True), dtype_spec)
+
+def _filtro_ativos(bloco: pd.DataFrame) -> pd.Series:
+    """
+    Predicado de linha (CNPJ Ativo): descarta estabelecimentos não ativos já na leitura.
+    Linhas das demais tabelas (EMPRE, SOCIO, SIMPLES...) não têm situacao_cadastral e são mantidas.
+    """
+    situacao = bloco['situacao_cadastral']
+    return situacao.isna() | (situacao == '1')
+
+# Predicados aplicados bloco a bloco durante a leitura
+PREDICADOS_LEITURA = [_filtro_ativos]
+
+def _filtro_leads_ativos(df_leads: pd.DataFrame) -> pd.Series:
+    """Filtro final de leads (sobre a linha já agregada): CNPJ Ativo."""
+    return df_leads['situacao_cadastral'] == '1'
+
+# ==============================================================================
+# ESQUEMA COMPACTO (CNPJ, DATAS, CAPITAL E CÓDIGOS)
+# ==============================================================================
+
+def _inteiros(serie: pd.Series, tipo) -> pd.Series:
+    """Texto com dígitos (ou coluna já inteira) -> inteiros do `tipo`; vazios e inválidos viram nulos."""
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype(tipo)
+    return pd.to_numeric(_texto(serie), errors='coerce').astype(tipo)
+
+def _centavos(serie: pd.Series) -> pd.Series:
+    """
+    Capital em centavos (Int64). Coluna inteira = já em centavos; float = reais (CSV lido com decimal=',' ou
+    Parquet); texto = reais no formato da RF ('1000,00', '1.000,50') ou com ponto decimal ('1000.5').
+    """
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype('Int64')
+    if pd.api.types.is_float_dtype(serie.dtype):
+        reais = serie
+    else:
+        texto = _texto(serie).astype('string')
+        formato_rf = texto.str.contains(',', regex=False).fillna(False)
+        texto = texto.where(~formato_rf, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+        reais = pd.to_numeric(texto, errors='coerce')
+    return (reais.astype(np.float64) * 100).round().astype('Int64')
+
+def _novos_dicionarios() -> dict:
+    """Dicionários de categorias de uma carga, já com o vocabulário fixo (VOCABULARIOS_CODIGO_COMPACTO)."""
+    return {coluna: pd.Index(vocabulario, dtype=object) for coluna, vocabulario in VOCABULARIOS_CODIGO_COMPACTO.items()}
+
+def _codificar(serie: pd.Series, dicionarios: dict, coluna: str) -> pd.Categorical:
+    """Categoria com o dicionário da coluna (só cresce: os códigos dos blocos anteriores continuam válidos)."""
+    valores = _texto(serie)
+    categorias = dicionarios.get(coluna, pd.Index([], dtype=object))
+    novos = pd.Index(valores.dropna().unique()).difference(categorias)
+    if len(novos):
+        categorias = categorias.append(novos)
+        dicionarios[coluna] = categorias
+    return pd.Categorical(valores, categories=categorias)
+
+def _compactar_bloco(bloco: pd.DataFrame, dicionarios: dict) -> pd.DataFrame:
+    """Converte um bloco (texto/float do CSV, Parquet ou runs) para o esquema compacto. `dicionarios` é compartilhado entre blocos."""
+    basico = _inteiros(bloco['cnpj_basico'], 'UInt32')
+    validas = basico.notna().to_numpy()
+    bloco = bloco[validas].copy()
+    bloco['cnpj_basico'] = basico[validas].astype(TIPOS_CNPJ_COMPACTO['cnpj_basico'])
+    for coluna, tipo in TIPOS_CNPJ_COMPACTO.items():
+        if coluna in bloco.columns and coluna != 'cnpj_basico':
+            bloco[coluna] = _inteiros(bloco[coluna], tipo)
+    for coluna in COLUNAS_DATA_COMPACTA:
+        if coluna in bloco.columns:
+            datas = _inteiros(bloco[coluna], 'Int64')
+            bloco[coluna] = datas.where(datas > 0).astype('Int32') # '0'/'00000000' = sem data na RF
+    if 'capital_social' in bloco.columns:
+        bloco['capital_social'] = _centavos(bloco['capital_social'])
+    for coluna in COLUNAS_CODIGO_COMPACTO:
+        if coluna in bloco.columns:
+            bloco[coluna] = _codificar(bloco[coluna], dicionarios, coluna)
+    return bloco
+
+def _juntar_blocos_compactos(blocos: List[pd.DataFrame], dicionarios: dict) -> pd.DataFrame:
+    """Concatena mantendo as categorias: todos os blocos passam a usar o dicionário final de cada coluna."""
+    for bloco in blocos:
+        for coluna, categorias in dicionarios.items():
+            if coluna in bloco.columns:
+                bloco[coluna] = bloco[coluna].cat.set_categories(categorias)
+    return pd.concat(blocos, ignore_index=True)
+
+def _capital_em_reais(serie: pd.Series) -> pd.Series:
+    """Capital em reais (float, nulos como NaN), venha em centavos (esquema compacto) ou já em reais."""
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype('Float64').div(100).astype(np.float64)
+    return pd.to_numeric(serie, errors='coerce').astype(np.float64)
+
+def _cnpj_como_inteiro(df: pd.DataFrame) -> np.ndarray:
+    """CNPJ completo como int64 (básico * 10^6 + ordem * 100 + DV; partes ausentes valem zero). Ordena como o texto de 14 dígitos."""
+    partes = [pd.to_numeric(df[coluna], errors='coerce').fillna(0).to_numpy(dtype=np.int64) for coluna in LARGURAS_CNPJ]
+    return partes[0] * 1_000_000 + partes[1] * 100 + partes[2]
+
+def _formato_texto(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cópia no formato do mestre, para saída (cards, arquivos, API e filtro da campanha): CNPJ com zeros à esquerda,
+    datas AAAAMMDD em texto e capital em reais. Colunas que já estão nesse formato passam intactas.
+    """
+    df = df.copy()
+    for coluna, largura in LARGURAS_CNPJ.items():
+        if coluna in df.columns and pd.api.types.is_integer_dtype(df[coluna].dtype):
+            df[coluna] = df[coluna].astype('string').str.zfill(largura)
+    for coluna in COLUNAS_DATA_COMPACTA:
+        if coluna in df.columns and pd.api.types.is_integer_dtype(df[coluna].dtype):
+            df[coluna] = df[coluna].astype('string')
+    if 'capital_social' in df.columns:
+        df['capital_social'] = _capital_em_reais(df['capital_social'])
+    return df
+
+def _mascara_filtro(filtro: dict, df_leads: pd.DataFrame) -> np.ndarray:
+    """Filtro exato da campanha sobre os leads compactos (a especificação usa o formato do mestre)."""
+    return compilar_filtro(filtro)(_formato_texto(df_leads[list(filtro)]))
+
+# ==============================================================================
+# AGREGAÇÃO FORA DA MEMÓRIA (SORT-MERGE POR cnpj_basico)
+# ==============================================================================
+
+def _despejar_run(blocos: List[pd.DataFrame], caminho_run: str) -> None:
+    """Ordena as linhas acumuladas por cnpj_basico (estável: a ordem de leitura se mantém na chave) e grava o run."""
+    run = pd.concat(blocos, ignore_index=True).sort_values('cnpj_basico', kind='stable')
+    run.to_csv(caminho_run, sep=';', index=False, header=False, na_rep='', encoding='utf-8', lineterminator='\n')
+
+def _ler_run(caminho_run: str) -> Iterator[List[str]]:
+    with open(caminho_run, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.reader(f, delimiter=';')
+
+def _montar_lote_agregado(registros: List[list], colunas: List[str], dicionarios: dict) -> pd.DataFrame:
+    """Converte um lote de grupos emitidos pelo merge em DataFrame compacto (vazio -> nulo) e aplica o filtro final."""
+    lote = pd.DataFrame(registros, columns=colunas + [COLUNA_SEQUENCIA]).replace('', np.nan)
+    lote[COLUNA_SEQUENCIA] = lote[COLUNA_SEQUENCIA].astype(np.int64)
+    # Colunas mantidas com os tipos de texto da leitura do mestre (DTYPE_LEADS), como no groupby em memória;
+    # as agregadas ficam com o tipo inferido, como as saídas do .agg
+    lote = lote.astype({coluna: DTYPE_LEADS.get(coluna, 'object') for coluna in COLUNAS_MANTER_PRIMEIRO
+                        if DTYPE_LEADS.get(coluna, 'object') in ('string', 'object')})
+    lote['capital_social'] = pd.to_numeric(lote['capital_social']).astype('Int64') # Os runs guardam centavos
+    lote = _compactar_bloco(lote, dicionarios)
+    return lote[_filtro_leads_ativos(lote).fillna(False).to_numpy(dtype=bool)]
+
+def _agregar_por_ordenacao_externa(caminho_mestre: str, dtype_spec: dict,
+                                   predicados: List[Callable[[pd.DataFrame], pd.Series]],
+                                   orcamento_mb: Optional[float] = None, dicionarios: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Mesmo resultado do groupby em memória (primeira ocorrência de COLUNAS_MANTER_PRIMEIRO e valores únicos
+    de COLUNAS_AGREGAR unidos por SEPARADOR_AGREGACAO, na ordem de leitura), mas com memória limitada:
+    1. As linhas lidas são acumuladas até `orcamento_mb` e despejadas como runs ordenados por cnpj_basico.
+    2. Os runs são intercalados (merge k-way) e cada cnpj_basico é agregado ao sair do merge.
+    Só os grupos que passam no filtro final são mantidos em memória.
+    """
+    orcamento_mb = orcamento_mb or ORCAMENTO_MEMORIA_AGRUPAMENTO_MB
+    colunas = COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR
+    diretorio_runs = os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), DIRETORIO_RUNS_NOME)
+    if os.path.exists(diretorio_runs):
+        shutil.rmtree(diretorio_runs)
+    os.makedirs(diretorio_runs)
+    
+    try:
+        # 1. Runs ordenados
+        caminhos_runs: List[str] = []
+        dicionarios = _novos_dicionarios() if dicionarios is None else dicionarios
+        acumulados: List[pd.DataFrame] = []
+        bytes_acumulados = 0
+        sequencia = 0
+        for bloco in _iterar_blocos_filtrados(caminho_mestre, colunas, dtype_spec, predicados):
+            bloco = _compactar_bloco(bloco, dicionarios) # Sem chave não há grupo (como no groupby)
+            bloco = bloco.assign(**{COLUNA_SEQUENCIA: np.arange(sequencia, sequencia + len(bloco))})
+            sequencia += len(bloco)
+            acumulados.append(bloco)
+            bytes_acumulados += int(bloco.memory_usage(deep=True).sum())
+            if bytes_acumulados >= orcamento_mb * 1024 * 1024:
+                caminhos_runs.append(os.path.join(diretorio_runs, f"run_{len(caminhos_runs):05d}.csv"))
+                _despejar_run(acumulados, caminhos_runs[-1])
+                acumulados, bytes_acumulados = [], 0
+        if acumulados:
+            caminhos_runs.append(os.path.join(diretorio_runs, f"run_{len(caminhos_runs):05d}.csv"))
+            _despejar_run(acumulados, caminhos_runs[-1])
+            acumulados = []
+        print(f"Runs ordenados gravados: {len(caminhos_runs)} (orçamento de {orcamento_mb} MB)")
+        
+        # 2. Merge k-way + agregação grupo a grupo
+        idx_chave = colunas.index('cnpj_basico')
+        idx_sequencia = len(colunas)
+        idx_agregar = [colunas.index(coluna) for coluna in COLUNAS_AGREGAR]
+        intercalado = heapq.merge(*[_ler_run(caminho) for caminho in caminhos_runs],
+                                  key=lambda linha: (int(linha[idx_chave]), int(linha[idx_sequencia])))
+        
+        lotes: List[pd.DataFrame] = []
+        registros: List[list] = []
+        for _, grupo in tqdm(groupby(intercalado, key=lambda linha: linha[idx_chave]), desc="Agregando por cnpj_basico", unit=" CNPJ"):
+            linhas = list(grupo)
+            registro = list(linhas[0])
+            for idx in idx_agregar:
+                # Valores únicos na ordem de leitura (equivalente ao dropna().unique() do aggregate_data)
+                registro[idx] = SEPARADOR_AGREGACAO.join(dict.fromkeys(linha[idx] for linha in linhas if linha[idx]))
+            registros.append(registro)
+            if len(registros) >= LINHAS_POR_BLOCO_LEITURA:
+                lotes.append(_montar_lote_agregado(registros, colunas, dicionarios))
+                registros = []
+        if registros:
+            lotes.append(_montar_lote_agregado(registros, colunas, dicionarios))
+    finally:
+        shutil.rmtree(diretorio_runs, ignore_errors=True)
+    
+    if not lotes:
+        return _compactar_bloco(pd.DataFrame(columns=colunas), dicionarios)
+    
+    # Ordem da primeira ocorrência de cada CNPJ, como no drop_duplicates + merge do modo em memória
+    df_leads = _juntar_blocos_compactos(lotes, dicionarios).sort_values(COLUNA_SEQUENCIA, kind='stable')
+    return df_leads.drop(columns=COLUNA_SEQUENCIA).reset_index(drop=True)
+
 # ==============================================================================
 # 1. FUNÇÃO PRINCIPAL: FILTRAGEM E PRÉ-PROCESSAMENTO
 # ==============================================================================
 
-def aplicar_inteligencia_e_filtrar_leads(caminho_mestre: str, arquivo_html: str) -> bool:
+def carregar_leads_filtrados(caminho_mestre: str, motor: str = MOTOR_LEADS, filtro: Optional[dict] = None,
+                             cnpjs: Optional[np.ndarray] = None, dicionarios: Optional[dict] = None) -> Optional[pd.DataFrame]:
     """
-    Lê o CSV Mestre (com otimização de memória), aplica agregação total, filtra e gera o HTML.
+    Lê o mestre, agrega por CNPJ (conforme o `motor`) e aplica os filtros de leads.
+    `filtro` é a especificação já validada (filtro_leads.carregar_filtro): vai para a leitura em blocos (forma
+    relaxada, mantendo as linhas das outras tabelas) e é reaplicado exatamente sobre os leads agregados.
+    `cnpjs` (cnpj_basico inteiros, modo delta) restringe a leitura às linhas desses CNPJs; `dicionarios`
+    reaproveita as categorias de outra carga (os dois resultados podem ser concatenados sem perder o tipo).
+    Retorna o DataFrame final (COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR) ou None se a leitura falhar.
     """
-    print("=" * 80)
-    print("FASE 7: INICIANDO PROCESSAMENTO DE LEADS (AGREGAÇÃO DE DADOS COMPLETOS)")
-    print(f"Lendo dados de: {caminho_mestre}")
-    print("=" * 80)
+    predicados = PREDICADOS_LEITURA + ([compilar_filtro(filtro, na_leitura=True)] if filtro else [])
+    if cnpjs is not None:
+        # Antes dos demais: no Parquet vira filtro do scanner; no CSV, um isin por bloco
+        predicados = [compilar_filtro({'cnpj_basico': {'em': [f"{cnpj:08d}" for cnpj in cnpjs.tolist()]}})] + predicados
 
     # 1. LEITURA DOS DADOS (COM OTIMIZAÇÃO DE MEMÓRIA CRÍTICA)
     try:
-        # Mapeamento de tipos para economizar memória (Reduz o uso de RAM de 11GB para 3-5GB)
-        dtype_spec = {
-            # Tipos Categóricos/Códigos (Repetição de valores)
-            'situacao_cadastral': 'category',
-            'porte_empresa': 'category',
-            'codigo_municipio': 'category',
-            'uf': 'category',
-            'matriz_filial': 'category',
-            'TABELA_ORIGEM': 'category',
-            'cnae_fiscal_principal': 'category',
-            
-            # Manter como 'object' para strings longas ou variáveis
-            'cnae_fiscal_secundario': 'object',
-            'nome_socio': 'object', 
-            
-            # Tipos Numéricos (CNPJs e Datas, tratados como strings para manter zeros à esquerda)
-            'cnpj_basico': 'string',
-            'cnpj_ordem': 'string',
-            'cnpj_dv': 'string',
-            'data_inicio_atividade': 'string',
-            'data_situacao_cadastral': 'string',
-            
-            # Capital Social e strings longas (Nomes e Endereços)
-            'capital_social': np.float64, # Usar float para o capital
-            'razao_social': 'string',
-            'nome_fantasia': 'string',
-            'correio_eletronico': 'string',
-        }
+        dtype_spec = DTYPE_LEADS
         
-        df = pd.read_csv(
-            caminho_mestre, 
-            sep=';', 
-            encoding='utf-8', 
-            dtype=dtype_spec, # Usa a especificação de tipo para otimizar
-            low_memory=False, # Requer False para dtype_spec funcionar bem
-            keep_default_na=False
-        )
-        # Substitui strings vazias por NaN para agregação
-        df = df.replace('', np.nan) 
+        if motor == 'ordenacao_externa':
+            # Leitura e agregação juntas: runs ordenados em disco + merge k-way (memória limitada)
+            df = _agregar_por_ordenacao_externa(caminho_mestre, dtype_spec, predicados, dicionarios=dicionarios)
+        else:
+            # Só as colunas usadas na fase 7 são lidas (CSV Mestre, dataset Parquet ou saída do joiner);
+            # o filtro de ativos é aplicado em cada bloco, antes de acumular
+            df = _carregar_mestre_em_blocos(
+                caminho_mestre,
+                COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR,
+                dtype_spec,
+                predicados,
+                compactar=True,
+                dicionarios=dicionarios
+            )
 
     except Exception as e:
         print(f"🛑 ERRO: Falha ao carregar o CSV Mestre. {e}")
         print("Pode ser um erro de memória. Tente fechar outros programas e reexecutar.")
-        return False
+        return None
     
     print(f"Dados carregados. Linhas totais: {len(df)}")
 
 
     # 2. AGREGAÇÃO E CONCATENAÇÃO DE DADOS MÚLTIPLOS (NÃO PERDER INFORMAÇÕES)
-    
-    COLUNAS_MANTER_PRIMEIRO = [
-        'cnpj_basico', 'cnpj_ordem', 'cnpj_dv', 'matriz_filial', 
-        'razao_social', 'nome_fantasia', 'data_inicio_atividade', 
-        'situacao_cadastral', 'data_situacao_cadastral', 'capital_social',
-        'logradouro', 'numero', 'complemento', 'bairro', 'cep', 'uf', 'nome_municipio',
-        'ddd_1', 'telefone_1', 'correio_eletronico', 'cnae_fiscal_principal', 'porte_empresa'
-    ]
-    
-    COLUNAS_AGREGAR = [
-        'nome_socio', 'cpf_cnpj_socio', 'qualificacao_socio', 
-        'cnae_fiscal_secundario'
-    ]
+    # (COLUNAS_MANTER_PRIMEIRO e COLUNAS_AGREGAR estão definidas no topo do módulo)
 
-    # Função para agregar valores
-    def aggregate_data(series):
-        unique_values = series.dropna().unique()
-        return SEPARADOR_AGREGACAO.join(unique_values) if unique_values.size > 0 else np.nan
+    if motor == 'juncao':
+        # A junção já entregou os sócios agregados por empresa: nada a agrupar
+        df_leads = df
+        print(f"Estabelecimentos denormalizados (um por linha): {len(df_leads)}")
+    elif motor == 'ordenacao_externa':
+        # Já agregado (e pré-filtrado) grupo a grupo no merge
+        df_leads = df
+        print(f"Linhas consolidadas e agregadas (CNPJ Básico Único, ordenação externa): {len(df_leads)}")
+    else:
+        # Função para agregar valores
+        def aggregate_data(series):
+            unique_values = series.dropna().unique()
+            return SEPARADOR_AGREGACAO.join(unique_values) if unique_values.size > 0 else np.nan
 
-    # Executa a agregação nas colunas específicas
-    df_agregado = df.groupby('cnpj_basico')[COLUNAS_AGREGAR].agg(aggregate_data).reset_index()
+        # Executa a agregação nas colunas específicas
+        df_agregado = df.groupby('cnpj_basico')[COLUNAS_AGREGAR].agg(aggregate_data).reset_index()
 
-    # Mantém a primeira ocorrência das colunas únicas (e mais importantes)
-    df_manter = df.drop_duplicates(subset='cnpj_basico', keep='first')[COLUNAS_MANTER_PRIMEIRO]
-    
-    # Junta as duas partes para formar o DataFrame final de leads
-    df_leads = pd.merge(df_manter, df_agregado, on='cnpj_basico', how='left')
-    
-    print(f"Linhas consolidadas e agregadas (CNPJ Básico Único): {len(df_leads)}")
+        # Mantém a primeira ocorrência das colunas únicas (e mais importantes)
+        df_manter = df.drop_duplicates(subset='cnpj_basico', keep='first')[COLUNAS_MANTER_PRIMEIRO]
+        
+        # Junta as duas partes para formar o DataFrame final de leads
+        df_leads = pd.merge(df_manter, df_agregado, on='cnpj_basico', how='left')
+        
+        print(f"Linhas consolidadas e agregadas (CNPJ Básico Único): {len(df_leads)}")
 
 
     # 3. FILTROS DE INTELIGÊNCIA CRÍTICA (Garantindo Leads de Qualidade)
     
     # 3.1. CNPJ Ativo
-    df_leads = df_leads[df_leads['situacao_cadastral'] == '1']
+    df_leads = df_leads[_filtro_leads_ativos(df_leads)]
     print(f"- Filtro Ativo (situacao_cadastral=1): {len(df_leads)}")
 
+    # 3.2. Filtro da campanha (especificação declarativa)
+    if filtro:
+        df_leads = df_leads[_mascara_filtro(filtro, df_leads)]
+        print(f"- Filtro da campanha ({', '.join(filtro)}): {len(df_leads)}")
+
 
     # 4. GERAÇÃO DA ESTRUTURA FINAL
     COLUNAS_SITE_AGREGADAS = COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR 
     df_final = df_leads[COLUNAS_SITE_AGREGADAS].copy()
     
     print(f"Dados prontos para injeção HTML: {len(df_final)}")
+    return df_final
+
+def _caminho_instantaneo_leads(diretorio_periodo: str, motor: str) -> str:
+    return os.path.join(diretorio_periodo, NOME_ARQUIVO_INSTANTANEO_LEADS.format(motor=motor))
+
+def gravar_instantaneo_leads(df_final: pd.DataFrame, caminho_mestre: str, motor: str) -> None:
+    """Grava os leads finais do período (base do modo delta no mês seguinte), no mesmo formato do CSV Mestre."""
+    caminho = _caminho_instantaneo_leads(os.path.dirname(os.path.abspath(caminho_mestre)), motor)
+    _formato_texto(df_final).to_csv(caminho + '.tmp', sep=';', index=False, decimal=',', na_rep='', encoding='utf-8', lineterminator='\n')
+    os.replace(caminho + '.tmp', caminho)
+
+def carregar_leads_em_delta(caminho_mestre: str, motor: str = MOTOR_LEADS) -> Optional[pd.DataFrame]:
+    """
+    Leads do período sem reagregar o mestre inteiro: parte do instantâneo do período anterior, descarta os CNPJs
+    afetados pelo delta (inseridos/atualizados/removidos) e lê e agrega do mestre só esses CNPJs.
+    Retorna None (o chamador faz a carga completa) se faltar o delta ou o instantâneo anterior.
+    """
+    from delta_cnpj import carregar_delta, cnpjs_afetados
     
-    # 5. GERAR HTML
-    html_gerado = gerar_conteudo_html(df_final, SEPARADOR_AGREGACAO)
+    delta = carregar_delta(os.path.dirname(os.path.abspath(caminho_mestre)))
+    if delta is None:
+        print("AVISO: Delta do período não encontrado (execute delta_cnpj.py). Os leads serão recalculados por completo.")
+        return None
+    caminho_instantaneo = _caminho_instantaneo_leads(os.path.join(DIRETORIO_BASE, delta['periodo_anterior']), motor)
+    if not os.path.exists(caminho_instantaneo):
+        print(f"AVISO: Leads do período {delta['periodo_anterior']} não encontrados ({caminho_instantaneo}). Os leads serão recalculados por completo.")
+        return None
     
-    # 6. INJETAR NO TEMPLATE
-    injetar_html_no_template(html_gerado, arquivo_html)
-
-    return True
+    afetados = cnpjs_afetados(delta)
+    print(f"Modo delta ({delta['periodo_anterior']} -> atual): {len(afetados)} CNPJs afetados serão reagregados.")
+    colunas = COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR
+    # Um só conjunto de dicionários nas duas cargas: o concat mantém as colunas categóricas
+    dicionarios = _novos_dicionarios()
+    try:
+        anteriores = _carregar_mestre_em_blocos(caminho_instantaneo, colunas, DTYPE_LEADS, [], compactar=True, dicionarios=dicionarios)
+    except Exception as e:
+        print(f"AVISO: Falha ao ler os leads do período anterior ({e}). Os leads serão recalculados por completo.")
+        return None
+    mantidos = anteriores[~anteriores['cnpj_basico'].isin(afetados).to_numpy()].copy()
+    
+    reagregados = carregar_leads_filtrados(caminho_mestre, motor, cnpjs=afetados, dicionarios=dicionarios) if len(afetados) else mantidos.iloc[:0].copy()
+    if reagregados is None:
+        return None
+    df_final = _juntar_blocos_compactos([mantidos, reagregados], dicionarios)
+    print(f"Leads mantidos do período anterior: {len(mantidos)} | Reagregados: {len(reagregados)} | Total: {len(df_final)}")
+    return df_final
 
+def gravar_novas_aberturas(df_final: pd.DataFrame, caminho_mestre: str, caminho_saida: str = NOME_ARQUIVO_NOVAS_ABERTURAS) -> Optional[int]:
+    """Lista de leads dos CNPJs abertos desde o período anterior (conjunto 'novas_aberturas' do delta)."""
+    from delta_cnpj import carregar_delta
+    
+    delta = carregar_delta(os.path.dirname(os.path.abspath(caminho_mestre)))
+    if delta is None:
+        return None
+    novas = df_final[df_final['cnpj_basico'].isin(delta['novas_aberturas']).to_numpy()]
+    _formato_texto(novas).to_csv(caminho_saida, sep=';', index=False, decimal=',', na_rep='', encoding='utf-8')
+    print(f"✅ Novas aberturas desde {delta['periodo_anterior']}: {len(novas)} leads gravados em {caminho_saida}")
+    return len(novas)
 
-# ==============================================================================
-# 2. FUNÇÃO: GERAÇÃO DE CONTEÚDO HTML (Cria a estrutura legível)
-# ==============================================================================
+def _atualizar_indices_leads(df_leads: pd.DataFrame, caminho_mestre: str, filtro: Optional[dict] = None) -> None:
+    """4.1. Índices em disco sobre os leads do período inteiro (nunca sobre o recorte da campanha); falha aqui não impede o HTML."""
+    if not GERAR_INDICES_LEADS:
+        return
+    from indices_leads import construir_indices_leads
+    if not construir_indices_leads(df_leads, caminho_mestre, filtro):
+        print("AVISO: Os índices de leads não foram atualizados; a busca usará os índices anteriores (se existirem).")
 
-def gerar_conteudo_html(df_final: pd.DataFrame, separador: str) -> str:
+def aplicar_inteligencia_e_filtrar_leads(caminho_mestre: str, arquivo_html: str, motor: str = MOTOR_LEADS,
+                                         arquivo_saida: str = NOME_ARQUIVO_SAIDA_HTML, modo_saida: str = MODO_SAIDA_LEADS,
+                                         filtro: Optional[dict] = None, delta: bool = False) -> bool:
     """
-    Transforma cada linha do DataFrame em um bloco HTML formatado (Card de Lead).
+    Lê o CSV Mestre (com otimização de memória), aplica agregação total, filtra e gera o HTML.
+    `arquivo_html` é o template; a página final vai para `arquivo_saida` (ou o site para DIRETORIO_SITE, com modo_saida='site').
+    Com motor='juncao', `caminho_mestre` é o arquivo já denormalizado pelo joiner_cnpj (sem groupby).
+    Com `delta=True`, só os CNPJs alterados desde o período anterior são reagregados (ver carregar_leads_em_delta);
+    o filtro da campanha é aplicado depois, sobre os leads completos do período. A renderização não é incremental:
+    as páginas são geradas de novo para todos os leads selecionados.
     """
-    html_blocos: List[str] = []
+    print("=" * 80)
+    if motor == 'juncao':
+        print("FASE 7: INICIANDO PROCESSAMENTO DE LEADS (JUNÇÃO RELACIONAL POR ESTABELECIMENTO)")
+    else:
+        print("FASE 7: INICIANDO PROCESSAMENTO DE LEADS (AGREGAÇÃO DE DADOS COMPLETOS)")
+    print(f"Lendo dados de: {caminho_mestre}")
+    print("=" * 80)
+
+    # 1-4. LEITURA, AGREGAÇÃO, FILTROS E ESTRUTURA FINAL
+    if delta:
+        df_final = carregar_leads_em_delta(caminho_mestre, motor)
+        if df_final is None:
+            df_final = carregar_leads_filtrados(caminho_mestre, motor)
+        if df_final is None:
+            return False
+        # Instantâneo do período (base do próximo delta), lista de novas aberturas e índices, antes do filtro da campanha
+        gravar_instantaneo_leads(df_final, caminho_mestre, motor)
+        gravar_novas_aberturas(df_final, caminho_mestre)
+        _atualizar_indices_leads(df_final, caminho_mestre)
+        if filtro:
+            df_final = df_final[_mascara_filtro(filtro, df_final)]
+            print(f"- Filtro da campanha ({', '.join(filtro)}): {len(df_final)}")
+    else:
+        df_final = carregar_leads_filtrados(caminho_mestre, motor, filtro)
+        if df_final is None:
+            return False
+        # O filtro foi aplicado já na leitura: não há os leads completos do período para indexar
+        _atualizar_indices_leads(df_final, caminho_mestre, filtro)
     
-    for _, row in tqdm(df_final.iterrows(), total=len(df_final), desc="Gerando HTML dos Leads"):
-        
-        # --- Formatação de Dados para Legibilidade ---
-        cnpj_completo = f"{row['cnpj_basico']}{row['cnpj_ordem']}{row['cnpj_dv']}"
-        cnpj_formatado = f"{cnpj_completo[:8]}.{cnpj_completo[8:12]}-{cnpj_completo[12:]}"
-        
-        # O Pandas, usando float64, pode representar o capital social como um número.
-        capital_float = float(row['capital_social']) if pd.notna(row['capital_social']) else 0.0
-        # Formato monetário com milhares: R$ 1.234.567,89
-        capital_social = f"R$ {capital_float:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
-        
-        # --- Processamento das Colunas Agregadas (SÓCIOS) ---
-        lista_socios = row['nome_socio'].split(separador) if pd.notna(row['nome_socio']) and isinstance(row['nome_socio'], str) else ['Nenhum Sócio Encontrado']
-        socios_html = "".join([f"<li>{nome_socio.strip()}</li>" for nome_socio in lista_socios])
+    # 5/6. GERAR O HTML E GRAVAR EM STREAMING (template -> arquivo de saída, lote a lote)
+    if modo_saida == 'site':
+        return gerar_site_paginado(df_final, SEPARADOR_AGREGACAO, arquivo_html, DIRETORIO_SITE, LEADS_POR_PAGINA, AGRUPAR_PAGINAS_POR)
+    return escrever_html_em_streaming(df_final, SEPARADOR_AGREGACAO, arquivo_html, arquivo_saida)
 
-        # Processamento dos CNAES Secundários
-        cnaes_secundarios = row['cnae_fiscal_secundario'].split(separador) if pd.notna(row['cnae_fiscal_secundario']) and isinstance(row['cnae_fiscal_secundario'], str) else ['Nenhum']
-        cnaes_sec_html = ", ".join([cnae.strip() for cnae in cnaes_secundarios])
-        
-        # --- Monta o Bloco HTML ---
-        card_html = f"""
+
+# ==============================================================================
+# 2. FUNÇÃO: GERAÇÃO DE CONTEÚDO HTML (Cria a estrutura legível)
+# ==============================================================================
+
+# Card de um lead: os campos já chegam formatados e escapados; o template é pré-compilado em fragmentos
+TEMPLATE_CARD_LEAD = """
         <div class="lead-card">
-            <h3 class="razao-social">**{row['razao_social'] or 'N/A'}** ({row['nome_fantasia'] or 'N/A'})</h3>
-            <p class="cnpj-info">CNPJ: {cnpj_formatado} | Porte: {row['porte_empresa'] or 'N/A'}</p>
+            <h3 class="razao-social">**{razao_social}** ({nome_fantasia})</h3>
+            <p class="cnpj-info">CNPJ: {cnpj_formatado} | Porte: {porte_empresa}</p>
             
             <div class="secao-societaria">
                 <h4>Estrutura Societária Completa (Agregada):</h4>
@@ -211,25 +680,96 @@ def gerar_conteudo_html(df_final: pd.DataFrame, separador: str) -> str:
             
             <div class="detalhes-financeiros">
                 <p><strong>Capital Social:</strong> {capital_social}</p>
-                <p><strong>Status Legal:</strong> ATIVA desde {row['data_inicio_atividade'] or 'N/A'}</p>
+                <p><strong>Status Legal:</strong> ATIVA desde {data_inicio_atividade}</p>
             </div>
             
             <div class="contato-e-localizacao">
-                <p>📍 {row['logradouro'] or 'S/N'}, {row['numero'] or 'N/A'} - {row['bairro'] or 'N/A'}, {row['nome_municipio'] or 'N/A'}/{row['uf'] or 'N/A'}</p>
-                <p>📞 ({row['ddd_1'] or '00'}) {row['telefone_1'] or 'N/A'} | 📧 {row['correio_eletronico'] or 'N/A'}</p>
+                <p>📍 {logradouro}, {numero} - {bairro}, {nome_municipio}/{uf}</p>
+                <p>📞 ({ddd_1}) {telefone_1} | 📧 {correio_eletronico}</p>
             </div>
             
             <div class="cnaes">
-                <p><strong>CNAE Principal:</strong> {row['cnae_fiscal_principal'] or 'N/A'}</p>
+                <p><strong>CNAE Principal:</strong> {cnae_fiscal_principal}</p>
                 <p><strong>CNAEs Secundários:</strong> {cnaes_sec_html}</p>
             </div>
             
             <hr>
         </div>
         """
-        html_blocos.append(card_html)
-        
-    return "\n".join(html_blocos)
+FRAGMENTOS_CARD_LEAD = list(string.Formatter().parse(TEMPLATE_CARD_LEAD))
+CAMPOS_CARD_LEAD = [campo for _, campo, _, _ in FRAGMENTOS_CARD_LEAD if campo is not None]
+MOLDE_CARD_LEAD = ''.join(literal.replace('%', '%%') + ('%s' if campo is not None else '') for literal, campo, _, _ in FRAGMENTOS_CARD_LEAD)
+
+# Valor exibido quando o campo está vazio/nulo
+PADROES_CAMPOS_CARD = {
+    'razao_social': 'N/A', 'nome_fantasia': 'N/A', 'porte_empresa': 'N/A', 'data_inicio_atividade': 'N/A',
+    'logradouro': 'S/N', 'numero': 'N/A', 'bairro': 'N/A', 'nome_municipio': 'N/A', 'uf': 'N/A',
+    'ddd_1': '00', 'telefone_1': 'N/A', 'correio_eletronico': 'N/A', 'cnae_fiscal_principal': 'N/A',
+}
+LINHAS_POR_LOTE_HTML = 100_000
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """Coluna como texto (object), com nulos e vazios como None."""
+    texto = serie.astype(object).where(serie.notna(), None)
+    return texto.where(texto != '', None)
+
+def _escapar_html(serie: pd.Series) -> pd.Series:
+    """html.escape da coluna, calculado uma vez por valor distinto (nulos continuam nulos)."""
+    codigos, distintos = pd.factorize(serie)
+    escapados = np.array([html.escape(valor) for valor in distintos] + [None], dtype=object)
+    return pd.Series(escapados[codigos], index=serie.index) # código -1 (nulo) cai no None final
+
+def _formatar_moeda_brl(serie: pd.Series) -> pd.Series:
+    """R$ 1.234.567,89 (nulo vira R$ 0,00)."""
+    valores = pd.to_numeric(serie, errors='coerce').fillna(0.0).astype(np.float64)
+    return 'R$ ' + valores.map('{:,.2f}'.format).str.translate(str.maketrans(',.', '.,'))
+
+def _formatar_cnpj(lote: pd.DataFrame) -> pd.Series:
+    """CNPJ com a mesma máscara do card original (12345678.0001-90)."""
+    cnpj_completo = _texto(lote['cnpj_basico']).fillna('') + _texto(lote['cnpj_ordem']).fillna('') + _texto(lote['cnpj_dv']).fillna('')
+    return cnpj_completo.str[:8] + '.' + cnpj_completo.str[8:12] + '-' + cnpj_completo.str[12:]
+
+MARCADOR_SEPARADOR = '\x00' # Marca as ocorrências exatas do separador antes de absorver os espaços em volta
+
+def _juntar_agregados(serie: pd.Series, separador: str, juncao: str) -> pd.Series:
+    """
+    Troca o `separador` exato de agregação por `juncao` e tira os espaços das pontas de cada valor
+    (o mesmo que split(separador) + strip de cada item): um '|' solto dentro de um nome não separa valores.
+    """
+    marcada = serie.str.replace(separador, MARCADOR_SEPARADOR, regex=False)
+    marcada = marcada.str.replace(r'\s*' + MARCADOR_SEPARADOR + r'\s*', MARCADOR_SEPARADOR, regex=True).str.strip()
+    return marcada.str.replace(MARCADOR_SEPARADOR, juncao, regex=False)
+
+def _formatar_campos_card(lote: pd.DataFrame, separador: str) -> dict:
+    """Formata, com operações de coluna, todos os campos do TEMPLATE_CARD_LEAD para um lote de leads."""
+    lote = _formato_texto(lote)
+    campos = {coluna: _escapar_html(_texto(lote[coluna])).fillna(padrao) for coluna, padrao in PADROES_CAMPOS_CARD.items()}
+    
+    campos['cnpj_formatado'] = _formatar_cnpj(lote)
+    campos['capital_social'] = _formatar_moeda_brl(lote['capital_social'])
+    
+    # Listas agregadas: cada valor sem espaços nas pontas, sócios em <li> e CNAEs separados por vírgula
+    socios = _escapar_html(_juntar_agregados(_texto(lote['nome_socio']), separador, MARCADOR_SEPARADOR))
+    campos['socios_html'] = ('<li>' + socios.str.replace(MARCADOR_SEPARADOR, '</li><li>', regex=False) + '</li>').fillna('<li>Nenhum Sócio Encontrado</li>')
+    cnaes = _escapar_html(_juntar_agregados(_texto(lote['cnae_fiscal_secundario']), separador, ', '))
+    campos['cnaes_sec_html'] = cnaes.fillna('Nenhum')
+    return campos
+
+def _renderizar_cards_em_lotes(df_final: pd.DataFrame, separador: str, linhas_por_lote: Optional[int] = None) -> Iterator[List[str]]:
+    """Gera os cards HTML em lotes: as colunas formatadas do lote preenchem o molde pré-compilado do card."""
+    linhas_por_lote = linhas_por_lote or LINHAS_POR_LOTE_HTML
+    for inicio in tqdm(range(0, len(df_final), linhas_por_lote), desc="Gerando HTML dos Leads", unit=" lote"):
+        lote = df_final.iloc[inicio:inicio + linhas_por_lote]
+        campos = _formatar_campos_card(lote, separador)
+        yield [MOLDE_CARD_LEAD % valores for valores in zip(*(campos[campo].tolist() for campo in CAMPOS_CARD_LEAD))]
+
+def gerar_conteudo_html(df_final: pd.DataFrame, separador: str) -> str:
+    """
+    Transforma cada linha do DataFrame em um bloco HTML formatado (Card de Lead).
+    Renderização vetorizada (sem iterrows): formatação coluna a coluna e cards montados em lotes.
+    Textos vindos dos dados são escapados (html.escape) antes de entrar no HTML.
+    """
+    return "\n".join("\n".join(cards) for cards in _renderizar_cards_em_lotes(df_final, separador) if cards)
 
 # ==============================================================================
 # 3. FUNÇÃO: INJEÇÃO NO TEMPLATE HTML
@@ -239,7 +779,7 @@ def injetar_html_no_template(html_conteudo: str, caminho_template: str) -> bool:
     """
     Injeta o conteúdo HTML gerado no arquivo HTML de destino, usando um placeholder.
     """
-    PLACEHOLDER_TAG = "<!-- LEADS_CONTENT_HERE -->" # Certificar que o placeholder está correto
+    PLACEHOLDER_TAG = PLACEHOLDER_LEADS
     
     try:
         with open(caminho_template, 'r', encoding='utf-8') as f:
@@ -265,26 +805,322 @@ def injetar_html_no_template(html_conteudo: str, caminho_template: str) -> bool:
         return False
 
 
+def escrever_html_em_streaming(df_final: pd.DataFrame, separador: str, caminho_template: str, caminho_saida: str) -> bool:
+    """
+    Grava a página sem montar o HTML inteiro em memória: o template é dividido no placeholder, o início é
+    escrito, os cards seguem lote a lote conforme são renderizados e o final fecha o arquivo de saída.
+    O template não é modificado (pode ser reutilizado na próxima execução).
+    """
+    try:
+        with open(caminho_template, 'r', encoding='utf-8') as f:
+            template_html = f.read()
+    except FileNotFoundError:
+        print(f"🛑 ERRO: O arquivo template {caminho_template} não foi encontrado.")
+        return False
+    
+    if PLACEHOLDER_LEADS not in template_html:
+        print(f"AVISO: O placeholder '{PLACEHOLDER_LEADS}' não foi encontrado no {caminho_template}. O conteúdo não será injetado.")
+        return False
+    inicio_html, fim_html = template_html.split(PLACEHOLDER_LEADS, 1)
+    
+    caminho_temp = caminho_saida + '.tmp'
+    try:
+        with open(caminho_temp, 'w', encoding='utf-8') as saida:
+            saida.write(inicio_html)
+            primeiro_lote = True
+            for cards in _renderizar_cards_em_lotes(df_final, separador):
+                if not primeiro_lote:
+                    saida.write("\n")
+                saida.write("\n".join(cards))
+                primeiro_lote = False
+            saida.write(fim_html)
+        os.replace(caminho_temp, caminho_saida)
+    except Exception as e:
+        print(f"🛑 ERRO ao gravar o HTML de saída: {e}")
+        if os.path.exists(caminho_temp):
+            os.remove(caminho_temp)
+        return False
+    
+    print(f"✅ CONTEÚDO GRAVADO! {len(df_final)} leads em {caminho_saida} (template {caminho_template} preservado).")
+    return True
+
+# ==============================================================================
+# 4. SITE PAGINADO (PÁGINAS JSON + MANIFESTO + ÍNDICE DE BUSCA)
+# ==============================================================================
+
+# Colunas de cada lead nas páginas JSON (os valores já vão formatados para exibição)
+CAMPOS_PAGINA_SITE = [
+    'razao_social', 'nome_fantasia', 'cnpj', 'porte_empresa', 'socios', 'capital_social', 'data_inicio_atividade',
+    'logradouro', 'numero', 'bairro', 'nome_municipio', 'uf', 'ddd_1', 'telefone_1', 'correio_eletronico',
+    'cnae_fiscal_principal', 'cnaes_secundarios',
+]
+TAMANHO_MAXIMO_CHAVE_BUSCA = 60
+# Índice de busca fatiado pelos primeiros caracteres da chave (busca/<prefixo>.json); o site exige consultas com
+# pelo menos esse tamanho, então cada tecla carrega no máximo uma fatia pequena
+TAMANHO_PREFIXO_BUSCA = 3
+# Entradas mantidas por chave idêntica (ex.: 'comercio ltda'): o site mostra no máximo 50 resultados (MAX_RESULTADOS_BUSCA)
+MAX_ENTRADAS_POR_CHAVE_BUSCA = 50
+# Entradas acumuladas em memória antes de descarregar as fatias parciais em disco
+LIMITE_ENTRADAS_BUSCA_EM_MEMORIA = 500_000
+
+def _formatar_campos_site(lote: pd.DataFrame, separador: str) -> dict:
+    """Mesma formatação do card, sem HTML: o dashboard monta o DOM com textContent."""
+    lote = _formato_texto(lote)
+    campos = {coluna: _texto(lote[coluna]).fillna(padrao) for coluna, padrao in PADROES_CAMPOS_CARD.items()}
+    campos['cnpj'] = _formatar_cnpj(lote)
+    campos['capital_social'] = _formatar_moeda_brl(lote['capital_social'])
+    
+    socios = _juntar_agregados(_texto(lote['nome_socio']), separador, MARCADOR_SEPARADOR).str.split(MARCADOR_SEPARADOR, regex=False)
+    campos['socios'] = socios.map(lambda valor: valor if isinstance(valor, list) else ['Nenhum Sócio Encontrado'])
+    campos['cnaes_secundarios'] = _juntar_agregados(_texto(lote['cnae_fiscal_secundario']), separador, ', ').fillna('Nenhum')
+    return campos
+
+def _chaves_de_grupo(df_final: pd.DataFrame, agrupar_por: Optional[str]) -> pd.Series:
+    """Grupo de cada lead para a paginação ('' quando não há agrupamento)."""
+    if agrupar_por == 'uf':
+        return _texto(df_final['uf']).fillna('SEM UF')
+    if agrupar_por == 'municipio':
+        return _texto(df_final['uf']).fillna('SEM UF') + ' / ' + _texto(df_final['nome_municipio']).fillna('SEM MUNICÍPIO')
+    if agrupar_por:
+        raise ValueError(f"Agrupamento de páginas desconhecido: '{agrupar_por}'. Opções: uf, municipio.")
+    return pd.Series('', index=df_final.index, dtype=object)
+
+def _normalizar_busca(texto: str) -> str:
+    """Sem acentos e em minúsculas (a mesma normalização é feita no site_leads.js)."""
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c)).lower().strip()
+
+def _fatia_da_chave(chave: str) -> str:
+    """Nome da fatia do índice de busca: os TAMANHO_PREFIXO_BUSCA primeiros caracteres (fora de [a-z0-9] vira '_')."""
+    return re.sub(r'[^a-z0-9]', '_', chave[:TAMANHO_PREFIXO_BUSCA])
+
+def _indexar_lead_para_busca(fatias: dict, lead: dict, id_pagina: int, posicao: int) -> int:
+    """
+    Entradas [chave, rótulo, página, posição] do índice de busca: uma por palavra dos nomes (a chave começa na
+    palavra, para busca por prefixo) e uma pelo CNPJ só com dígitos. As entradas são fatiadas pelo prefixo da chave
+    (chaves mais curtas que o prefixo nunca casam com uma consulta e são descartadas). Retorna quantas foram criadas.
+    """
+    rotulo = f"{lead['razao_social']} ({lead['cnpj']})"
+    chaves = {re.sub(r'\D', '', lead['cnpj'])}
+    for coluna in ('razao_social', 'nome_fantasia'):
+        if lead[coluna] == PADROES_CAMPOS_CARD[coluna]:
+            continue
+        nome = _normalizar_busca(lead[coluna])
+        for palavra in re.finditer(r'[a-z0-9]+', nome):
+            if len(palavra.group()) >= 2:
+                chaves.add(nome[palavra.start():palavra.start() + TAMANHO_MAXIMO_CHAVE_BUSCA])
+    adicionadas = 0
+    for chave in chaves:
+        if len(chave) >= TAMANHO_PREFIXO_BUSCA:
+            fatias[_fatia_da_chave(chave)].append([chave, rotulo, id_pagina, posicao])
+            adicionadas += 1
+    return adicionadas
+
+def _descarregar_fatias_busca(fatias: dict, diretorio_parcial: str) -> None:
+    """Anexa as entradas em memória às fatias parciais (uma entrada JSON por linha) e esvazia o acumulador."""
+    for fatia, entradas in fatias.items():
+        with open(os.path.join(diretorio_parcial, f"{fatia}.jsonl"), 'a', encoding='utf-8') as f:
+            for entrada in entradas:
+                f.write(json.dumps(entrada, ensure_ascii=False, separators=(',', ':')) + '\n')
+    fatias.clear()
+
+def _gravar_fatias_busca(diretorio_parcial: str, diretorio_busca: str) -> int:
+    """
+    Ordena cada fatia parcial pela chave, limita a MAX_ENTRADAS_POR_CHAVE_BUSCA as entradas de cada chave idêntica e
+    grava busca/<prefixo>.json. Só uma fatia fica em memória por vez. Retorna o número de fatias gravadas.
+    """
+    total_fatias = 0
+    for nome_arquivo in sorted(os.listdir(diretorio_parcial)):
+        with open(os.path.join(diretorio_parcial, nome_arquivo), 'r', encoding='utf-8') as f:
+            entradas = [json.loads(linha) for linha in f]
+        entradas.sort(key=lambda entrada: entrada[0])
+        
+        mantidas = []
+        chave_anterior, repeticoes = None, 0
+        for entrada in entradas:
+            repeticoes = repeticoes + 1 if entrada[0] == chave_anterior else 1
+            chave_anterior = entrada[0]
+            if repeticoes <= MAX_ENTRADAS_POR_CHAVE_BUSCA:
+                mantidas.append(entrada)
+        
+        _gravar_json(os.path.join(diretorio_busca, nome_arquivo[:-len('.jsonl')] + '.json'), mantidas)
+        os.remove(os.path.join(diretorio_parcial, nome_arquivo))
+        total_fatias += 1
+    return total_fatias
+
+def _gravar_json(caminho: str, dados) -> None:
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+
+def gerar_site_paginado(df_final: pd.DataFrame, separador: str, caminho_template: str, diretorio_site: str,
+                        leads_por_pagina: int, agrupar_por: Optional[str]) -> bool:
+    """
+    Gera o dashboard como site estático paginado em `diretorio_site`:
+    - paginas/NNNNNN.json: `leads_por_pagina` leads por arquivo (agrupados por UF/município, se pedido);
+    - manifesto.json: campos, lista de páginas e grupos (o navegador carrega só isto na abertura);
+    - busca/<prefixo>.json: índice de busca por razão social, nome fantasia e CNPJ, fatiado pelos primeiros
+      TAMANHO_PREFIXO_BUSCA caracteres da chave (gravado em fatias parciais durante a geração, sem acumular em RAM);
+    - index.html: o template com o site_leads.js no lugar do placeholder (mesmo estilo do dashboard).
+    """
+    try:
+        with open(caminho_template, 'r', encoding='utf-8') as f:
+            template_html = f.read()
+    except FileNotFoundError:
+        print(f"🛑 ERRO: O arquivo template {caminho_template} não foi encontrado.")
+        return False
+    if PLACEHOLDER_LEADS not in template_html:
+        print(f"AVISO: O placeholder '{PLACEHOLDER_LEADS}' não foi encontrado no {caminho_template}. O site não será gerado.")
+        return False
+    
+    diretorio_temp = diretorio_site.rstrip('/\\') + '.tmp'
+    try:
+        chaves_grupo = _chaves_de_grupo(df_final, agrupar_por)
+        ordem = np.argsort(chaves_grupo.to_numpy(dtype=object), kind='stable') if agrupar_por else np.arange(len(df_final))
+        df_ordenado = df_final.iloc[ordem]
+        chaves_grupo = chaves_grupo.iloc[ordem].tolist()
+        
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        os.makedirs(os.path.join(diretorio_temp, 'paginas'))
+        os.makedirs(os.path.join(diretorio_temp, 'busca'))
+        diretorio_busca_parcial = os.path.join(diretorio_temp, 'busca_parcial')
+        os.makedirs(diretorio_busca_parcial)
+        
+        paginas: List[dict] = []
+        grupos: List[dict] = []
+        fatias_busca = defaultdict(list)
+        entradas_em_memoria = 0
+        leads_pagina: List[list] = []
+        grupo_atual = None
+        
+        def fechar_pagina():
+            arquivo = f"paginas/{len(paginas):06d}.json"
+            _gravar_json(os.path.join(diretorio_temp, arquivo), {'leads': leads_pagina})
+            paginas.append({'arquivo': arquivo, 'grupo': grupo_atual, 'leads': len(leads_pagina)})
+            grupos[-1]['total_paginas'] += 1
+            grupos[-1]['total_leads'] += len(leads_pagina)
+        
+        indice_lead = 0
+        for inicio in tqdm(range(0, len(df_ordenado), LINHAS_POR_LOTE_HTML), desc="Gerando páginas do site", unit=" lote"):
+            lote = df_ordenado.iloc[inicio:inicio + LINHAS_POR_LOTE_HTML]
+            campos = _formatar_campos_site(lote, separador)
+            for valores in zip(*(campos[campo].tolist() for campo in CAMPOS_PAGINA_SITE)):
+                chave = chaves_grupo[indice_lead]
+                indice_lead += 1
+                if chave != grupo_atual:
+                    if leads_pagina:
+                        fechar_pagina()
+                        leads_pagina = []
+                    grupo_atual = chave
+                    grupos.append({'chave': chave, 'primeira_pagina': len(paginas), 'total_paginas': 0, 'total_leads': 0})
+                elif len(leads_pagina) >= leads_por_pagina:
+                    fechar_pagina()
+                    leads_pagina = []
+                
+                entradas_em_memoria += _indexar_lead_para_busca(fatias_busca, dict(zip(CAMPOS_PAGINA_SITE, valores)), len(paginas), len(leads_pagina))
+                leads_pagina.append(list(valores))
+                if entradas_em_memoria >= LIMITE_ENTRADAS_BUSCA_EM_MEMORIA:
+                    _descarregar_fatias_busca(fatias_busca, diretorio_busca_parcial)
+                    entradas_em_memoria = 0
+        if leads_pagina:
+            fechar_pagina()
+        
+        _descarregar_fatias_busca(fatias_busca, diretorio_busca_parcial)
+        total_fatias_busca = _gravar_fatias_busca(diretorio_busca_parcial, os.path.join(diretorio_temp, 'busca'))
+        os.rmdir(diretorio_busca_parcial)
+        
+        _gravar_json(os.path.join(diretorio_temp, 'manifesto.json'), {
+            'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'total_leads': len(df_final),
+            'leads_por_pagina': leads_por_pagina,
+            'agrupamento': agrupar_por,
+            'campos': CAMPOS_PAGINA_SITE,
+            'paginas': paginas,
+            'grupos': grupos,
+            # Fatia de uma consulta: busca/<primeiros caracteres>.json (fatia ausente = nenhum resultado)
+            'busca': {'diretorio': 'busca', 'tamanho_prefixo': TAMANHO_PREFIXO_BUSCA, 'total_fatias': total_fatias_busca},
+        })
+        
+        with open(os.path.join(diretorio_temp, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(template_html.replace(PLACEHOLDER_LEADS, f'<script src="{ARQUIVO_SCRIPT_SITE}"></script>', 1))
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), ARQUIVO_SCRIPT_SITE), diretorio_temp)
+        
+        shutil.rmtree(diretorio_site, ignore_errors=True)
+        os.replace(diretorio_temp, diretorio_site)
+    except Exception as e:
+        print(f"🛑 ERRO ao gerar o site paginado: {e}")
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        return False
+    
+    print(f"✅ SITE GERADO! {len(df_final)} leads em {len(paginas)} páginas ({len(grupos)} grupo(s)) em {diretorio_site}.")
+    print(f"Para abrir: python -m http.server --directory {diretorio_site} (e acesse http://localhost:8000)")
+    return True
+
 # ==============================================================================
 # WRAPPER PRINCIPAL
 # ==============================================================================
 
-def executar_processamento_leads(nome_arquivo_html: str = 'index.html') -> bool:
-    """Orquestra as fases de leitura, filtragem e geração de HTML."""
+def preparar_fonte_leads() -> Optional[str]:
+    """Localiza o mestre mais recente e, com MOTOR_LEADS='juncao', gera o arquivo denormalizado. Retorna o caminho a ler."""
     caminho_mestre = _encontrar_caminho_mestre()
     
     if not caminho_mestre:
         print("FALHA: Não foi possível localizar o CSV Mestre Final. Verifique a pasta 'Dados_CNPJ' e re-execute o pipeline de ETL.")
+        return None
+    
+    if MOTOR_LEADS == 'juncao':
+        from joiner_cnpj import executar_juncao
+        caminho_mestre = executar_juncao(caminho_mestre)
+        if not caminho_mestre:
+            print("FALHA: A junção relacional não gerou o arquivo de leads denormalizado.")
+            return None
+    
+    return caminho_mestre
+
+def preparar_filtro_leads(origem: Optional[str]) -> Optional[dict]:
+    """Lê/valida o filtro da campanha (arquivo JSON/YAML ou expressão). Retorna {} sem filtro e None se for inválido."""
+    if not origem:
+        return {}
+    try:
+        filtro = carregar_filtro(origem, COLUNAS_MANTER_PRIMEIRO + COLUNAS_AGREGAR)
+    except (ValueError, OSError) as e:
+        print(f"🛑 ERRO: Filtro de leads inválido. {e}")
+        return None
+    print(f"Filtro da campanha: {json.dumps(filtro, ensure_ascii=False)}")
+    return filtro
+
+def executar_processamento_leads(nome_arquivo_html: str = 'index.html', nome_arquivo_saida: str = NOME_ARQUIVO_SAIDA_HTML,
+                                 filtro: Optional[str] = FILTRO_LEADS, delta: bool = MODO_DELTA_LEADS) -> bool:
+    """
+    Orquestra as fases de leitura, filtragem e geração de HTML (template `nome_arquivo_html` -> `nome_arquivo_saida`).
+    `filtro` é o arquivo JSON/YAML ou a expressão do filtro da campanha (None = só CNPJ Ativo).
+    `delta` ativa o modo delta: lê o Delta/ do período (gerado pelo run_pipeline ou por delta_cnpj.py) e reagrega
+    só os CNPJs afetados; sem ele, os leads são recalculados por completo.
+    """
+    especificacao = preparar_filtro_leads(filtro)
+    if especificacao is None:
+        return False
+    
+    caminho_mestre = preparar_fonte_leads()
+    if not caminho_mestre:
         return False
     
-    if aplicar_inteligencia_e_filtrar_leads(caminho_mestre, nome_arquivo_html):
+    if aplicar_inteligencia_e_filtrar_leads(caminho_mestre, nome_arquivo_html, MOTOR_LEADS, nome_arquivo_saida, MODO_SAIDA_LEADS, especificacao, delta):
         print("\n" + "=" * 100)
         print("FASE 7 (PROCESSAMENTO DE LEADS) CONCLUÍDA COM SUCESSO.")
-        print(f"Seu dashboard/site {nome_arquivo_html} foi gerado/atualizado. Abra o arquivo no navegador.")
+        if MODO_SAIDA_LEADS == 'site':
+            print(f"Seu dashboard paginado foi gerado em {DIRETORIO_SITE}/ a partir do template {nome_arquivo_html}.")
+        else:
+            print(f"Seu dashboard/site {nome_arquivo_saida} foi gerado a partir do template {nome_arquivo_html}. Abra o arquivo no navegador.")
         print("=" * 100)
         return True
     
     return False
 
 if __name__ == '__main__':
-    executar_processamento_leads()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Fase 7: processamento de leads.")
+    parser.add_argument('--filtro', default=FILTRO_LEADS,
+                        help='Arquivo JSON/YAML ou expressão, ex.: "uf in SP,RJ; capital_social >= 10000; correio_eletronico presente"')
+    parser.add_argument('--delta', action='store_true', default=MODO_DELTA_LEADS,
+                        help="Reagrega só os CNPJs alterados desde o período anterior (e gera a lista de novas aberturas).")
+    argumentos = parser.parse_args()
+    executar_processamento_leads(filtro=argumentos.filtro, delta=argumentos.delta)
\ No newline at end of file
@@ -0,0 +1,194 @@
+# rollups_cnpj.py - Cubo OLAP pré-calculado (UF, município, CNAE, porte, situação) em arquivos pequenos Parquet/JSON
+
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import processador_de_leads as leads
+from filtro_leads import compilar_filtro
+
+# --- Configurações dos Rollups ---
+DIRETORIO_ROLLUPS_NOME = 'Rollups'
+TABELAS_ROLLUPS = ['EMPRE', 'ESTABELE', 'MUNIC'] # No Parquet, as demais partições nem são lidas
+COLUNAS_LEITURA_ROLLUPS = [
+    'cnpj_basico', 'matriz_filial', 'situacao_cadastral', 'data_inicio_atividade', 'uf', 'codigo_municipio',
+    'nome_municipio', 'cnae_fiscal_principal', 'porte_empresa', 'capital_social', 'TABELA_ORIGEM',
+]
+DTYPE_ROLLUPS = {
+    'matriz_filial': 'category', 'situacao_cadastral': 'category', 'uf': 'category', 'codigo_municipio': 'category',
+    'cnae_fiscal_principal': 'category', 'porte_empresa': 'category', 'TABELA_ORIGEM': 'category',
+    'capital_social': np.float64,
+}
+SEM_INFORMACAO = 'NI' # Valor de dimensão ausente (ex.: empresa sem porte, estabelecimento sem CNAE)
+
+# Dimensões do cubo base; cada rollup publicado agrega o cubo por um subconjunto delas
+DIMENSOES_CUBO = ['uf', 'codigo_municipio', 'cnae_fiscal_principal', 'porte_empresa', 'situacao_cadastral']
+ROLLUPS_PUBLICADOS = {
+    'uf': ['uf'],
+    'municipio': ['uf', 'codigo_municipio'],
+    'cnae': ['cnae_fiscal_principal'],
+    'porte': ['porte_empresa'],
+    'situacao': ['situacao_cadastral'],
+    'uf_situacao': ['uf', 'situacao_cadastral'],
+}
+ROLLUPS_ABERTURAS = {
+    'aberturas_mes': ['ano_mes'],
+    'aberturas_mes_uf': ['uf', 'ano_mes'],
+}
+
+# ==============================================================================
+# 1. LEITURA (UMA PASSADA PELO MESTRE)
+# ==============================================================================
+
+def _carregar_fatos(caminho_mestre: str):
+    """
+    Lê EMPRE, ESTABELE e MUNIC numa única passada (só as colunas do cubo) e devolve
+    (estabelecimentos com porte/capital da empresa, nomes dos municípios).
+    cnpj_basico vira inteiro já em cada bloco, como no esquema compacto da fase 7 (nulo onde não há CNPJ).
+    """
+    estabelecimentos: List[pd.DataFrame] = []
+    empresas: List[pd.DataFrame] = []
+    municipios: List[pd.DataFrame] = []
+    predicado_tabelas = compilar_filtro({'TABELA_ORIGEM': {'em': TABELAS_ROLLUPS}})
+    for bloco in leads._iterar_blocos_filtrados(caminho_mestre, COLUNAS_LEITURA_ROLLUPS, DTYPE_ROLLUPS, [predicado_tabelas]):
+        tabela = bloco['TABELA_ORIGEM'].astype(object)
+        bloco['cnpj_basico'] = leads._inteiros(bloco['cnpj_basico'], 'UInt32')
+        empresas.append(bloco.loc[tabela == 'EMPRE', ['cnpj_basico', 'porte_empresa', 'capital_social']])
+        municipios.append(bloco.loc[tabela == 'MUNIC', ['codigo_municipio', 'nome_municipio']])
+        estab = bloco.loc[tabela == 'ESTABELE', ['cnpj_basico', 'matriz_filial'] + [d for d in DIMENSOES_CUBO if d != 'porte_empresa']].copy()
+        estab['ano_mes'] = leads._texto(bloco.loc[tabela == 'ESTABELE', 'data_inicio_atividade']).str.slice(0, 6).astype('category')
+        estabelecimentos.append(estab)
+
+    df_empresas = pd.concat(empresas, ignore_index=True).drop_duplicates('cnpj_basico') if empresas else pd.DataFrame(columns=['cnpj_basico', 'porte_empresa', 'capital_social'])
+    df_estab = pd.concat(estabelecimentos, ignore_index=True) if estabelecimentos else pd.DataFrame(columns=['cnpj_basico', 'matriz_filial', 'ano_mes'] + DIMENSOES_CUBO)
+    df_estab = df_estab.merge(df_empresas, on='cnpj_basico', how='left')
+    df_municipios = pd.concat(municipios, ignore_index=True).drop_duplicates('codigo_municipio') if municipios else pd.DataFrame(columns=['codigo_municipio', 'nome_municipio'])
+
+    for dimensao in DIMENSOES_CUBO + ['ano_mes']:
+        df_estab[dimensao] = leads._texto(df_estab[dimensao]).fillna(SEM_INFORMACAO).astype('category')
+    # Capital é da empresa (EMPRE): entra uma vez por empresa, pela matriz
+    df_estab['matriz'] = (leads._texto(df_estab['matriz_filial']) == '1').fillna(False).astype(bool)
+    df_estab['capital_matriz'] = pd.to_numeric(df_estab['capital_social'], errors='coerce').where(df_estab['matriz'])
+    return df_estab.drop(columns=['capital_social', 'matriz_filial']), df_municipios
+
+# ==============================================================================
+# 2. CUBO E ROLLUPS
+# ==============================================================================
+
+def montar_cubo(df_estab: pd.DataFrame) -> pd.DataFrame:
+    """Cubo base: uma linha por combinação observada das DIMENSOES_CUBO (métricas aditivas)."""
+    return (df_estab.groupby(DIMENSOES_CUBO, observed=True)
+            .agg(estabelecimentos=('cnpj_basico', 'size'), empresas=('matriz', 'sum'), capital_total=('capital_matriz', 'sum'))
+            .reset_index())
+
+def _rollup(df_estab: pd.DataFrame, cubo: pd.DataFrame, dimensoes: List[str]) -> pd.DataFrame:
+    """Contagens e soma vêm do cubo (aditivas); a mediana do capital precisa das linhas, por isso vem de df_estab."""
+    agregado = cubo.groupby(dimensoes, observed=True)[['estabelecimentos', 'empresas', 'capital_total']].sum()
+    agregado['capital_mediano'] = df_estab.groupby(dimensoes, observed=True)['capital_matriz'].median()
+    return agregado.reset_index()
+
+def _aberturas(df_estab: pd.DataFrame, dimensoes: List[str]) -> pd.DataFrame:
+    return df_estab.groupby(dimensoes, observed=True).size().rename('aberturas').reset_index()
+
+def _gravar_rollup(diretorio: str, nome: str, df: pd.DataFrame, parquet: bool) -> None:
+    df = df.astype({coluna: str for coluna in df.columns if isinstance(df[coluna].dtype, pd.CategoricalDtype)})
+    registros = df.replace({np.nan: None}).to_dict('records')
+    with open(os.path.join(diretorio, f"{nome}.json"), 'w', encoding='utf-8') as f:
+        json.dump(registros, f, ensure_ascii=False, separators=(',', ':'))
+    if parquet:
+        df.to_parquet(os.path.join(diretorio, f"{nome}.parquet"), index=False)
+
+def gerar_rollups(caminho_mestre: str) -> Optional[Dict[str, int]]:
+    """Grava cubo + rollups em Rollups/ (pasta do período). Retorna {nome: linhas} ou None em caso de erro."""
+    diretorio = os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), DIRETORIO_ROLLUPS_NOME)
+    diretorio_temp = diretorio + '.tmp'
+    try:
+        import pyarrow # noqa: F401 (Parquet é opcional; sem pyarrow só os JSON são gravados)
+        parquet = True
+    except ImportError:
+        parquet = False
+        print("AVISO: pyarrow não está instalado. Os rollups serão gravados só em JSON.")
+
+    try:
+        df_estab, df_municipios = _carregar_fatos(caminho_mestre)
+        cubo = montar_cubo(df_estab)
+        tabelas = {nome: _rollup(df_estab, cubo, dimensoes) for nome, dimensoes in ROLLUPS_PUBLICADOS.items()}
+        nomes_municipios = dict(zip(leads._texto(df_municipios['codigo_municipio']), df_municipios['nome_municipio']))
+        tabelas['municipio']['nome_municipio'] = leads._texto(tabelas['municipio']['codigo_municipio']).map(nomes_municipios)
+        tabelas.update({nome: _aberturas(df_estab, dimensoes) for nome, dimensoes in ROLLUPS_ABERTURAS.items()})
+
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        os.makedirs(diretorio_temp)
+        if parquet:
+            cubo.to_parquet(os.path.join(diretorio_temp, 'cubo.parquet'), index=False)
+        for nome, tabela in tabelas.items():
+            _gravar_rollup(diretorio_temp, nome, tabela, parquet)
+        with open(os.path.join(diretorio_temp, 'rollups.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'estabelecimentos': len(df_estab),
+                'dimensoes': DIMENSOES_CUBO,
+                'linhas_cubo': len(cubo),
+                'rollups': {nome: {'dimensoes': (ROLLUPS_PUBLICADOS | ROLLUPS_ABERTURAS)[nome], 'linhas': len(tabela)} for nome, tabela in tabelas.items()},
+            }, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(diretorio, ignore_errors=True)
+        os.replace(diretorio_temp, diretorio)
+    except Exception as e:
+        print(f"🛑 ERRO ao gerar os rollups: {e}")
+        shutil.rmtree(diretorio_temp, ignore_errors=True)
+        return None
+    return {nome: len(tabela) for nome, tabela in tabelas.items()}
+
+# ==============================================================================
+# WRAPPERS
+# ==============================================================================
+
+def executar_rollups() -> bool:
+    """Etapa de rollups: uma passada pelo mestre mais recente e o cubo gravado em Rollups/."""
+    caminho_mestre = leads._encontrar_caminho_mestre()
+    if not caminho_mestre:
+        print("FALHA: Não foi possível localizar o CSV Mestre Final para os rollups.")
+        return False
+
+    inicio = time.time()
+    print("=" * 80)
+    print(f"ROLLUPS OLAP: lendo {caminho_mestre}")
+    print("=" * 80)
+    linhas = gerar_rollups(caminho_mestre)
+    if linhas is None:
+        return False
+    print(f"✅ Rollups gerados em {time.time() - inicio:.2f}s: " + ', '.join(f"{nome} ({total})" for nome, total in linhas.items()))
+    return True
+
+def mostrar_rollup(nome: str, limite: int = 30) -> bool:
+    """Lê o JSON pré-calculado (sem tocar no mestre) e mostra as maiores linhas por estabelecimentos/aberturas."""
+    caminho_mestre = leads._encontrar_caminho_mestre()
+    caminho = os.path.join(os.path.dirname(os.path.abspath(caminho_mestre)), DIRETORIO_ROLLUPS_NOME, f"{nome}.json") if caminho_mestre else None
+    if not caminho or not os.path.exists(caminho):
+        print(f"FALHA: Rollup '{nome}' não encontrado. Execute: python rollups_cnpj.py --gerar")
+        return False
+    with open(caminho, 'r', encoding='utf-8') as f:
+        df = pd.DataFrame(json.load(f))
+    if 'ano_mes' in df.columns:
+        df = df.sort_values(list(df.columns[:-1])).tail(limite)
+    elif not df.empty:
+        df = df.sort_values('estabelecimentos', ascending=False).head(limite)
+    print(df.to_string(index=False))
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cubo OLAP de CNPJs por UF, município, CNAE, porte e situação.")
+    parser.add_argument('--gerar', action='store_true', help="Recalcula os rollups a partir do mestre.")
+    parser.add_argument('--mostrar', choices=list(ROLLUPS_PUBLICADOS) + list(ROLLUPS_ABERTURAS), help="Mostra um rollup já gerado.")
+    parser.add_argument('--limite', type=int, default=30)
+    argumentos = parser.parse_args()
+    if argumentos.gerar or not argumentos.mostrar:
+        executar_rollups()
+    if argumentos.mostrar:
+        mostrar_rollup(argumentos.mostrar, argumentos.limite)
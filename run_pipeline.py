@@ -21,6 +21,20 @@ try:
         print("\nAVISO: O script 'cleaner_cnpj.py' não foi encontrado. A fase 6 de Limpeza de ZIPs será ignorada.")
         def executar_limpeza_zip():
             return True # Retorna sucesso para não parar o pipeline
+    
+    # Rollups OLAP (rollups_cnpj.py): opcional, depende de pandas
+    try:
+        from rollups_cnpj import executar_rollups
+    except ImportError as e:
+        print(f"\nAVISO: Os rollups OLAP não estão disponíveis ({e}). A etapa de rollups será ignorada.")
+        executar_rollups = None
+    
+    # Delta entre períodos (delta_cnpj.py): opcional, depende de pandas/numpy
+    try:
+        from delta_cnpj import executar_delta
+    except ImportError as e:
+        print(f"\nAVISO: O delta entre períodos não está disponível ({e}). A etapa de delta será ignorada.")
+        executar_delta = None
             
 except ImportError as e:
     print("-" * 70)
@@ -30,6 +44,20 @@ except ImportError as e:
     print("-" * 70)
     sys.exit(1) # Sai do programa se houver erro de importação
 
+# ==============================================================================
+# CONFIGURAÇÕES DO PIPELINE
+# ==============================================================================
+
+# Modo sem extração: a consolidação lê as tabelas direto dos ZIPs e Temp_brutos não é gerado.
+MODO_SEM_EXTRACAO = False
+# No modo sem extração, a Fase 2/3 vira uma verificação de CRC (opcional) dos ZIPs.
+VERIFICAR_ZIPS_SEM_EXTRACAO = True
+# Após a consolidação, grava o cubo OLAP (contagens/capital por UF, município, CNAE, porte e situação) em Rollups/.
+GERAR_ROLLUPS = True
+# Após a consolidação, compara o período novo com o anterior (impressões digitais por CNPJ) e grava Delta/,
+# usado pela fase 7 no modo delta (processador_de_leads.MODO_DELTA_LEADS).
+GERAR_DELTA = True
+
 # ==============================================================================
 # 2. FUNÇÃO AUXILIAR PARA EXECUÇÃO DE FASE
 # ==============================================================================
@@ -74,14 +102,31 @@ def pipeline_principal():
         return 
         
     # --- FASE 2/3: DESCOMPACTAÇÃO E ORGANIZAÇÃO INICIAL ---
-    if not executar_fase("2/6 & 3/6 - DESCOMPACTAÇÃO E ORGANIZAÇÃO", executar_unzip):
-        print("\n🛑 PIPELINE PARADO: A FASE DE DESCOMPACTAÇÃO FALHOU.")
-        return 
+    if not MODO_SEM_EXTRACAO:
+        if not executar_fase("2/6 & 3/6 - DESCOMPACTAÇÃO E ORGANIZAÇÃO", executar_unzip):
+            print("\n🛑 PIPELINE PARADO: A FASE DE DESCOMPACTAÇÃO FALHOU.")
+            return 
+    elif VERIFICAR_ZIPS_SEM_EXTRACAO:
+        if not executar_fase("2/6 & 3/6 - VERIFICAÇÃO DOS ZIPS (SEM EXTRAÇÃO)", lambda: executar_unzip(somente_verificar=True)):
+            print("\n🛑 PIPELINE PARADO: A VERIFICAÇÃO DOS ZIPS FALHOU.")
+            return 
+    else:
+        print("\nModo sem extração: FASE 2/3 ignorada (os ZIPs serão lidos diretamente na consolidação).")
         
     # --- FASE 4/5: CONSOLIDAÇÃO E GERAÇÃO DO CSV MESTRE ---
-    if not executar_fase("4/6 & 5/6 - CONSOLIDAÇÃO E GERAÇÃO DO CSV MESTRE", executar_consolidacao):
+    if not executar_fase("4/6 & 5/6 - CONSOLIDAÇÃO E GERAÇÃO DO CSV MESTRE", lambda: executar_consolidacao(ler_direto_dos_zips=MODO_SEM_EXTRACAO)):
         print("\n🛑 PIPELINE PARADO: A FASE DE CONSOLIDAÇÃO FALHOU.")
         return 
+    
+    # --- ROLLUPS OLAP (não interrompe o pipeline) ---
+    if GERAR_ROLLUPS and executar_rollups:
+        if not executar_fase("ROLLUPS OLAP (UF, MUNICÍPIO, CNAE, PORTE, SITUAÇÃO)", executar_rollups):
+            print("\n⚠️ AVISO: OS ROLLUPS FALHARAM. O CSV MESTRE foi gerado; os rollups podem ser refeitos com 'python rollups_cnpj.py --gerar'.")
+    
+    # --- DELTA ENTRE PERÍODOS (não interrompe o pipeline; no primeiro período só grava as impressões) ---
+    if GERAR_DELTA and executar_delta:
+        if not executar_fase("DELTA ENTRE PERÍODOS (INSERIDOS, ATUALIZADOS, ENCERRADOS)", executar_delta):
+            print("\n⚠️ AVISO: O DELTA NÃO FOI GERADO. A fase 7 no modo delta fará a carga completa dos leads.")
         
     # 🎯 FASE 6: LIMPEZA SELETIVA DE ZIPS
     if not executar_fase("6/6 - LIMPEZA SELETIVA DE ZIPS", executar_limpeza_zip):
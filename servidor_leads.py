@@ -0,0 +1,251 @@
+# servidor_leads.py - Serviço HTTP local de consulta de leads (índices em memória + paginação por chave)
+
+import csv
+import io
+import json
+import time
+from functools import reduce
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import processador_de_leads as leads
+
+# --- Configurações do Serviço ---
+HOST_SERVIDOR = '127.0.0.1' # Só acesso local
+PORTA_SERVIDOR = 8765
+LIMITE_PADRAO_PAGINA = 100
+LIMITE_MAXIMO_PAGINA = 5000
+LINHAS_POR_ESCRITA = 500 # Linhas serializadas por escrita no socket (resposta em streaming)
+
+# Filtros de igualdade (parâmetro da URL -> índice invertido); vários valores do mesmo filtro são unidos (OU)
+FILTROS_IGUALDADE = ('uf', 'municipio', 'cnae', 'porte')
+# Colunas devolvidas em cada lead (além do CNPJ completo)
+COLUNAS_RESPOSTA = leads.COLUNAS_MANTER_PRIMEIRO + leads.COLUNAS_AGREGAR
+
+SEM_RESULTADOS = np.array([], dtype=np.int64)
+
+# ==============================================================================
+# 1. ÍNDICES EM MEMÓRIA
+# ==============================================================================
+
+def _indice_invertido(posicoes: np.ndarray, valores: pd.Series) -> Dict[str, np.ndarray]:
+    """valor -> posições (ordenadas, sem repetição) dos leads que têm esse valor."""
+    pares = pd.DataFrame({'valor': valores.to_numpy(dtype=object), 'posicao': posicoes}).dropna()
+    pares = pares[pares['valor'] != ''].drop_duplicates().sort_values(['valor', 'posicao'], kind='stable')
+    return {valor: grupo.to_numpy(dtype=np.int64) for valor, grupo in pares.groupby('valor', sort=False)['posicao']}
+
+def _normalizar_filtro(campo: str, valor: str) -> str:
+    """Mesma normalização usada para montar as chaves dos índices."""
+    if campo == 'uf':
+        return valor.strip().upper()
+    if campo == 'municipio':
+        return leads._normalizar_busca(valor)
+    if campo == 'cnae':
+        return ''.join(c for c in valor if c.isdigit())
+    return valor.strip()
+
+def _data_como_inteiro(valor: str) -> int:
+    """'2020-01-31' ou '20200131' -> 20200131."""
+    digitos = ''.join(c for c in valor if c.isdigit())
+    if len(digitos) != 8:
+        raise ValueError(f"Data inválida: '{valor}' (use AAAA-MM-DD ou AAAAMMDD).")
+    return int(digitos)
+
+class IndiceLeads:
+    """
+    Leads carregados uma única vez, ordenados pelo CNPJ completo (chave da paginação), com índices
+    invertidos por UF, município, CNAE (principal e secundários) e porte, e colunas numéricas para
+    os filtros de faixa (capital social e data de abertura).
+    """
+    def __init__(self, df_final: pd.DataFrame):
+        texto = leads._texto
+        chaves = leads._cnpj_como_inteiro(df_final) # int64: mesma ordem do CNPJ de 14 dígitos, sem comparar texto
+        ordem = np.argsort(chaves, kind='stable')
+        self.df = df_final.iloc[ordem].reset_index(drop=True)
+        self.chaves = chaves[ordem]
+        self.total = len(self.df)
+        posicoes = np.arange(self.total, dtype=np.int64)
+
+        self.capital = leads._capital_em_reais(self.df['capital_social']).to_numpy(dtype=np.float64)
+        self.abertura = pd.to_numeric(texto(self.df['data_inicio_atividade']), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+
+        # CNAE: principal + secundários (vírgula no arquivo da RF, SEPARADOR_AGREGACAO após a agregação)
+        secundarios = texto(self.df['cnae_fiscal_secundario']).fillna('').str.replace(leads.SEPARADOR_AGREGACAO, ',', regex=False).str.split(',')
+        cnaes = pd.concat([texto(self.df['cnae_fiscal_principal']), secundarios.explode().str.strip()])
+        posicoes_cnaes = np.concatenate([posicoes, posicoes[np.repeat(np.arange(self.total), secundarios.str.len().to_numpy())]])
+
+        self.indices = {
+            'uf': _indice_invertido(posicoes, texto(self.df['uf']).str.upper()),
+            'municipio': _indice_invertido(posicoes, texto(self.df['nome_municipio']).map(leads._normalizar_busca, na_action='ignore')),
+            'cnae': _indice_invertido(posicoes_cnaes, cnaes),
+            'porte': _indice_invertido(posicoes, texto(self.df['porte_empresa'])),
+        }
+
+    def consultar(self, filtros: Dict[str, List[str]], capital_min: Optional[float], capital_max: Optional[float],
+                  abertura_de: Optional[int], abertura_ate: Optional[int], apos: Optional[int], limite: int) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Devolve (posições da página, cursor da próxima página). Os filtros de igualdade são resolvidos pelos
+        índices invertidos (interseção), os de faixa por máscara vetorizada e a página começa logo após `apos`.
+        """
+        candidatos = None
+        for campo, valores in filtros.items():
+            conjuntos = [self.indices[campo].get(_normalizar_filtro(campo, valor), SEM_RESULTADOS) for valor in valores]
+            conjunto = reduce(np.union1d, conjuntos)
+            candidatos = conjunto if candidatos is None else np.intersect1d(candidatos, conjunto, assume_unique=True)
+
+        # Keyset: só posições depois do último CNPJ já entregue
+        inicio = int(np.searchsorted(self.chaves, apos, side='right')) if apos is not None else 0
+        if candidatos is None:
+            candidatos = np.arange(inicio, self.total, dtype=np.int64)
+        else:
+            candidatos = candidatos[np.searchsorted(candidatos, inicio):]
+
+        mascara = np.ones(len(candidatos), dtype=bool)
+        if capital_min is not None:
+            mascara &= self.capital[candidatos] >= capital_min
+        if capital_max is not None:
+            mascara &= self.capital[candidatos] <= capital_max
+        if abertura_de is not None:
+            mascara &= self.abertura[candidatos] >= abertura_de
+        if abertura_ate is not None:
+            mascara &= self.abertura[candidatos] <= abertura_ate
+
+        pagina = candidatos[mascara][:limite + 1]
+        if len(pagina) > limite:
+            pagina = pagina[:limite]
+            return pagina, f"{self.chaves[pagina[-1]]:014d}"
+        return pagina, None
+
+    def linhas(self, posicoes: np.ndarray):
+        """Gera lotes de leads (lista de dicts, nulos como None) para as posições pedidas."""
+        for inicio in range(0, len(posicoes), LINHAS_POR_ESCRITA):
+            lote = posicoes[inicio:inicio + LINHAS_POR_ESCRITA]
+            df_lote = leads._formato_texto(self.df.iloc[lote][COLUNAS_RESPOSTA]).astype(object)
+            df_lote = df_lote.where(df_lote.notna(), None)
+            df_lote.insert(0, 'cnpj', [f"{cnpj:014d}" for cnpj in self.chaves[lote].tolist()])
+            yield df_lote.to_dict('records')
+
+# ==============================================================================
+# 2. HTTP
+# ==============================================================================
+
+class ManipuladorConsultaLeads(BaseHTTPRequestHandler):
+    """
+    GET /saude  -> estado do serviço
+    GET /leads?uf=SP&municipio=Campinas&cnae=6201501&porte=05&capital_min=1000&capital_max=50000
+               &abertura_de=2020-01-01&abertura_ate=2020-12-31&limite=100&apos=<cnpj>&formato=json|csv
+    """
+    server_version = 'LeadsCNPJ/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/saude':
+            self._responder_json(200, {'status': 'ok', 'total_leads': self.server.indice.total,
+                                       'carregado_em': self.server.carregado_em})
+        elif url.path == '/leads':
+            self._consultar_leads(parse_qs(url.query))
+        else:
+            self._responder_json(404, {'erro': f"Rota desconhecida: {url.path}. Use /leads ou /saude."})
+
+    def _responder_json(self, status: int, dados: dict):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _consultar_leads(self, parametros: Dict[str, List[str]]):
+        def unico(nome, conversor=str):
+            return conversor(parametros[nome][-1]) if parametros.get(nome) and parametros[nome][-1] != '' else None
+
+        try:
+            formato = unico('formato') or 'json'
+            if formato not in ('json', 'csv'):
+                raise ValueError(f"Formato desconhecido: '{formato}'. Opções: json, csv.")
+            limite = min(max(unico('limite', int) or LIMITE_PADRAO_PAGINA, 1), LIMITE_MAXIMO_PAGINA)
+            filtros = {campo: parametros[campo] for campo in FILTROS_IGUALDADE if parametros.get(campo)}
+            inicio = time.perf_counter()
+            posicoes, proximo = self.server.indice.consultar(
+                filtros,
+                unico('capital_min', float), unico('capital_max', float),
+                unico('abertura_de', _data_como_inteiro), unico('abertura_ate', _data_como_inteiro),
+                unico('apos', int), limite,
+            )
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+        except ValueError as e:
+            self._responder_json(400, {'erro': str(e)})
+            return
+
+        # Cabeçalhos já com o cursor; o corpo segue em streaming (sem Content-Length, conexão fechada no fim)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8' if formato == 'csv' else 'application/json; charset=utf-8')
+        self.send_header('X-Proximo-Cursor', proximo or '')
+        self.send_header('X-Tempo-Consulta-ms', f"{duracao_ms:.2f}")
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        if formato == 'csv':
+            self._escrever_csv(posicoes)
+        else:
+            self._escrever_json(posicoes, proximo, duracao_ms)
+
+    def _escrever_json(self, posicoes: np.ndarray, proximo: Optional[str], duracao_ms: float):
+        self.wfile.write(b'{"leads":[')
+        primeiro = True
+        for lote in self.server.indice.linhas(posicoes):
+            texto = ','.join(json.dumps(lead, ensure_ascii=False) for lead in lote)
+            self.wfile.write(((',' if not primeiro else '') + texto).encode('utf-8'))
+            primeiro = False
+        fim = {'quantidade': len(posicoes), 'proximo': proximo, 'tempo_consulta_ms': round(duracao_ms, 2)}
+        self.wfile.write(('],' + json.dumps(fim, ensure_ascii=False)[1:]).encode('utf-8'))
+
+    def _escrever_csv(self, posicoes: np.ndarray):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['cnpj'] + COLUNAS_RESPOSTA)
+        for lote in self.server.indice.linhas(posicoes):
+            writer.writerows([lead[coluna] for coluna in ['cnpj'] + COLUNAS_RESPOSTA] for lead in lote)
+            self.wfile.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+        self.wfile.write(buffer.getvalue().encode('utf-8'))
+
+# ==============================================================================
+# WRAPPER PRINCIPAL
+# ==============================================================================
+
+def executar_servidor_leads(host: str = HOST_SERVIDOR, porta: int = PORTA_SERVIDOR) -> bool:
+    """Carrega os leads uma vez (mesma leitura/agregação/filtros da fase 7), monta os índices e atende as consultas."""
+    caminho_mestre = leads.preparar_fonte_leads()
+    if not caminho_mestre:
+        return False
+
+    df_final = leads.carregar_leads_filtrados(caminho_mestre, leads.MOTOR_LEADS)
+    if df_final is None:
+        return False
+
+    inicio = time.time()
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorConsultaLeads)
+    servidor.indice = IndiceLeads(df_final)
+    servidor.carregado_em = time.strftime('%Y-%m-%d %H:%M:%S')
+    del df_final
+
+    print("\n" + "=" * 80)
+    print(f"SERVIÇO DE CONSULTA DE LEADS: {servidor.indice.total} leads indexados em {time.time() - inicio:.2f}s.")
+    print(f"Ouvindo em http://{host}:{porta}/leads (Ctrl+C para encerrar)")
+    print("=" * 80)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando o serviço de consulta de leads.")
+    finally:
+        servidor.server_close()
+    return True
+
+if __name__ == '__main__':
+    executar_servidor_leads()
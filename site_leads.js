@@ -0,0 +1,207 @@
+// site_leads.js - Dashboard paginado de Leads CNPJ (usado pelo site gerado pelo processador_de_leads)
+// Carrega o manifesto, busca as páginas JSON sob demanda e consulta o índice de busca (fatiado pelos primeiros caracteres da chave).
+
+(function () {
+    'use strict';
+
+    const MAX_RESULTADOS_BUSCA = 50;
+    const estado = { manifesto: null, pagina: 0, cachePaginas: {}, cacheBusca: {} };
+
+    function el(tag, classe, texto) {
+        const no = document.createElement(tag);
+        if (classe) no.className = classe;
+        if (texto !== undefined) no.textContent = texto;
+        return no;
+    }
+
+    // Mesma normalização do Python (NFKD sem acentos, minúsculas)
+    function normalizar(texto) {
+        return texto.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().trim();
+    }
+
+    // Mesmo fatiamento do Python (_fatia_da_chave): prefixo da chave, fora de [a-z0-9] vira '_'
+    function fatiaDaChave(chave, tamanhoPrefixo) {
+        return chave.slice(0, tamanhoPrefixo).replace(/[^a-z0-9]/g, '_');
+    }
+
+    async function carregarJSON(caminho) {
+        const resposta = await fetch(caminho);
+        if (!resposta.ok) throw new Error(caminho + ': HTTP ' + resposta.status);
+        return resposta.json();
+    }
+
+    async function carregarPagina(idPagina) {
+        if (!estado.cachePaginas[idPagina]) {
+            estado.cachePaginas[idPagina] = carregarJSON(estado.manifesto.paginas[idPagina].arquivo);
+        }
+        return estado.cachePaginas[idPagina];
+    }
+
+    // ------------------------------------------------------------------
+    // Cards (mesma estrutura/classes do card estático)
+    // ------------------------------------------------------------------
+
+    function paragrafo(rotulo, valor) {
+        const p = el('p');
+        p.appendChild(el('strong', null, rotulo));
+        p.appendChild(document.createTextNode(' ' + valor));
+        return p;
+    }
+
+    function renderizarCard(lead) {
+        const card = el('div', 'lead-card');
+        card.appendChild(el('h3', 'razao-social', lead.razao_social + ' (' + lead.nome_fantasia + ')'));
+        card.appendChild(el('p', 'cnpj-info', 'CNPJ: ' + lead.cnpj + ' | Porte: ' + lead.porte_empresa));
+
+        const secaoSocios = el('div', 'secao-societaria');
+        secaoSocios.appendChild(el('h4', null, 'Estrutura Societária Completa (Agregada):'));
+        const lista = el('ul', 'lista-socios');
+        lead.socios.forEach(function (socio) { lista.appendChild(el('li', null, socio)); });
+        secaoSocios.appendChild(lista);
+        card.appendChild(secaoSocios);
+
+        const financeiro = el('div', 'detalhes-financeiros');
+        financeiro.appendChild(paragrafo('Capital Social:', lead.capital_social));
+        financeiro.appendChild(paragrafo('Status Legal:', 'ATIVA desde ' + lead.data_inicio_atividade));
+        card.appendChild(financeiro);
+
+        const contato = el('div', 'contato-e-localizacao');
+        contato.appendChild(el('p', null, '📍 ' + lead.logradouro + ', ' + lead.numero + ' - ' + lead.bairro + ', ' + lead.nome_municipio + '/' + lead.uf));
+        contato.appendChild(el('p', null, '📞 (' + lead.ddd_1 + ') ' + lead.telefone_1 + ' | 📧 ' + lead.correio_eletronico));
+        card.appendChild(contato);
+
+        const cnaes = el('div', 'cnaes');
+        cnaes.appendChild(paragrafo('CNAE Principal:', lead.cnae_fiscal_principal));
+        cnaes.appendChild(paragrafo('CNAEs Secundários:', lead.cnaes_secundarios));
+        card.appendChild(cnaes);
+
+        card.appendChild(el('hr'));
+        return card;
+    }
+
+    async function mostrarPagina(idPagina, posicaoDestaque) {
+        const manifesto = estado.manifesto;
+        idPagina = Math.max(0, Math.min(idPagina, manifesto.paginas.length - 1));
+        estado.pagina = idPagina;
+
+        const dados = await carregarPagina(idPagina);
+        const alvo = document.getElementById('leads-pagina');
+        alvo.textContent = '';
+        dados.leads.forEach(function (valores, posicao) {
+            const lead = {};
+            manifesto.campos.forEach(function (campo, i) { lead[campo] = valores[i]; });
+            const card = renderizarCard(lead);
+            if (posicao === posicaoDestaque) card.style.outline = '3px solid #007bff';
+            alvo.appendChild(card);
+        });
+
+        const infoPagina = manifesto.paginas[idPagina];
+        document.getElementById('leads-status').textContent =
+            'Página ' + (idPagina + 1) + ' de ' + manifesto.paginas.length +
+            (infoPagina.grupo ? ' — ' + infoPagina.grupo : '') +
+            ' (' + manifesto.total_leads + ' leads no total)';
+        const seletor = document.getElementById('leads-grupo');
+        if (seletor) seletor.value = String(manifesto.grupos.findIndex(function (g) { return g.chave === infoPagina.grupo; }));
+
+        if (posicaoDestaque !== undefined && alvo.children[posicaoDestaque]) {
+            alvo.children[posicaoDestaque].scrollIntoView({ block: 'center' });
+        }
+    }
+
+    // ------------------------------------------------------------------
+    // Busca (razão social ou CNPJ) no índice pré-gerado
+    // ------------------------------------------------------------------
+
+    async function buscar(texto) {
+        const resultados = document.getElementById('leads-resultados');
+        resultados.textContent = '';
+        const digitos = texto.replace(/\D/g, '');
+        const consulta = /^[\d.\/\s-]+$/.test(texto) ? digitos : normalizar(texto);
+        const indiceBusca = estado.manifesto.busca;
+        if (consulta.length < indiceBusca.tamanho_prefixo) return;
+
+        // Fatia ausente (HTTP 404) significa que nenhuma chave começa com esse prefixo
+        const fatia = fatiaDaChave(consulta, indiceBusca.tamanho_prefixo);
+        if (!estado.cacheBusca[fatia]) {
+            estado.cacheBusca[fatia] = carregarJSON(indiceBusca.diretorio + '/' + fatia + '.json').catch(function () { return []; });
+        }
+        const entradas = await estado.cacheBusca[fatia];
+
+        // Cada entrada é indexada a partir de cada palavra do nome (ou do CNPJ): busca por prefixo de palavra
+        let encontrados = 0;
+        const vistos = new Set();
+        for (const [chave, rotulo, idPagina, posicao] of entradas) {
+            if (!chave.startsWith(consulta) || vistos.has(idPagina + ':' + posicao)) continue;
+            vistos.add(idPagina + ':' + posicao);
+            const item = el('li', null, rotulo);
+            item.style.cursor = 'pointer';
+            item.addEventListener('click', function () { mostrarPagina(idPagina, posicao); });
+            resultados.appendChild(item);
+            if (++encontrados >= MAX_RESULTADOS_BUSCA) break;
+        }
+        if (!encontrados) resultados.appendChild(el('li', null, 'Nenhum lead encontrado.'));
+    }
+
+    // ------------------------------------------------------------------
+    // Inicialização
+    // ------------------------------------------------------------------
+
+    function montarControles(container) {
+        const manifesto = estado.manifesto;
+        const barra = el('div', 'leads-controles');
+
+        const busca = el('input');
+        busca.type = 'search';
+        busca.placeholder = 'Buscar por razão social ou CNPJ...';
+        let espera = null;
+        busca.addEventListener('input', function () {
+            clearTimeout(espera);
+            espera = setTimeout(function () { buscar(busca.value); }, 250);
+        });
+        barra.appendChild(busca);
+
+        if (manifesto.grupos.length > 1) {
+            const seletor = el('select');
+            seletor.id = 'leads-grupo';
+            manifesto.grupos.forEach(function (grupo, i) {
+                const opcao = el('option', null, grupo.chave + ' (' + grupo.total_leads + ')');
+                opcao.value = String(i);
+                seletor.appendChild(opcao);
+            });
+            seletor.addEventListener('change', function () {
+                mostrarPagina(manifesto.grupos[Number(seletor.value)].primeira_pagina);
+            });
+            barra.appendChild(seletor);
+        }
+
+        const anterior = el('button', null, '◀ Anterior');
+        anterior.addEventListener('click', function () { mostrarPagina(estado.pagina - 1); });
+        const proxima = el('button', null, 'Próxima ▶');
+        proxima.addEventListener('click', function () { mostrarPagina(estado.pagina + 1); });
+        barra.appendChild(anterior);
+        barra.appendChild(proxima);
+        barra.appendChild(el('span', null)).id = 'leads-status';
+
+        container.appendChild(barra);
+        container.appendChild(el('ul', null)).id = 'leads-resultados';
+        container.appendChild(el('div', null)).id = 'leads-pagina';
+    }
+
+    async function iniciar() {
+        const container = document.getElementById('leads-container');
+        try {
+            estado.manifesto = await carregarJSON('manifesto.json');
+        } catch (erro) {
+            container.appendChild(el('p', null, 'Não foi possível carregar manifesto.json (sirva a pasta do site por HTTP): ' + erro.message));
+            return;
+        }
+        montarControles(container);
+        if (estado.manifesto.paginas.length) {
+            mostrarPagina(0);
+        } else {
+            document.getElementById('leads-status').textContent = 'Nenhum lead encontrado.';
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', iniciar);
+})();
@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import organizer_cnpj
+
+PERIODO = '2025-11'
+TOTAL_EMPRESAS = 400
+
+
+def _campo(valor):
+    return '"' + valor.replace('"', '""') + '"'
+
+
+def _gravar_tabela(caminho, registros):
+    """Grava no formato da RF: todos os campos entre aspas, ';' como separador, ISO-8859-1."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'w', encoding='iso-8859-1', newline='') as f:
+        for posicao, registro in enumerate(registros):
+            f.write(';'.join(_campo(valor) for valor in registro) + '\n')
+            if posicao % 97 == 50:
+                f.write('\n') # Linhas em branco no meio da tabela são ignoradas pelos dois motores
+
+
+def _nome(aleatorio, indice, tipo):
+    # Aspas, ';' e quebras de linha dentro do campo: os casos que quebram cortes ingênuos por '\n'
+    variantes = [
+        f'{tipo} {indice} COMÉRCIO LTDA',
+        f'{tipo} "{indice}";\nFILIAL\nCENTRO',
+        f'{tipo} {indice}\n"AÇÃO"; SÃO PAULO',
+        '',
+    ]
+    return aleatorio.choice(variantes)
+
+
+def gerar_brutos(diretorio_periodo, semente=7):
+    """Tabelas EMPRE, ESTABELE e SOCIO sintéticas em Temp_brutos (CNPJs fora de ordem e repetidos entre tabelas)."""
+    aleatorio = random.Random(semente)
+    temp_brutos = os.path.join(diretorio_periodo, organizer_cnpj.DIRETORIO_TRABALHO_NOME)
+    cnpjs = [f'{aleatorio.randrange(10 ** 8):08d}' for _ in range(TOTAL_EMPRESAS)]
+
+    _gravar_tabela(os.path.join(temp_brutos, 'Empresas0', 'empresas.csv'), [
+        [cnpj, _nome(aleatorio, i, 'EMPRESA'), '2062', '49', f'{aleatorio.randrange(10 ** 6)},00', aleatorio.choice(['01', '03', '05']), '']
+        for i, cnpj in enumerate(cnpjs)
+    ])
+
+    estabelecimentos = []
+    for i, cnpj in enumerate(cnpjs):
+        for ordem in range(1, aleatorio.randint(1, 3) + 1):
+            estabelecimentos.append([
+                cnpj, f'{ordem:04d}', f'{aleatorio.randrange(100):02d}', '1' if ordem == 1 else '2',
+                _nome(aleatorio, i, 'FANTASIA'), aleatorio.choice(['1', '1', '2', '8']), '20200101', '00', '', '',
+                f'20{aleatorio.randrange(10, 25)}0{aleatorio.randint(1, 9)}15', aleatorio.choice(['6201501', '5611201', '4711301']),
+                aleatorio.choice(['', '8599604', '8599604,4781400']), 'RUA A', str(i), '', 'CENTRO', '01001000',
+                aleatorio.choice(['SP', 'MG', 'RJ']), '7107', '11', f'{aleatorio.randrange(10 ** 8):08d}', '', '', '', '',
+                f'contato{i}@exemplo.com.br', '', '',
+            ])
+    aleatorio.shuffle(estabelecimentos)
+    _gravar_tabela(os.path.join(temp_brutos, 'Estabelecimentos0', 'estabelecimentos.csv'), estabelecimentos)
+
+    socios = []
+    for i, cnpj in enumerate(cnpjs):
+        for j in range(aleatorio.randint(0, 3)):
+            socios.append([cnpj, '2', _nome(aleatorio, j, 'SÓCIO') or f'SÓCIO {j}', f'***{j:06d}**', '49', '20200101', '', '', '', '00', ''])
+    aleatorio.shuffle(socios)
+    _gravar_tabela(os.path.join(temp_brutos, 'Socios0', 'socios.csv'), socios)
+
+
+@pytest.fixture
+def periodo(tmp_path, monkeypatch):
+    """Pasta Dados_CNPJ/AAAA-MM com os brutos sintéticos; o cwd do teste é tmp_path (DIRETORIO_BASE é relativo)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(organizer_cnpj, 'GERAR_GRAFO_SOCIOS', False)
+    diretorio_periodo = os.path.join(organizer_cnpj.DIRETORIO_BASE, PERIODO)
+    gerar_brutos(diretorio_periodo)
+    return diretorio_periodo
@@ -0,0 +1,38 @@
+import os
+
+import pandas as pd
+import pytest
+
+import organizer_cnpj
+import processador_de_leads as leads
+from filtro_leads import carregar_filtro
+
+
+@pytest.fixture
+def caminho_mestre(periodo):
+    assert organizer_cnpj.executar_consolidacao(num_processos=1, motor='csv')
+    caminho = os.path.join(periodo, organizer_cnpj.NOME_ARQUIVO_MESTRE)
+
+    # A 1ª linha de cada CNPJ define o lead: estabelecimentos antes das demais tabelas (a ordem do os.walk varia)
+    with open(caminho, 'rb') as f:
+        cabecalho, *corpo = organizer_cnpj._registros_brutos(f)
+    corpo.sort(key=lambda registro: not registro.rstrip(b'\r\n').endswith(b';ESTABELE'))
+    with open(caminho, 'wb') as f:
+        f.writelines([cabecalho] + corpo)
+    return caminho
+
+
+@pytest.mark.parametrize('filtro', [None, 'uf in SP,RJ; cnae_fiscal_principal ^= 62,56'])
+def test_ordenacao_externa_igual_ao_groupby_em_memoria(caminho_mestre, monkeypatch, filtro):
+    # Blocos de leitura pequenos e orçamento mínimo: um run por bloco, merge k-way de vários runs
+    monkeypatch.setattr(leads, 'LINHAS_POR_BLOCO_LEITURA', 150)
+    monkeypatch.setattr(leads, 'ORCAMENTO_MEMORIA_AGRUPAMENTO_MB', 1e-6)
+    filtro = carregar_filtro(filtro) if filtro else None
+
+    em_memoria = leads.carregar_leads_filtrados(caminho_mestre, 'agrupamento', filtro)
+    externa = leads.carregar_leads_filtrados(caminho_mestre, 'ordenacao_externa', filtro)
+
+    assert len(em_memoria) > 0
+    assert em_memoria[leads.COLUNAS_AGREGAR].notna().any().all()
+    pd.testing.assert_frame_equal(externa.reset_index(drop=True), em_memoria.reset_index(drop=True))
+    assert not os.path.exists(os.path.join(os.path.dirname(caminho_mestre), leads.DIRETORIO_RUNS_NOME))
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import organizer_cnpj
+
+
+def _consolidar(diretorio_periodo, **opcoes):
+    """Consolida o período e devolve os bytes do CSV Mestre (apagado em seguida, para a próxima execução)."""
+    caminho_mestre = os.path.join(diretorio_periodo, organizer_cnpj.NOME_ARQUIVO_MESTRE)
+    assert organizer_cnpj.executar_consolidacao(**opcoes)
+    with open(caminho_mestre, 'rb') as f:
+        conteudo = f.read()
+    os.remove(caminho_mestre)
+    return conteudo
+
+
+def _registros(conteudo, tmp_path):
+    caminho = tmp_path / 'registros.csv'
+    caminho.write_bytes(conteudo)
+    with open(caminho, 'rb') as f:
+        return list(organizer_cnpj._registros_brutos(f))
+
+
+@pytest.mark.parametrize('motor', ['csv', 'pandas'])
+@pytest.mark.parametrize('num_processos', [1, 3])
+def test_consolidacao_igual_a_sequencial(periodo, monkeypatch, motor, num_processos):
+    base = _consolidar(periodo, num_processos=1, motor='csv')
+
+    # Faixas e blocos de varredura pequenos: vários cortes caem dentro de campos com aspas e quebras de linha
+    monkeypatch.setattr(organizer_cnpj, 'TAMANHO_FAIXA_CONSOLIDACAO', 4096)
+    monkeypatch.setattr(organizer_cnpj, 'TAMANHO_BLOCO_FRONTEIRAS', 1000)
+    monkeypatch.setattr(organizer_cnpj, 'LINHAS_POR_BLOCO_PANDAS', 97)
+
+    assert _consolidar(periodo, num_processos=num_processos, motor=motor) == base
+
+
+def test_faixas_cortam_so_em_inicio_de_registro(periodo, monkeypatch):
+    monkeypatch.setattr(organizer_cnpj, 'TAMANHO_FAIXA_CONSOLIDACAO', 4096)
+    monkeypatch.setattr(organizer_cnpj, 'TAMANHO_BLOCO_FRONTEIRAS', 1000)
+    caminho = os.path.join(periodo, organizer_cnpj.DIRETORIO_TRABALHO_NOME, 'Estabelecimentos0', 'estabelecimentos.csv')
+    fonte = organizer_cnpj.FonteBruta(None, caminho, 'estabelecimentos.csv', 'Estabelecimentos0')
+
+    faixas = organizer_cnpj._dividir_em_faixas(fonte)
+    assert len(faixas) > 1
+    with open(caminho, 'rb') as f:
+        inicios, posicao = set(), 0
+        for registro in organizer_cnpj._registros_brutos(f):
+            inicios.add(posicao)
+            posicao += len(registro)
+    assert all(inicio in inicios for inicio, _ in faixas)
+    assert faixas[-1][1] == os.path.getsize(caminho)
+
+
+def test_mestre_ordenado_e_indice_esparso(periodo, tmp_path):
+    base = _registros(_consolidar(periodo, num_processos=1, motor='csv'), tmp_path)
+    cabecalho, corpo = base[0], base[1:]
+    idx_chave = organizer_cnpj.CABECALHO_FINAL.index('cnpj_basico')
+    chave = lambda registro: organizer_cnpj._chave_do_registro(registro, idx_chave)
+
+    caminho_mestre = os.path.join(periodo, organizer_cnpj.NOME_ARQUIVO_MESTRE)
+    with open(caminho_mestre, 'wb') as f:
+        f.writelines(base)
+    # Runs pequenos: a ordenação passa pelo merge k-way de vários runs
+    total_linhas = organizer_cnpj.ordenar_mestre_por_cnpj(caminho_mestre, os.path.join(periodo, 'Runs'), bytes_por_run=8192, intervalo_indice=50)
+    assert total_linhas == len(corpo)
+    with open(caminho_mestre, 'rb') as f:
+        assert list(organizer_cnpj._registros_brutos(f)) == [cabecalho] + sorted(corpo, key=chave)
+
+    indice = organizer_cnpj.carregar_indice_esparso(caminho_mestre)
+    for cnpj in sorted({chave(registro) for registro in corpo})[::37]:
+        linhas = organizer_cnpj.buscar_cnpj(caminho_mestre, cnpj.decode(), indice)
+        assert len(linhas) == sum(1 for registro in corpo if chave(registro) == cnpj)
+        assert all(linha['cnpj_basico'] == cnpj.decode() for linha in linhas)
+
+    # Mestre regravado depois do índice: o índice antigo é recusado
+    os.utime(caminho_mestre, (os.path.getmtime(caminho_mestre) + 10,) * 2)
+    with pytest.raises(ValueError):
+        organizer_cnpj.carregar_indice_esparso(caminho_mestre)
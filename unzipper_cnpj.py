@@ -1,11 +1,11 @@
 # unzipper_cnpj.py - FINAL (Com instalação forçada e correção do tqdm)
 
 import os
-import re
 import zipfile
 import shutil 
 import sys 
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # ==============================================================================
 # 🎯 BLOCO DE INSTALAÇÃO FORÇADA DE DEPENDÊNCIAS
@@ -40,6 +40,7 @@ except ImportError:
         print("❌ ERRO: Bibliotecas ainda não encontradas após instalação. Abortando.")
         sys.exit(1)
 
+from organizer_cnpj import NOME_LISTA_ZIPS_CORROMPIDOS, _encontrar_diretorio_mais_recente
 
 # --- Configurações Fixas ---
 DIRETORIO_BASE = 'Dados_CNPJ'
@@ -47,13 +48,85 @@ DIRETORIO_TRABALHO_NOME = 'Temp_brutos'
 ENCODING_LEITURA = 'iso-8859-1' 
 DELIMITADOR_LEITURA = ';'
 
+# --- Configurações de Paralelismo ---
+DESCOMPACTACAO_PARALELA = True # False volta ao modo sequencial (um ZIP por vez)
+MAX_PROCESSOS_DESCOMPACTACAO = os.cpu_count() or 1 # Inflate é CPU-bound: um processo por núcleo
+TAMANHO_BUFFER_EXTRACAO = 16 * 1024 * 1024 # Cópia em blocos de 16 MB
+SUFIXO_TEMPORARIO = '.extraindo' # Nome temporário do membro enquanto o CRC não foi confirmado
+
+# ==============================================================================
+# FUNÇÃO DE DESCOMPACTAÇÃO (EXECUTADA NO PROCESSO PRINCIPAL OU NOS WORKERS)
+# ==============================================================================
+
+def _caminho_seguro_membro(pasta_destino, nome_membro):
+    """Monta o caminho de destino de um membro do ZIP, recusando caminhos absolutos ou com '..'."""
+    partes = [p for p in nome_membro.replace('\\', '/').split('/') if p not in ('', '.')]
+    if not partes or '..' in partes or os.path.splitdrive(partes[0])[0]:
+        raise zipfile.BadZipFile(f"Caminho inválido dentro do ZIP: {nome_membro}")
+    return os.path.join(pasta_destino, *partes)
+
+def _extrair_membro(zip_ref, info, pasta_destino):
+    """
+    Extrai um membro em uma única passada: o ZipExtFile confere o CRC-32 ao chegar ao fim do fluxo,
+    então o arquivo é gravado com nome temporário e só renomeado depois que a verificação passou.
+    """
+    caminho_final = _caminho_seguro_membro(pasta_destino, info.filename)
+    if info.is_dir():
+        os.makedirs(caminho_final, exist_ok=True)
+        return
+    
+    os.makedirs(os.path.dirname(caminho_final), exist_ok=True)
+    caminho_temp = caminho_final + SUFIXO_TEMPORARIO
+    try:
+        with zip_ref.open(info, 'r') as origem, open(caminho_temp, 'wb') as destino:
+            shutil.copyfileobj(origem, destino, TAMANHO_BUFFER_EXTRACAO)
+        os.replace(caminho_temp, caminho_final)
+    except BaseException:
+        if os.path.exists(caminho_temp):
+            os.remove(caminho_temp)
+        raise
+
+def _descompactar_zip(caminho_zip, caminho_pasta_destino):
+    """
+    Descompacta um único ZIP na pasta de destino (CRC verificado na própria extração, sem testzip).
+    Fica no nível do módulo para poder ser enviada ao ProcessPoolExecutor.
+    Retorna (nome_zip, sucesso, mensagem_erro); a limpeza de pastas com falha é feita pelo processo principal.
+    """
+    nome_zip = os.path.basename(caminho_zip)
+    try:
+        os.makedirs(caminho_pasta_destino, exist_ok=True)
+        with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                _extrair_membro(zip_ref, info, caminho_pasta_destino)
+        return nome_zip, True, None
+    except Exception as e:
+        return nome_zip, False, str(e)
+
+def _verificar_zip(caminho_zip):
+    """
+    Lê todos os membros do ZIP em streaming, sem gravar nada, para conferir o CRC-32 (modo sem extração).
+    Retorna (nome_zip, sucesso, mensagem_erro).
+    """
+    nome_zip = os.path.basename(caminho_zip)
+    try:
+        with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                with zip_ref.open(info, 'r') as origem:
+                    while origem.read(TAMANHO_BUFFER_EXTRACAO):
+                        pass
+        return nome_zip, True, None
+    except Exception as e:
+        return nome_zip, False, str(e)
+
 # ==============================================================================
 # CLASSE PRINCIPAL PARA GERENCIAR ESTADO E DIRETÓRIOS
 # ==============================================================================
 
 class ProcessadorCNPJ:
     def __init__(self):
-        self.diretorio_periodo = self._encontrar_diretorio_mais_recente(DIRETORIO_BASE)
+        self.diretorio_periodo = _encontrar_diretorio_mais_recente(DIRETORIO_BASE)
         if not self.diretorio_periodo:
             self.arquivos_zip = []
             return
@@ -69,18 +142,6 @@ class ProcessadorCNPJ:
 
     # --- Funções de Utilitários ---
 
-    def _encontrar_diretorio_mais_recente(self, diretorio_raiz):
-        """Localiza a subpasta de período (AAAA-MM) mais recente."""
-        try:
-            itens = os.listdir(diretorio_raiz)
-            padrao_data = re.compile(r'^\d{4}-\d{2}$')
-            diretorios_de_periodo = [item for item in itens if os.path.isdir(os.path.join(diretorio_raiz, item)) and padrao_data.match(item)]
-            if not diretorios_de_periodo: return None
-            diretorio_recente_nome = sorted(diretorios_de_periodo, reverse=True)[0]
-            return os.path.join(diretorio_raiz, diretorio_recente_nome)
-        except Exception:
-            return None
-
     def _verificar_estado_fases_2_3(self):
         """Verifica se TODAS as subpastas (uma para cada ZIP) foram criadas em Temp_brutos e não estão vazias."""
         
@@ -98,6 +159,46 @@ class ProcessadorCNPJ:
                 
         return pastas_destino_completas
 
+    def _executar_tarefas(self, funcao, tarefas, descricao="Progresso Descompactação"):
+        """
+        Gera (nome_zip, sucesso, erro) chamando `funcao(*tarefa)` para cada tupla de argumentos.
+        Com DESCOMPACTACAO_PARALELA usa um pool de processos; os resultados chegam na ordem de conclusão.
+        """
+        if not tarefas:
+            return
+            
+        num_processos = min(MAX_PROCESSOS_DESCOMPACTACAO, len(tarefas))
+        
+        if not DESCOMPACTACAO_PARALELA or num_processos <= 1:
+            # Modo sequencial: os ZIPs são processados no próprio processo, na ordem da lista
+            for tarefa in barra_progresso(tarefas, desc=descricao, unit="arquivo"):
+                yield funcao(*tarefa)
+            return
+        
+        print(f"Processando {len(tarefas)} arquivos com {num_processos} processos em paralelo.")
+        with ProcessPoolExecutor(max_workers=num_processos) as executor:
+            futuros = {executor.submit(funcao, *tarefa): tarefa[0] for tarefa in tarefas}
+            for futuro in barra_progresso(as_completed(futuros), total=len(futuros), desc=descricao, unit="arquivo"):
+                try:
+                    yield futuro.result()
+                except Exception as e:
+                    # Falha do próprio worker (ex: processo encerrado pelo sistema)
+                    yield os.path.basename(futuros[futuro]), False, str(e)
+
+    def _avaliar_taxa_sucesso(self, sucesso_count, total_arquivos, acao="descompactados"):
+        """Aplica a regra dos 90%: a fase só passa se quase todos os ZIPs foram processados."""
+        if total_arquivos == 0:
+            return True 
+            
+        porcentagem_sucesso = sucesso_count / total_arquivos
+        
+        if porcentagem_sucesso >= 0.90:
+            print(f"SUCESSO: Mais de 90% dos arquivos ZIP foram {acao} com sucesso.")
+            return True
+        else:
+            print(f"FALHA: Apenas {sucesso_count}/{total_arquivos} arquivos foram {acao}. Processo abortado para investigação.")
+            return False
+
     # --- FASES PRINCIPAIS ---
 
     def fase_2_3_descompactar_organizado(self):
@@ -124,58 +225,87 @@ class ProcessadorCNPJ:
         total_arquivos = len(self.arquivos_zip)
         sucesso_count = 0
         
-        # 🐛 CORREÇÃO AQUI: Usando o alias "barra_progresso"
-        for nome_zip in barra_progresso(self.arquivos_zip, desc="Progresso Descompactação", unit="arquivo"):
+        # Separa os ZIPs pendentes (PULA se a subpasta JÁ EXISTE e NÃO está vazia)
+        tarefas_pendentes = []
+        for nome_zip in self.arquivos_zip:
             nome_pasta_destino = os.path.splitext(nome_zip)[0] 
             caminho_pasta_destino = os.path.join(self.diretorio_saida_trabalho, nome_pasta_destino)
             caminho_zip = os.path.join(self.diretorio_periodo, nome_zip)
             
-            # PULA se a subpasta JÁ EXISTE e NÃO está vazia
             if os.path.exists(caminho_pasta_destino) and len(os.listdir(caminho_pasta_destino)) > 0:
                 sucesso_count += 1
                 continue
-
-            try:
-                os.makedirs(caminho_pasta_destino, exist_ok=True)
-                with zipfile.ZipFile(caminho_zip, 'r') as zip_ref:
-                    if zip_ref.testzip() is not None:
-                        raise zipfile.BadZipFile("Checksum de um ou mais arquivos falhou.")
-
-                    zip_ref.extractall(caminho_pasta_destino)
-                    sucesso_count += 1
-                
-            except (zipfile.BadZipFile, FileNotFoundError, Exception) as e:
-                print(f"\n     ERRO FATAL ao descompactar {nome_zip}. Pulando este arquivo. Erro: {e}")
-                
-                if os.path.exists(caminho_pasta_destino):
-                    try:
-                        shutil.rmtree(caminho_pasta_destino)
-                    except OSError:
-                        pass
+            tarefas_pendentes.append((caminho_zip, caminho_pasta_destino))
+        
+        for nome_zip, sucesso, erro in self._executar_tarefas(_descompactar_zip, tarefas_pendentes):
+            if sucesso:
+                sucesso_count += 1
+                continue
+            
+            print(f"\n     ERRO FATAL ao descompactar {nome_zip}. Pulando este arquivo. Erro: {erro}")
+            
+            caminho_pasta_destino = os.path.join(self.diretorio_saida_trabalho, os.path.splitext(nome_zip)[0])
+            if os.path.exists(caminho_pasta_destino):
+                try:
+                    shutil.rmtree(caminho_pasta_destino)
+                except OSError:
+                    pass
                 
         print("\nDescompactação concluída.") 
         print(f"Total de arquivos ZIP na fonte: {total_arquivos}")
         print(f"Total de arquivos descompactados com sucesso (ou já existentes): {sucesso_count}")
         
-        if total_arquivos == 0:
-            return True 
-            
-        porcentagem_sucesso = sucesso_count / total_arquivos
+        return self._avaliar_taxa_sucesso(sucesso_count, total_arquivos)
+
+    def _registrar_zips_corrompidos(self, zips_corrompidos):
+        """Grava (ou remove, se vazia) a lista de ZIPs reprovados lida pela consolidação no modo sem extração."""
+        caminho_lista = os.path.join(self.diretorio_periodo, NOME_LISTA_ZIPS_CORROMPIDOS)
+        if not zips_corrompidos:
+            if os.path.exists(caminho_lista):
+                os.remove(caminho_lista)
+            return
+        with open(caminho_lista, 'w', encoding='utf-8') as f:
+            f.writelines(f"{nome_zip}\n" for nome_zip in sorted(zips_corrompidos))
+
+    def fase_2_3_verificar_zips(self):
+        """
+        FASES 2 & 3 no modo sem extração: apenas confere o CRC de todos os membros de cada ZIP,
+        sem gravar Temp_brutos (a consolidação lê os ZIPs diretamente).
+        Os ZIPs reprovados são gravados em NOME_LISTA_ZIPS_CORROMPIDOS, que a consolidação usa para ignorá-los.
+        """
+        if not self.diretorio_periodo: return False
         
-        if porcentagem_sucesso >= 0.90:
-            print("SUCESSO: Mais de 90% dos arquivos ZIP foram descompactados com sucesso.")
-            return True
-        else:
-            print(f"FALHA: Apenas {sucesso_count}/{total_arquivos} arquivos foram descompactados. Processo abortado para investigação.")
-            return False
+        print("=" * 70)
+        print("FASES 2 & 3: VERIFICANDO A INTEGRIDADE DOS ZIPS (MODO SEM EXTRAÇÃO)")
+        print("=" * 70)
+        
+        total_arquivos = len(self.arquivos_zip)
+        sucesso_count = 0
+        zips_corrompidos = []
+        tarefas = [(os.path.join(self.diretorio_periodo, nome_zip),) for nome_zip in self.arquivos_zip]
+        
+        for nome_zip, sucesso, erro in self._executar_tarefas(_verificar_zip, tarefas, "Progresso Verificação"):
+            if sucesso:
+                sucesso_count += 1
+            else:
+                zips_corrompidos.append(nome_zip)
+                print(f"\n     ERRO: {nome_zip} está corrompido e não entrará na consolidação (baixe-o novamente para incluí-lo). Erro: {erro}")
+        
+        self._registrar_zips_corrompidos(zips_corrompidos)
+        print("\nVerificação concluída.")
+        print(f"Total de arquivos ZIP na fonte: {total_arquivos}")
+        print(f"Total de arquivos íntegros: {sucesso_count}")
+        
+        return self._avaliar_taxa_sucesso(sucesso_count, total_arquivos, acao="verificados")
 
 # ==============================================================================
 # FUNÇÃO WRAPPER PARA O ORQUESTRADOR
 # ==============================================================================
 
-def executar_unzip():
+def executar_unzip(somente_verificar=False):
     """
     Função principal wrapper para o Orquestrador Mestre.
+    Com `somente_verificar` (modo sem extração), apenas confere a integridade dos ZIPs.
     Retorna True ou False.
     """
     try:
@@ -189,6 +319,16 @@ def executar_unzip():
              print(f"AVISO: A pasta {processador.diretorio_periodo} está vazia (sem ZIPs). Pulando descompactação.")
              return True
              
+        if somente_verificar:
+            if not processador.fase_2_3_verificar_zips():
+                print("FALHA CRÍTICA NA VERIFICAÇÃO DOS ZIPS.")
+                return False
+            print("\n" + "=" * 100)
+            print("FASE 2/3 (VERIFICAÇÃO) CONCLUÍDA COM SUCESSO.")
+            print("Os ZIPs serão lidos diretamente na consolidação (Temp_brutos não foi gerado).")
+            print("=" * 100)
+            return True
+             
         if not processador.fase_2_3_descompactar_organizado():
             print("FALHA CRÍTICA NA DESCOMPACTAÇÃO.")
             return False